@@ -0,0 +1,171 @@
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# Comandos aceitos no modo em lote: (método do cliente, tipo da resposta, mínimo de argumentos)
+COMMANDS = {
+    "usuarios": ("list_users", "users_list", 0),
+    "nome": ("update_username", "username_updated", 1),
+    "assinar": ("subscribe", "subscribed", 1),
+    "desassinar": ("unsubscribe", "unsubscribed", 1),
+    "publicar": ("publish", "published", 2),
+    "topicos": ("topic_stats", "topic_stats", 0),
+}
+FIBONACCI_COMMANDS = ("fib", "fibonacci")
+RESULT_FORMATS = ("decimal", "hex", "base64")
+
+
+class BatchRunner:
+    # Lê um comando por linha e envia tudo pela mesma conexão sem esperar cada
+    # resposta, com no máximo `window` pedidos em andamento. As respostas saem
+    # como linhas JSON na ordem em que chegam, com o número da linha de origem.
+    def __init__(self, client, window: int = 8, timeout: float = 60.0, output=None):
+        self.client = client
+        self.window = window
+        self.timeout = timeout
+        self.output = output or sys.stdout
+        self.sent = 0
+        self.succeeded = 0
+        self.failed = 0
+        self._slots = asyncio.Semaphore(window)
+        # Respostas sem id casam com o pedido mais antigo à espera daquele tipo;
+        # erros sem id vão para o pedido mais antigo ainda pendente
+        self._waiting: Dict[str, deque] = {}
+        self._order: deque = deque()
+
+    def _on_message(self, data: Dict[str, Any]):
+        message_type = data.get("type")
+        if message_type == "error":
+            if data.get("id") is not None:
+                return
+            while self._order and self._order[0].done():
+                self._order.popleft()
+            if self._order:
+                self._order.popleft().set_exception(RuntimeError(data.get("message", "Erro desconhecido")))
+            return
+
+        waiting = self._waiting.get(message_type)
+        while waiting:
+            future = waiting.popleft()
+            if not future.done():
+                future.set_result(data)
+                return
+
+    async def _request(self, method: str, response_type: str, args: List[str]):
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(response_type, deque()).append(future)
+        self._order.append(future)
+
+        if method == "publish":
+            sent = await self.client.publish(args[0], " ".join(args[1:]))
+        elif args:
+            sent = await getattr(self.client, method)(" ".join(args))
+        else:
+            sent = await getattr(self.client, method)()
+        if not sent:
+            future.cancel()
+            raise ConnectionError("Não conectado ao servidor")
+        return await future
+
+    def _parse(self, text: str):
+        parts = text.split()
+        command, args = parts[0].lower(), parts[1:]
+
+        if command in FIBONACCI_COMMANDS:
+            if not args:
+                raise ValueError("Uso correto: fibonacci <número> [hex|base64]")
+            try:
+                n = int(args[0])
+            except ValueError:
+                raise ValueError("O valor de n deve ser um número inteiro")
+            result_format = args[1].lower() if len(args) > 1 else "decimal"
+            if result_format not in RESULT_FORMATS:
+                raise ValueError(f"Formato inválido: {result_format}")
+            return self.client.fetch_fibonacci(n, result_format)
+
+        if command not in COMMANDS:
+            raise ValueError(f"Comando não suportado no modo em lote: {command}")
+        method, response_type, min_args = COMMANDS[command]
+        if len(args) < min_args:
+            raise ValueError(f"Argumentos insuficientes para '{command}'")
+        return self._request(method, response_type, args)
+
+    def _emit(self, record: Dict[str, Any]):
+        self.output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self.output.flush()
+
+    async def _run_command(self, line_number: int, text: str, request):
+        started = time.perf_counter()
+        record = {"line": line_number, "command": text}
+        try:
+            record["response"] = await asyncio.wait_for(request, self.timeout)
+            record["ok"] = True
+            self.succeeded += 1
+        except asyncio.TimeoutError:
+            record.update(ok=False, error=f"Sem resposta em {self.timeout:g}s")
+            self.failed += 1
+        except (RuntimeError, ConnectionError) as e:
+            record.update(ok=False, error=str(e))
+            self.failed += 1
+        finally:
+            self._slots.release()
+        record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        self._emit(record)
+
+    async def run(self, source) -> bool:
+        self.client.listener = self._on_message
+        started = time.perf_counter()
+        tasks = set()
+        line_number = 0
+
+        while True:
+            # Leitura em outra thread: o stdin de um pipe pode bloquear à espera do produtor
+            line = await asyncio.to_thread(source.readline)
+            if not line:
+                break
+            line_number += 1
+            text = line.strip()
+            if not text or text.startswith("#"):
+                continue
+
+            await self._slots.acquire()
+            if not self.client.connected:
+                self._slots.release()
+                self._emit({"line": line_number, "command": text, "ok": False,
+                            "error": "Conexão com o servidor perdida"})
+                self.failed += 1
+                break
+
+            try:
+                request = self._parse(text)
+            except ValueError as e:
+                self._slots.release()
+                self._emit({"line": line_number, "command": text, "ok": False, "error": str(e)})
+                self.failed += 1
+                continue
+
+            self.sent += 1
+            task = asyncio.create_task(self._run_command(line_number, text, request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        elapsed = time.perf_counter() - started
+        rate = self.sent / elapsed if elapsed else 0.0
+        # O resumo vai para stderr para não misturar com as linhas JSON
+        print(f"Lote concluído: {self.sent} comandos em {elapsed:.2f}s ({rate:.1f}/s), "
+              f"{self.succeeded} ok, {self.failed} com erro", file=sys.stderr)
+        return self.failed == 0
+
+
+async def run_batch(client, path: Optional[str], window: int, timeout: float) -> bool:
+    runner = BatchRunner(client, window, timeout)
+    if path in (None, "-"):
+        return await runner.run(sys.stdin)
+    with open(path) as source:
+        return await runner.run(source)
@@ -8,6 +8,8 @@ import select
 import time
 from typing import List, Dict, Callable, Any
 
+from config import ADMIN_TOKEN
+
 logger = logging.getLogger('websocket_client.cli')
 
 class Command:
@@ -40,7 +42,14 @@ class InteractiveConsole:
             "fib", 
             self.fibonacci, 
             "Calcula Fibonacci(n)", 
-            "fib <número>"
+            "fib <número> [hex|base64]"
+        )
+        
+        self.register_command(
+            "fibmod", 
+            self.fibonacci_mod_batch, 
+            "Calcula Fibonacci(n) mod m para vários n de uma vez", 
+            "fibmod <módulo> <n> [n ...]"
         )
         
         self.register_command(
@@ -80,6 +89,60 @@ class InteractiveConsole:
             "Mostra a lista de usuários conectados"
         )
         
+        self.register_command(
+            "presenca", 
+            self.toggle_presence, 
+            "Liga/desliga o acompanhamento de entradas e saídas de usuários"
+        )
+        
+        self.register_command(
+            "assinar", 
+            self.subscribe, 
+            "Inscreve-se em um tópico", 
+            "assinar <tópico>"
+        )
+        
+        self.register_command(
+            "desassinar", 
+            self.unsubscribe, 
+            "Cancela a inscrição em um tópico", 
+            "desassinar <tópico>"
+        )
+        
+        self.register_command(
+            "publicar", 
+            self.publish, 
+            "Publica uma mensagem em um tópico", 
+            "publicar <tópico> <mensagem>"
+        )
+        
+        self.register_command(
+            "topicos", 
+            self.topic_stats, 
+            "Mostra os tópicos ativos e suas taxas de mensagens"
+        )
+        
+        self.register_command(
+            "estatisticas", 
+            self.session_stats, 
+            "Mostra usuários simultâneos, conexões e mensagens por período", 
+            "estatisticas [minutos] [agrupamento]"
+        )
+        
+        self.register_command(
+            "perfil", 
+            self.profile, 
+            "Coleta um perfil do servidor (requer ADMIN_TOKEN)", 
+            "perfil [segundos]"
+        )
+        
+        self.register_command(
+            "cache", 
+            self.cache, 
+            "Mostra o uso do cache local de resultados ou o esvazia", 
+            "cache [limpar]"
+        )
+        
         self.register_command(
             "limpar", 
             self.clear_screen, 
@@ -106,17 +169,36 @@ class InteractiveConsole:
     
     async def fibonacci(self, args: List[str]):
         if not args:
-            print("\nUso correto: fib <número>")
+            print("\nUso correto: fib <número> [hex|base64]")
             return False  
         
+        result_format = args[1].lower() if len(args) > 1 else "decimal"
+        if result_format not in ("decimal", "hex", "base64"):
+            print("\nErro: Formato inválido. Use decimal, hex ou base64.")
+            return True
+        
         try:
             n = int(args[0])
-            success = await self.client.calculate_fibonacci(n)
+            success = await self.client.calculate_fibonacci(n, result_format)
             return success  
         except ValueError:
             print("\nErro: O valor de n deve ser um número inteiro.")
             return False 
         
+    async def fibonacci_mod_batch(self, args: List[str]):
+        if len(args) < 2:
+            print("\nUso correto: fibmod <módulo> <n> [n ...]")
+            return False
+        
+        try:
+            modulus = int(args[0])
+            values = [int(value) for value in args[1:]]
+        except ValueError:
+            print("\nErro: O módulo e os valores de n devem ser números inteiros.")
+            return False
+        
+        return await self.client.fibonacci_mod_batch(values, modulus)
+        
     async def update_username(self, args: List[str]):
         if not args:
             print("\nUso correto: nome <novo_nome>")
@@ -130,6 +212,79 @@ class InteractiveConsole:
         await self.client.list_users()
         return True
     
+    async def toggle_presence(self, args: List[str] = None):
+        if self.client.presence_subscribed:
+            await self.client.unsubscribe_presence()
+            print("\nAcompanhamento de presença desativado.")
+        else:
+            await self.client.subscribe_presence()
+        return True
+    
+    async def subscribe(self, args: List[str]):
+        if not args:
+            print("\nUso correto: assinar <tópico>")
+            return True
+        
+        await self.client.subscribe(args[0])
+        return True
+    
+    async def unsubscribe(self, args: List[str]):
+        if not args:
+            print("\nUso correto: desassinar <tópico>")
+            return True
+        
+        await self.client.unsubscribe(args[0])
+        return True
+    
+    async def publish(self, args: List[str]):
+        if len(args) < 2:
+            print("\nUso correto: publicar <tópico> <mensagem>")
+            return True
+        
+        await self.client.publish(args[0], " ".join(args[1:]))
+        return True
+    
+    async def topic_stats(self, args: List[str] = None):
+        await self.client.topic_stats()
+        return True
+    
+    async def session_stats(self, args: List[str] = None):
+        try:
+            minutes = int(args[0]) if args else 60
+            bucket = int(args[1]) if args and len(args) > 1 else None
+        except ValueError:
+            print("\nUso correto: estatisticas [minutos] [agrupamento]")
+            return True
+        
+        await self.client.session_stats(minutes, bucket)
+        return True
+    
+    async def profile(self, args: List[str] = None):
+        if not ADMIN_TOKEN:
+            print("\nDefina ADMIN_TOKEN para usar comandos administrativos.")
+            return True
+        
+        try:
+            seconds = float(args[0]) if args else 5.0
+        except ValueError:
+            print("\nErro: A duração deve ser um número de segundos.")
+            return True
+        
+        print(f"\nColetando perfil do servidor por {seconds:g}s...")
+        await self.client.admin_profile(ADMIN_TOKEN, seconds)
+        return True
+    
+    async def cache(self, args: List[str] = None):
+        if args and args[0] == "limpar":
+            self.client.result_cache.clear()
+            print("\nCache local de resultados esvaziado.")
+            return True
+        
+        stats = self.client.result_cache.stats()
+        print(f"\nCache local: {stats['entries']} resultado(s), {stats['bytes'] / 1024:.1f} de "
+              f"{stats['max_bytes'] / 1024:.0f} KiB, {stats['hits']} acerto(s), {stats['misses']} falta(s)")
+        return True
+    
     async def show_status(self, args: List[str] = None):
         status = "Conectado" if self.client.connected else "Desconectado"
         print(f"\nStatus: {status}")
@@ -143,7 +298,7 @@ class InteractiveConsole:
         return True
     
     async def show_time(self, args: List[str] = None):
-        print(f"\nHora do servidor: {self.client.current_time}")
+        print(f"\nHora do servidor: {self.client.get_server_time()}")
         return True
     
     async def reconnect(self, args: List[str] = None):
@@ -173,10 +328,11 @@ class InteractiveConsole:
         
         self.in_command_execution = True
         
-        if self.client.current_time:
-            print(f"\nHora do servidor: {self.client.current_time}")
+        server_time = self.client.get_server_time()
+        if server_time:
+            print(f"\nHora do servidor: {server_time}")
 
-            self.client.time_update_pending = False
+            self.client.mark_time_displayed()
 
         self.command_history.append(command_input)
         if len(self.command_history) > 10:
@@ -229,7 +385,7 @@ class InteractiveConsole:
     
     def _should_update_time_display(self, current_time, last_time_check, buffer):
         time_elapsed = current_time - last_time_check > 0.5
-        can_interrupt = (self.client.time_update_pending and 
+        can_interrupt = (self.client.has_pending_time_update() and 
                         not self.in_command_execution and 
                         current_time - self.last_input_time > 1.0 and
                         not buffer)
@@ -240,9 +396,9 @@ class InteractiveConsole:
         old_settings = termios.tcgetattr(fd)
         try:
             termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-            print(f"\rHora do servidor: {self.client.current_time}")
+            print(f"\rHora do servidor: {self.client.get_server_time()}")
             print("> " + buffer, end="", flush=True)
-            self.client.time_update_pending = False
+            self.client.mark_time_displayed()
         finally:
             termios.tcsetattr(fd, termios.TCSAFLUSH, old_settings)
     
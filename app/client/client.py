@@ -1,15 +1,46 @@
 import asyncio
+import datetime
 import json
+import random
+import time
 import websockets
 import logging
-from typing import Optional, Dict, Any, Callable
+from typing import Optional, Dict, Any, Callable, List
+
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
+
+from result_cache import ResultCache
+from config import WS_MAX_SIZE, WS_COMPRESSION, WS_COMPRESSION_WINDOW_BITS, WS_COMPRESSION_MEM_LEVEL
 
 logger = logging.getLogger('websocket_client.client')
 
+# Quantidade de amostras de relógio mantidas para o filtro de menor atraso
+CLOCK_SAMPLES = 8
+
+# Reconexão pedida pelo servidor (drain): tentativas e espera máxima pelos
+# resultados pendentes antes de trocar de conexão
+RECONNECT_ATTEMPTS = 10
+RECONNECT_PENDING_TIMEOUT = 30
+RECONNECT_JITTER = 2.0
+CLOSE_SERVICE_RESTART = 1012
+
+# Resultados de Fibonacci modular em lote mostrados no terminal
+MOD_BATCH_PREVIEW = 20
+
 class WebSocketClient:
     
-    def __init__(self, uri: str = "ws://localhost:8765"):
+    def __init__(self, uri: str = "ws://localhost:8765", time_push_interval: Optional[int] = None,
+                 cache_max_bytes: int = 32 * 1024 * 1024, quiet: bool = False):
         self.uri = uri
+        # quiet suprime as mensagens para o terminal (modo em lote); listener
+        # recebe toda mensagem decodificada antes do handler do tipo
+        self.quiet = quiet
+        self.listener: Optional[Callable[[Dict[str, Any]], None]] = None
+        self.reconnect_task: Optional[asyncio.Task] = None
+        self.receive_task: Optional[asyncio.Task] = None
+        # None mantém o envio de hora a cada segundo; caso contrário o cliente
+        # extrapola a hora do servidor localmente (0 = sem envios automáticos)
+        self.time_push_interval = time_push_interval
         self.websocket: Optional[websockets.WebSocketClientProtocol] = None
         self.client_id: Optional[str] = None
         self.username: Optional[str] = None
@@ -17,19 +48,64 @@ class WebSocketClient:
         self.running = True
         self.current_time = ""
         self.time_update_pending = False
+        self.clock_samples = []
+        self.clock_offset: Optional[float] = None
+        self.server_utc_offset = 0.0
+        self.last_displayed_second: Optional[int] = None
+        self.presence_subscribed = False
+        self.presence_version: Optional[int] = None
+        self.presence: Dict[str, Dict[str, Any]] = {}
+        self.topics = set()
+        self.next_request_id = 0
+        # Resultados já recebidos por (n, formato) e pedidos em andamento: um
+        # segundo pedido igual aguarda o mesmo futuro em vez de ir ao servidor
+        self.result_cache = ResultCache(cache_max_bytes)
+        self.pending_fibonacci: Dict[tuple, asyncio.Future] = {}
+        self.pending_requests: Dict[int, tuple] = {}
         
         self.message_handlers: Dict[str, Callable] = {
             "welcome": self._handle_welcome,
             "time_update": self._handle_time_update,
+            "clock_sync": self._handle_clock_sync,
+            "time_sync": self._handle_time_sync,
+            "presence_snapshot": self._handle_presence_snapshot,
+            "user_joined": self._handle_presence_delta,
+            "user_left": self._handle_presence_delta,
+            "user_renamed": self._handle_presence_delta,
+            "subscribed": self._handle_subscribed,
+            "unsubscribed": self._handle_unsubscribed,
+            "published": self._handle_published,
+            "topic_message": self._handle_topic_message,
+            "topic_stats": self._handle_topic_stats,
+            "session_stats": self._handle_session_stats,
+            "admin_profile": self._handle_admin_profile,
             "fibonacci_result": self._handle_fibonacci_result,
+            "fibonacci_mod_batch_result": self._handle_fibonacci_mod_batch_result,
             "username_updated": self._handle_username_updated,
             "users_list": self._handle_users_list,
+            "reconnect": self._handle_reconnect,
             "error": self._handle_error
         }
     
+    def _print(self, *args, **kwargs):
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    def _compression_options(self):
+        # Os pedidos do cliente são pequenos; o que importa é aceitar a compressão
+        # das respostas grandes do servidor com a janela configurada
+        if WS_COMPRESSION == "none":
+            return {"compression": None}
+        return {"compression": None, "extensions": [ClientPerMessageDeflateFactory(
+            server_max_window_bits=WS_COMPRESSION_WINDOW_BITS,
+            client_max_window_bits=WS_COMPRESSION_WINDOW_BITS,
+            compress_settings={"memLevel": WS_COMPRESSION_MEM_LEVEL}
+        )]}
+
     async def connect(self):
         try:
-            self.websocket = await websockets.connect(self.uri)
+            self.websocket = await websockets.connect(self.uri, max_size=WS_MAX_SIZE or None,
+                                                      **self._compression_options())
             self.connected = True
             logger.info(f"Conectado ao servidor: {self.uri}")
             return True
@@ -42,6 +118,7 @@ class WebSocketClient:
             await self.websocket.close()
             self.connected = False
             logger.info("Desconectado do servidor")
+        self._fail_pending_requests(ConnectionError("Conexão com o servidor encerrada"))
     
     async def send_message(self, message_data: dict):
         if not self.connected or not self.websocket:
@@ -51,14 +128,70 @@ class WebSocketClient:
         try:
             message = json.dumps(message_data)
             await self.websocket.send(message)
-            logger.info(f"Mensagem enviada: {message}")
+            if "token" in message_data:
+                logger.info(f"Mensagem enviada: {message_data.get('type')} (token omitido)")
+            else:
+                logger.info(f"Mensagem enviada: {message}")
             return True
         except Exception as e:
             logger.error(f"Erro ao enviar mensagem: {str(e)}")
             return False
     
-    async def calculate_fibonacci(self, n: int):
-        return await self.send_message({"type": "fibonacci", "n": n})
+    async def _request_fibonacci(self, key: tuple) -> Optional[asyncio.Future]:
+        # Os cálculos rodam em paralelo no servidor; o id casa cada resposta com seu pedido
+        n, result_format = key
+        self.next_request_id += 1
+        request_id = self.next_request_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending_fibonacci[key] = future
+        self.pending_requests[request_id] = key
+
+        if not await self.send_message({"type": "fibonacci", "n": n, "format": result_format, "id": request_id}):
+            self.pending_fibonacci.pop(key, None)
+            self.pending_requests.pop(request_id, None)
+            future.cancel()
+            return None
+        return future
+
+    async def fetch_fibonacci(self, n: int, result_format: str = "decimal") -> Dict[str, Any]:
+        # API programática: devolve a mensagem fibonacci_result, do cache local
+        # quando possível; pedidos iguais simultâneos compartilham uma ida ao servidor
+        key = (n, result_format)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return cached
+
+        future = self.pending_fibonacci.get(key)
+        if future is None:
+            future = await self._request_fibonacci(key)
+            if future is None:
+                raise ConnectionError("Não conectado ao servidor")
+        # shield: cancelar um dos interessados não cancela o pedido dos demais
+        return await asyncio.shield(future)
+
+    async def fibonacci_mod_batch(self, values: List[int], modulus: int):
+        return await self.send_message({"type": "fibonacci_mod_batch", "n": values, "modulus": modulus})
+
+    async def calculate_fibonacci(self, n: int, result_format: str = "decimal"):
+        key = (n, result_format)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            self._print_fibonacci_result(cached, cached=True)
+            return True
+
+        if key in self.pending_fibonacci:
+            self._print(f"\nFibonacci({n}) já foi pedido; o resultado aparece assim que chegar.")
+            return True
+        return await self._request_fibonacci(key) is not None
+
+    def _fail_pending_requests(self, error: Exception):
+        for future in self.pending_fibonacci.values():
+            if not future.done():
+                future.set_exception(error)
+                # Pedidos do console não aguardam o futuro; marca a exceção como lida
+                future.exception()
+        self.pending_fibonacci.clear()
+        self.pending_requests.clear()
     
     async def update_username(self, new_username: str):
         return await self.send_message({"type": "update_username", "username": new_username})
@@ -66,59 +199,322 @@ class WebSocketClient:
     async def list_users(self):
         return await self.send_message({"type": "list_users"})
 
+    async def subscribe_presence(self):
+        self.presence_subscribed = True
+        self.presence_version = None
+        return await self.send_message({"type": "subscribe_presence"})
+
+    async def unsubscribe_presence(self):
+        self.presence_subscribed = False
+        self.presence_version = None
+        self.presence = {}
+        return await self.send_message({"type": "unsubscribe_presence"})
+
+    async def subscribe(self, topic: str):
+        self.topics.add(topic)
+        return await self.send_message({"type": "subscribe", "topic": topic})
+
+    async def unsubscribe(self, topic: str):
+        self.topics.discard(topic)
+        return await self.send_message({"type": "unsubscribe", "topic": topic})
+
+    async def publish(self, topic: str, payload):
+        return await self.send_message({"type": "publish", "topic": topic, "payload": payload})
+
+    async def topic_stats(self):
+        return await self.send_message({"type": "topic_stats"})
+
+    async def session_stats(self, minutes: int = 60, bucket: Optional[int] = None):
+        message = {"type": "session_stats", "minutes": minutes}
+        if bucket is not None:
+            message["bucket"] = bucket
+        return await self.send_message(message)
+
+    async def admin_profile(self, token: str, seconds: float):
+        return await self.send_message({"type": "admin_profile", "token": token, "seconds": seconds})
+
+    async def request_clock_sync(self):
+        return await self.send_message({"type": "clock_sync", "interval": self.time_push_interval})
+
+    async def send_time_sync(self):
+        return await self.send_message({"type": "time_sync", "t0": time.monotonic()})
+
+    async def run_clock_sync(self, resync_interval: float):
+        while self.running:
+            await asyncio.sleep(resync_interval)
+            if self.connected and self.time_push_interval is not None:
+                await self.send_time_sync()
+
+    def _add_clock_sample(self, server_time: float, received_at: float, round_trip: float):
+        # Filtro no estilo NTP: entre as amostras recentes vale a de menor atraso
+        self.clock_samples.append((round_trip, server_time + round_trip / 2 - received_at))
+        if len(self.clock_samples) > CLOCK_SAMPLES:
+            self.clock_samples.pop(0)
+        self.clock_offset = min(self.clock_samples)[1]
+
+    def get_server_time(self) -> str:
+        if self.clock_offset is None:
+            return self.current_time
+
+        timezone = datetime.timezone(datetime.timedelta(seconds=self.server_utc_offset))
+        now = datetime.datetime.fromtimestamp(time.monotonic() + self.clock_offset, timezone)
+        return now.strftime("%Y-%m-%d %H:%M:%S")
+
+    def has_pending_time_update(self) -> bool:
+        if self.time_update_pending:
+            return True
+        if self.clock_offset is None:
+            return False
+        return int(time.monotonic() + self.clock_offset) != self.last_displayed_second
+
+    def mark_time_displayed(self):
+        self.time_update_pending = False
+        if self.clock_offset is not None:
+            self.last_displayed_second = int(time.monotonic() + self.clock_offset)
+
     async def _handle_welcome(self, data: Dict[str, Any]):
         
         self.client_id = data.get("client_id")
+        # A hora inicial chega no mesmo quadro das boas-vindas
+        if "time" in data:
+            await self._handle_time_update(data)
         
-        print("\nCONEXÃO ESTABELECIDA")
-        print(f"Você está conectado ao servidor WebSocket: {self.uri}")
-        print(f"Seu ID de cliente é: {self.client_id}")
-        print("Use o comando 'usuarios' para ver quem mais está online.")
-        print("Use o comando 'hora' para verificar a hora atual do servidor.")
+        self._print("\nCONEXÃO ESTABELECIDA")
+        self._print(f"Você está conectado ao servidor WebSocket: {self.uri}")
+        self._print(f"Seu ID de cliente é: {self.client_id}")
+        self._print("Use o comando 'usuarios' para ver quem mais está online.")
+        self._print("Use o comando 'hora' para verificar a hora atual do servidor.")
+
+        if self.time_push_interval is not None:
+            self.clock_samples = []
+            await self.request_clock_sync()
+            await self.send_time_sync()
+
+        if self.presence_subscribed:
+            await self.subscribe_presence()
+
+        # Após uma reconexão as inscrições em tópicos são refeitas
+        for topic in list(self.topics):
+            await self.subscribe(topic)
 
     async def _handle_time_update(self, data: Dict[str, Any]):
         self.current_time = data.get("time", "")
-        self.time_update_pending = True
+        if self.clock_offset is None:
+            self.time_update_pending = True
+        if "utc_offset" in data:
+            self.server_utc_offset = data["utc_offset"]
+
+    async def _handle_clock_sync(self, data: Dict[str, Any]):
+        self.server_utc_offset = data.get("utc_offset", self.server_utc_offset)
+        logger.info(f"Sincronização de relógio ativada (intervalo: {data.get('interval')}s)")
+
+    async def _handle_time_sync(self, data: Dict[str, Any]):
+        received_at = time.monotonic()
+        t0 = data.get("t0")
+        server_time = data.get("server_time")
+        if t0 is None or server_time is None:
+            return
+
+        self.server_utc_offset = data.get("utc_offset", self.server_utc_offset)
+        self._add_clock_sample(server_time, received_at, received_at - t0)
 
     async def _handle_fibonacci_result(self, data: Dict[str, Any]):
-        print(f"\nFibonacci({data.get('n')}) = {data.get('result')}")
+        key = self.pending_requests.pop(data.get("id"), None)
+        if key is None:
+            key = (data.get("n"), data.get("format", "decimal"))
+        self.result_cache.put(key, data)
+
+        future = self.pending_fibonacci.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+        self._print_fibonacci_result(data)
+
+    def _print_fibonacci_result(self, data: Dict[str, Any], cached: bool = False):
+        result_format = data.get("format", "decimal")
+        if result_format == "decimal":
+            self._print(f"\nFibonacci({data.get('n')}) = {data.get('result')}")
+        else:
+            self._print(f"\nFibonacci({data.get('n')}) [{result_format}] = {data.get('result')}")
+
+        if cached:
+            self._print("(cache local)")
+        elif "queue_ms" in data:
+            self._print(f"(fila: {data['queue_ms']:.1f} ms, cálculo: {data.get('service_ms', 0):.1f} ms)")
     
+    async def _handle_fibonacci_mod_batch_result(self, data: Dict[str, Any]):
+        results = data.get("results", [])
+        shown = ", ".join(str(value) for value in results[:MOD_BATCH_PREVIEW])
+        if len(results) > MOD_BATCH_PREVIEW:
+            shown += f", ... (+{len(results) - MOD_BATCH_PREVIEW})"
+        self._print(f"\nFibonacci mod {data.get('modulus')} de {len(results)} valor(es) = [{shown}]")
+        self._print(f"(cálculo: {data.get('service_ms', 0):.1f} ms)")
+
     async def _handle_username_updated(self, data: Dict[str, Any]):
         self.username = data.get("username")
-        print(f"\nNome de usuário atualizado para: {self.username}")
+        self._print(f"\nNome de usuário atualizado para: {self.username}")
     
     async def _handle_error(self, data: Dict[str, Any]):
-        print(f"\nErro: {data.get('message', 'Erro desconhecido')}")
+        key = self.pending_requests.pop(data.get("id"), None)
+        future = self.pending_fibonacci.pop(key, None) if key else None
+        if future is not None and not future.done():
+            future.set_exception(RuntimeError(data.get("message", "Erro desconhecido")))
+            future.exception()
+
+        self._print(f"\nErro: {data.get('message', 'Erro desconhecido')}")
 
     async def _handle_users_list(self, data: Dict[str, Any]):
         users = data.get("users", [])
 
         if not users:
-            print("\nNenhum usuário conectado.")
+            self._print("\nNenhum usuário conectado.")
             return
 
-        print("\rUsuários conectados:", flush=True)
+        self._print("\rUsuários conectados:", flush=True)
         
         for user in users:
             username = user.get("username", "N/A")
             online_time = user.get("online_time", "N/A")
             
-            print(f"\r{username} - online há {online_time}", flush=True)
+            self._print(f"\r{username} - online há {online_time}", flush=True)
         
-        print()
+        self._print()
+
+    async def _handle_presence_snapshot(self, data: Dict[str, Any]):
+        self.presence_version = data.get("version")
+        self.presence = {user["client_id"]: user for user in data.get("users", [])}
+        self._print(f"\rAcompanhando presença: {len(self.presence)} usuário(s) online", flush=True)
+
+    async def _handle_presence_delta(self, data: Dict[str, Any]):
+        if self.presence_version is None:
+            return
+
+        version = data.get("version", 0)
+        if version <= self.presence_version:
+            return
+        if version > self.presence_version + 1:
+            # Perdemos algum delta: pede um novo snapshot
+            logger.info(f"Lacuna na versão de presença ({self.presence_version} -> {version}), ressincronizando")
+            await self.subscribe_presence()
+            return
+
+        self.presence_version = version
+        user = data.get("user", {})
+        client_id = user.get("client_id")
+        event = data.get("type")
+
+        if event == "user_left":
+            self.presence.pop(client_id, None)
+            self._print(f"\r{user.get('username')} saiu", flush=True)
+        elif event == "user_renamed":
+            previous = self.presence.get(client_id, {}).get("username")
+            self.presence[client_id] = user
+            self._print(f"\r{previous} agora se chama {user.get('username')}", flush=True)
+        else:
+            self.presence[client_id] = user
+            self._print(f"\r{user.get('username')} entrou", flush=True)
+
+    async def _handle_subscribed(self, data: Dict[str, Any]):
+        self._print(f"\rInscrito no tópico '{data.get('topic')}'", flush=True)
+
+    async def _handle_unsubscribed(self, data: Dict[str, Any]):
+        self._print(f"\rInscrição no tópico '{data.get('topic')}' cancelada", flush=True)
+
+    async def _handle_published(self, data: Dict[str, Any]):
+        self._print(f"\rMensagem publicada em '{data.get('topic')}': {data.get('delivered', 0)} entregue(s), "
+              f"{data.get('dropped', 0)} descartada(s)", flush=True)
+
+    async def _handle_topic_message(self, data: Dict[str, Any]):
+        sender = data.get("from") or "servidor"
+        self._print(f"\r[{data.get('topic')}] {sender}: {data.get('payload')}", flush=True)
+
+    async def _handle_topic_stats(self, data: Dict[str, Any]):
+        topics = data.get("topics", [])
+        if not topics:
+            self._print("\nNenhum tópico ativo.")
+            return
+
+        self._print("\rTópicos:", flush=True)
+        for topic in topics:
+            self._print(f"\r{topic['topic']} - {topic['subscribers']} inscrito(s), {topic['messages']} mensagem(ns), "
+                  f"{topic['rate_per_second']:.2f} msg/s, {topic['dropped']} descartada(s)", flush=True)
+        self._print()
+
+    async def _handle_session_stats(self, data: Dict[str, Any]):
+        totals = data.get("totals", {})
+        messages = totals.get("messages", {})
+        self._print(f"\rEstatísticas de {data.get('from')} a {data.get('to')} "
+              f"(intervalos de {data.get('bucket_minutes')} min):", flush=True)
+        self._print(f"\rPico de usuários simultâneos: {totals.get('peak_users', 0)}, "
+              f"{totals.get('connects', 0)} conexão(ões), {totals.get('disconnects', 0)} desconexão(ões)", flush=True)
+        if messages:
+            by_type = ", ".join(f"{message_type}: {count}" for message_type, count in
+                                sorted(messages.items(), key=lambda item: -item[1]))
+            self._print(f"\rMensagens por tipo: {by_type}", flush=True)
+
+        for point in data.get("series", []):
+            if point.get("peak_users") is None:
+                continue
+            self._print(f"\r{point['time']}  pico {point['peak_users']:>5}  mín {point['min_users']:>5}  "
+                  f"+{point['connects']} -{point['disconnects']}  {point['messages']} msg", flush=True)
+        self._print()
+
+    async def _handle_admin_profile(self, data: Dict[str, Any]):
+        filename = f"perfil_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.folded"
+        with open(filename, "w") as f:
+            f.write(data.get("stacks", ""))
+
+        self._print(f"\rPerfil: {data.get('samples')} amostras em {data.get('duration')}s, "
+              f"pilhas salvas em {filename}", flush=True)
+        for entry in data.get("top_inclusive", [])[:10]:
+            self._print(f"\r{entry['percent']:5.1f}%  {entry['frame']}", flush=True)
+        self._print()
+
+    async def _handle_reconnect(self, data: Dict[str, Any]):
+        delay = float(data.get("delay", 0))
+        self._print(f"\rServidor reiniciando; reconectando em {delay:.1f}s...", flush=True)
+        self.schedule_reconnect(delay)
+
+    def schedule_reconnect(self, delay: float):
+        if self.reconnect_task is None or self.reconnect_task.done():
+            self.reconnect_task = asyncio.create_task(self._reconnect_after(delay))
+
+    async def _reconnect_after(self, delay: float):
+        await asyncio.sleep(delay)
+        # O servidor em drain conclui os cálculos em andamento: espera por eles antes de sair
+        pending = [future for future in self.pending_fibonacci.values() if not future.done()]
+        if pending and self.connected:
+            await asyncio.wait(pending, timeout=RECONNECT_PENDING_TIMEOUT)
+
+        previous = self.websocket
+        for attempt in range(RECONNECT_ATTEMPTS):
+            if await self.connect():
+                break
+            await asyncio.sleep(min(0.5 * 2 ** attempt, 5.0))
+        else:
+            logger.error(f"Não foi possível reconectar após {RECONNECT_ATTEMPTS} tentativas")
+            return
+
+        self.receive_task = asyncio.create_task(self.receive_messages())
+        if previous is not None and previous is not self.websocket:
+            await previous.close()
+        self._print("\rReconectado ao servidor.", flush=True)
 
     async def _handle_unknown(self, data: Dict[str, Any]):
-        print(f"\nMensagem recebida: {data}")
+        self._print(f"\nMensagem recebida: {data}")
     
     async def receive_messages(self):
         if not self.connected or not self.websocket:
             logger.error("Não conectado ao servidor")
             return
         
+        websocket = self.websocket
         try:
-            async for message in self.websocket:
+            async for message in websocket:
                 try:
                     data = json.loads(message)
+                    if self.listener:
+                        self.listener(data)
                     handler = self.message_handlers.get(data.get("type", ""), self._handle_unknown)
                     await handler(data)
                 except json.JSONDecodeError:
@@ -127,5 +523,12 @@ class WebSocketClient:
                     logger.error(f"Erro ao processar mensagem: {str(e)}")
         except websockets.exceptions.ConnectionClosed as e:
             logger.info(f"Conexão fechada: {e}")
+            if websocket is not self.websocket:
+                # Conexão antiga, já substituída por uma reconexão
+                return
             self.connected = False
-            print("\nConexão com o servidor perdida.")
\ No newline at end of file
+            self._fail_pending_requests(ConnectionError("Conexão com o servidor perdida"))
+            self._print("\nConexão com o servidor perdida.")
+            if e.rcvd and e.rcvd.code == CLOSE_SERVICE_RESTART and self.running:
+                # Servidor reiniciando sem ter pedido reconexão antes: espalha a volta dos clientes
+                self.schedule_reconnect(random.uniform(0, RECONNECT_JITTER))
\ No newline at end of file
@@ -1,7 +1,31 @@
 import logging
+import os
 
 DEFAULT_URI = "ws://websocket-server:8765"
 
+# Intervalo (s) de envio de hora pedido ao servidor; vazio mantém o envio a cada
+# segundo, 0 deixa a hora apenas extrapolada localmente
+TIME_PUSH_INTERVAL = os.getenv("TIME_PUSH_INTERVAL")
+TIME_PUSH_INTERVAL = int(TIME_PUSH_INTERVAL) if TIME_PUSH_INTERVAL else None
+CLOCK_RESYNC_SECONDS = float(os.getenv("CLOCK_RESYNC_SECONDS", 60))
+
+# Maior mensagem aceita do servidor (bytes, 0 sem limite): F(n) passa de 1 MiB
+# a partir de n ~ 5 milhões, a faixa do modo paralelo do servidor
+WS_MAX_SIZE = int(os.getenv("WS_MAX_SIZE", 64 * 1024 * 1024))
+
+# Compressão oferecida ao servidor (deflate ou none) e janela/memória do zlib
+WS_COMPRESSION = os.getenv("WS_COMPRESSION", "deflate")
+WS_COMPRESSION_WINDOW_BITS = int(os.getenv("WS_COMPRESSION_WINDOW_BITS", 12))
+WS_COMPRESSION_MEM_LEVEL = int(os.getenv("WS_COMPRESSION_MEM_LEVEL", 5))
+
+# Limite (bytes) do cache local de resultados de Fibonacci
+FIB_CACHE_MAX_BYTES = int(os.getenv("FIB_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Token dos comandos administrativos (perfil)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Implementação do loop de eventos: asyncio, uvloop ou auto
+EVENT_LOOP = os.getenv("EVENT_LOOP", "asyncio")
 
 LOG_LEVEL = logging.INFO
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
\ No newline at end of file
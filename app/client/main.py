@@ -1,12 +1,25 @@
+import argparse
 import asyncio
+import os
 import sys
 import logging
 import signal
 import atexit
 
+# A escolha do loop de eventos é a mesma do servidor e vem de app/server, no fim
+# do sys.path para não sombrear os módulos do cliente (config.py existe nos dois)
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server")
+if SERVER_DIR not in sys.path:
+    sys.path.append(SERVER_DIR)
+
+from batch import run_batch
 from client import WebSocketClient
 from cli import InteractiveConsole
-from config import DEFAULT_URI, LOG_LEVEL, LOG_FORMAT
+from event_loop import install_event_loop
+from config import (
+    DEFAULT_URI, LOG_LEVEL, LOG_FORMAT, TIME_PUSH_INTERVAL, CLOCK_RESYNC_SECONDS, EVENT_LOOP,
+    FIB_CACHE_MAX_BYTES
+)
 
 logging.basicConfig(
     level=LOG_LEVEL,
@@ -36,14 +49,45 @@ def handle_shutdown(signum, frame):
         client.running = False
         logger.info("Cliente está sendo encerrado...")
 
-async def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cliente WebSocket Fibonacci")
+    parser.add_argument("uri", nargs="?", default=DEFAULT_URI)
+    parser.add_argument("--batch", metavar="ARQUIVO",
+                        help="Executa os comandos do arquivo (ou '-' para stdin) sem console, "
+                             "com as respostas em linhas JSON")
+    parser.add_argument("--window", type=int, default=8,
+                        help="Máximo de comandos em andamento no modo em lote")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="Tempo máximo (s) de espera por cada resposta no modo em lote")
+    return parser.parse_args()
+
+async def main_batch(args):
+    global client
+
+    # Sem console: nada de mensagens no terminal nem envio periódico de hora
+    logging.getLogger('websocket_client').setLevel(logging.WARNING)
+    client = WebSocketClient(args.uri, time_push_interval=0, cache_max_bytes=FIB_CACHE_MAX_BYTES, quiet=True)
+    if not await client.connect():
+        print("Não foi possível conectar ao servidor.", file=sys.stderr)
+        return False
+
+    receive_task = asyncio.create_task(client.receive_messages())
+    try:
+        return await run_batch(client, args.batch, max(1, args.window), args.timeout)
+    finally:
+        await client.disconnect()
+        receive_task.cancel()
+        try:
+            await receive_task
+        except asyncio.CancelledError:
+            pass
+
+async def main(args):
     global client
     
-    uri = DEFAULT_URI
-    if len(sys.argv) > 1:
-        uri = sys.argv[1]
+    uri = args.uri
     
-    client = WebSocketClient(uri)
+    client = WebSocketClient(uri, time_push_interval=TIME_PUSH_INTERVAL, cache_max_bytes=FIB_CACHE_MAX_BYTES)
     cli = InteractiveConsole(client)
     
     signal.signal(signal.SIGINT, handle_shutdown)
@@ -58,6 +102,7 @@ async def main():
         return
 
     receive_task = asyncio.create_task(client.receive_messages())
+    clock_task = asyncio.create_task(client.run_clock_sync(CLOCK_RESYNC_SECONDS))
     cli_task = asyncio.create_task(cli.run())
 
     try:
@@ -65,15 +110,21 @@ async def main():
     finally:
         await client.disconnect()
         receive_task.cancel()
+        clock_task.cancel()
         
-        try:
-            await receive_task
-        except asyncio.CancelledError:
-            pass
+        for task in (receive_task, clock_task):
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
 
 if __name__ == "__main__":
+    args = parse_args()
+    install_event_loop(EVENT_LOOP, logging.getLogger('websocket_client.event_loop'))
+    if args.batch:
+        sys.exit(0 if asyncio.run(main_batch(args)) else 1)
     try:
-        asyncio.run(main())
+        asyncio.run(main(args))
         logger.info("Cliente encerrado.")
     except KeyboardInterrupt:
         print("\nCliente encerrado pelo usuário.")
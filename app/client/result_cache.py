@@ -0,0 +1,61 @@
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Custo fixo aproximado de cada entrada (chave, dicionário e campos pequenos)
+ENTRY_OVERHEAD = 256
+
+
+def _entry_size(data: Dict[str, Any]) -> int:
+    return sys.getsizeof(data.get("result")) + ENTRY_OVERHEAD
+
+
+class ResultCache:
+    # LRU limitado pelo tamanho aproximado dos resultados guardados, e não pela
+    # quantidade: um único F(n) grande pode ocupar megabytes
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, data: Dict[str, Any]):
+        size = _entry_size(data)
+        if size > self.max_bytes:
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= previous[1]
+        self._entries[key] = (data, size)
+        self.size += size
+
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
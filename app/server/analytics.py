@@ -0,0 +1,164 @@
+import asyncio
+import datetime
+import logging
+from typing import Callable, Dict, Iterable, Set
+
+logger = logging.getLogger('websocket_server.analytics')
+
+# O tipo da mensagem vira nome de campo no documento agregado, então só os tipos
+# conhecidos são contados pelo nome; o resto entra em "other"
+MESSAGE_TYPES = frozenset({
+    "fibonacci", "update_username", "list_users", "clock_sync", "time_sync",
+    "subscribe_presence", "unsubscribe_presence", "subscribe", "unsubscribe",
+    "publish", "admin_profile", "topic_stats", "session_stats", "fibonacci_mod_batch"
+})
+OTHER_MESSAGES = "other"
+
+
+class MinuteRollup:
+    __slots__ = ("connects", "disconnects", "peak_users", "min_users", "messages")
+
+    def __init__(self, users: int):
+        self.connects = 0
+        self.disconnects = 0
+        self.peak_users = users
+        self.min_users = users
+        self.messages: Dict[str, int] = {}
+
+    def copy(self) -> "MinuteRollup":
+        rollup = MinuteRollup(self.peak_users)
+        rollup.connects = self.connects
+        rollup.disconnects = self.disconnects
+        rollup.min_users = self.min_users
+        rollup.messages = dict(self.messages)
+        return rollup
+
+
+def minute_of(moment: datetime.datetime) -> datetime.datetime:
+    return moment.replace(second=0, microsecond=0)
+
+
+class SessionAnalytics:
+    # Contadores por minuto atualizados a cada conexão, desconexão e mensagem, só
+    # em memória. A cada intervalo os minutos tocados vão ao banco com os totais
+    # absolutos do minuto num documento por instância e minuto: regravar o mesmo
+    # minuto (uma nova gravação ou a repetição de um lote que falhou no meio) não
+    # soma nada duas vezes. As consultas de período leem apenas esses documentos.
+    def __init__(self, write: Callable, flush_interval: float = 10.0):
+        self.write = write
+        self.flush_interval = flush_interval
+        self.users = 0
+        self._buckets: Dict[datetime.datetime, MinuteRollup] = {}
+        self._dirty: Set[datetime.datetime] = set()
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    def _bucket(self) -> MinuteRollup:
+        minute = minute_of(datetime.datetime.now())
+        bucket = self._buckets.get(minute)
+        if bucket is None:
+            bucket = self._buckets[minute] = MinuteRollup(self.users)
+        self._dirty.add(minute)
+        return bucket
+
+    def connected(self, users: int):
+        # O minuto novo começa com a contagem de antes do evento
+        bucket = self._bucket()
+        self.users = users
+        bucket.connects += 1
+        bucket.peak_users = max(bucket.peak_users, users)
+
+    def disconnected(self, users: int):
+        bucket = self._bucket()
+        self.users = users
+        bucket.disconnects += 1
+        bucket.min_users = min(bucket.min_users, users)
+
+    def message(self, message_type):
+        key = message_type if isinstance(message_type, str) and message_type in MESSAGE_TYPES else OTHER_MESSAGES
+        messages = self._bucket().messages
+        messages[key] = messages.get(key, 0) + 1
+
+    async def flush(self) -> bool:
+        async with self._lock:
+            # O minuto atual entra mesmo sem eventos: cada minuto no ar tem seu documento
+            self._bucket()
+            # Cópias: os contadores continuam mudando no loop durante a gravação
+            batch = {minute: self._buckets[minute].copy() for minute in self._dirty}
+            self._dirty = set()
+            try:
+                await asyncio.to_thread(self.write, batch)
+            except Exception as e:
+                # Mesmo que parte do lote tenha sido aplicada, regravar os totais é seguro
+                logger.error(f"Falha ao gravar as estatísticas de {len(batch)} minuto(s): {str(e)}")
+                self._dirty.update(batch)
+                return False
+
+            # Minutos passados já gravados não mudam mais
+            current = minute_of(datetime.datetime.now())
+            for minute in [minute for minute in self._buckets if minute < current and minute not in self._dirty]:
+                del self._buckets[minute]
+            return True
+
+    async def run(self):
+        while not self._closed:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        self._closed = True
+        await self.flush()
+
+
+def summarize(documents: Iterable[dict], start: datetime.datetime, end: datetime.datetime,
+              bucket_minutes: int) -> dict:
+    # Soma as instâncias em cada minuto e agrupa os minutos em intervalos de
+    # bucket_minutes. Usuários simultâneos num minuto = soma dos picos de cada
+    # instância, um limite superior quando os picos não coincidem
+    per_minute: Dict[datetime.datetime, dict] = {}
+    for document in documents:
+        entry = per_minute.setdefault(document['minute'], {
+            'connects': 0, 'disconnects': 0, 'peak_users': 0, 'min_users': 0, 'messages': {}
+        })
+        entry['connects'] += document.get('connects', 0)
+        entry['disconnects'] += document.get('disconnects', 0)
+        entry['peak_users'] += document.get('peak_users', 0)
+        entry['min_users'] += document.get('min_users', 0)
+        for message_type, count in document.get('messages', {}).items():
+            entry['messages'][message_type] = entry['messages'].get(message_type, 0) + count
+
+    step = datetime.timedelta(minutes=bucket_minutes)
+    grouped: Dict[int, list] = {}
+    for minute, entry in per_minute.items():
+        if start <= minute < end:
+            grouped.setdefault((minute - start) // step, []).append(entry)
+
+    series = []
+    totals = {'connects': 0, 'disconnects': 0, 'peak_users': 0, 'messages': {}}
+    for index in range(-(-(end - start) // step)):
+        minutes = grouped.get(index, [])
+        point = {
+            'time': (start + index * step).strftime("%Y-%m-%d %H:%M"),
+            'connects': sum(entry['connects'] for entry in minutes),
+            'disconnects': sum(entry['disconnects'] for entry in minutes),
+            'peak_users': max((entry['peak_users'] for entry in minutes), default=None),
+            'min_users': min((entry['min_users'] for entry in minutes), default=None),
+            'messages': sum(sum(entry['messages'].values()) for entry in minutes)
+        }
+        series.append(point)
+
+        totals['connects'] += point['connects']
+        totals['disconnects'] += point['disconnects']
+        if point['peak_users'] is not None:
+            totals['peak_users'] = max(totals['peak_users'], point['peak_users'])
+        for entry in minutes:
+            for message_type, count in entry['messages'].items():
+                totals['messages'][message_type] = totals['messages'].get(message_type, 0) + count
+
+    return {
+        'from': start.strftime("%Y-%m-%d %H:%M"),
+        'to': end.strftime("%Y-%m-%d %H:%M"),
+        'bucket_minutes': bucket_minutes,
+        'totals': totals,
+        'series': series
+    }
@@ -0,0 +1,93 @@
+import logging
+import struct
+import time
+
+logger = logging.getLogger('websocket_server.capture')
+
+# Arquivo: cabeçalho (magic + hora de início) seguido de registros
+# (tipo, conexão, microssegundos desde o início, tamanho) + payload
+_MAGIC = b"WSCAP1\n"
+_FILE_HEADER = struct.Struct("<7sd")
+_RECORD = struct.Struct("<BIQI")
+
+CONNECT = 1
+MESSAGE = 2
+BINARY = 3
+DISCONNECT = 4
+
+
+class TrafficRecorder:
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.records = 0
+        self._connections = {}
+        self._next_index = 0
+        self._started = time.monotonic()
+        self._file = open(path, "wb", buffering=1024 * 1024)
+        self._size = self._file.write(_FILE_HEADER.pack(_MAGIC, time.time()))
+        self._full = False
+        logger.info(f"Gravando tráfego de entrada em {path}")
+
+    def _write(self, kind, connection_id, payload=b""):
+        if self._full or self._file is None:
+            return
+
+        record_size = _RECORD.size + len(payload)
+        if self._size + record_size > self.max_bytes:
+            self._full = True
+            logger.warning(f"Captura de tráfego interrompida: limite de {self.max_bytes} bytes atingido")
+            return
+
+        # Os ids de conexão viram números sequenciais pequenos na captura
+        index = self._connections.get(connection_id)
+        if index is None:
+            index = self._connections[connection_id] = self._next_index
+            self._next_index += 1
+
+        elapsed_us = int((time.monotonic() - self._started) * 1_000_000)
+        self._file.write(_RECORD.pack(kind, index, elapsed_us, len(payload)))
+        if payload:
+            self._file.write(payload)
+        self._size += record_size
+        self.records += 1
+
+    def connect(self, connection_id):
+        self._write(CONNECT, connection_id)
+
+    def message(self, connection_id, message):
+        if isinstance(message, str):
+            self._write(MESSAGE, connection_id, message.encode("utf-8"))
+        else:
+            self._write(BINARY, connection_id, bytes(message))
+
+    def disconnect(self, connection_id):
+        self._write(DISCONNECT, connection_id)
+        self._connections.pop(connection_id, None)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+            logger.info(f"Captura de tráfego encerrada: {self.records} registros, {self._size} bytes")
+
+
+def read_capture(path: str):
+    # Gera (segundos desde o início, conexão, tipo, payload) na ordem gravada
+    with open(path, "rb") as f:
+        header = f.read(_FILE_HEADER.size)
+        if len(header) < _FILE_HEADER.size or _FILE_HEADER.unpack(header)[0] != _MAGIC:
+            raise ValueError(f"{path} não é um arquivo de captura válido")
+
+        while True:
+            raw = f.read(_RECORD.size)
+            if len(raw) < _RECORD.size:
+                return
+            kind, connection, elapsed_us, length = _RECORD.unpack(raw)
+            payload = f.read(length)
+            if len(payload) < length:
+                # Registro incompleto no fim do arquivo (servidor encerrado durante a escrita)
+                return
+            if kind == MESSAGE:
+                payload = payload.decode("utf-8")
+            yield elapsed_us / 1_000_000, connection, kind, payload
@@ -0,0 +1,58 @@
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.frames import Opcode
+
+
+class SelectivePerMessageDeflate(PerMessageDeflate):
+    # Mensagens menores que min_size saem sem compressão (RSV1 desligado), o que a
+    # RFC 7692 permite mensagem a mensagem. O contexto do compressor continua
+    # válido: o outro lado também não passa essas mensagens pelo descompressor.
+    def __init__(self, *args, min_size: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.min_size = min_size
+        self.skipping = False
+
+    def encode(self, frame):
+        if frame.opcode in (Opcode.TEXT, Opcode.BINARY):
+            # A decisão vale para a mensagem inteira, inclusive quadros de continuação
+            self.skipping = len(frame.data) < self.min_size
+        elif frame.opcode is not Opcode.CONT:
+            return frame
+
+        if self.skipping:
+            return frame
+        return super().encode(frame)
+
+
+class SelectiveDeflateFactory(ServerPerMessageDeflateFactory):
+    def __init__(self, min_size: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.min_size = min_size
+
+    def process_request_params(self, params, accepted_extensions):
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, SelectivePerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            min_size=self.min_size
+        )
+
+
+def compression_options(mode: str, min_size: int, window_bits: int, mem_level: int, level: int) -> dict:
+    # Argumentos de compressão para websockets.serve
+    if mode == "none":
+        return {"compression": None}
+    if mode != "deflate":
+        raise ValueError(f"Modo de compressão inválido: {mode}")
+
+    return {
+        "compression": None,
+        "extensions": [SelectiveDeflateFactory(
+            min_size=min_size,
+            server_max_window_bits=window_bits,
+            client_max_window_bits=window_bits,
+            compress_settings={"memLevel": mem_level, "level": level}
+        )]
+    }
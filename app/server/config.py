@@ -1,5 +1,6 @@
 import os
-from pymongo import MongoClient
+import socket
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,18 +15,122 @@ MONGO_COLLECTION = os.getenv("MONGO_COLLECTION", "connected_users")
 # Conexão ao banco como administrador (root)
 MONGO_URI = f"mongodb://{MONGO_USER}:{MONGO_PASSWORD}@{MONGO_HOST}:{MONGO_PORT}/{MONGO_DB}?authSource=admin"
 
-try:
-    client = MongoClient(MONGO_URI)
-    db = client[MONGO_DB]
-    # Verifica se a coleção existe e a cria se não existir
-    if MONGO_COLLECTION not in db.list_collection_names():
-        db.create_collection(MONGO_COLLECTION)
-    print("✅ Conectado ao MongoDB com sucesso!")
-except Exception as e:
-    print(f"❌ Erro ao conectar ao MongoDB: {e}")
+# Pool de conexões compartilhado, criado sob demanda depois que o servidor já está escutando
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 5))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 3000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 3000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 10000))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zlib")
+MONGO_INIT_RETRY_SECONDS = float(os.getenv("MONGO_INIT_RETRY_SECONDS", 5))
+# Validade (s) do último ping ao banco usado pelo /readyz
+READINESS_PING_TTL_SECONDS = float(os.getenv("READINESS_PING_TTL_SECONDS", 5))
+
+# Lease por instância do servidor: cada instância renova o próprio documento e
+# as sessões dos usuários apontam para ela; lease vencido = sessões offline.
+# INSTANCE_ID é só o prefixo: cada processo tem id próprio, para que antecessor e
+# sucessor numa passagem de sockets (HANDOFF_PATH) não dividam lease e sessões
+MONGO_LEASE_COLLECTION = os.getenv("MONGO_LEASE_COLLECTION", "server_leases")
+INSTANCE_ID = f"{os.getenv('INSTANCE_ID') or socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+LEASE_TTL_SECONDS = float(os.getenv("LEASE_TTL_SECONDS", 30))
+LEASE_RENEW_SECONDS = float(os.getenv("LEASE_RENEW_SECONDS", 10))
+
+# Estatísticas agregadas por minuto (conexões, usuários simultâneos, mensagens por
+# tipo): intervalo de gravação e dias mantidos antes da remoção pelo índice TTL
+MONGO_ANALYTICS_COLLECTION = os.getenv("MONGO_ANALYTICS_COLLECTION", "session_rollups")
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", 10))
+ANALYTICS_RETENTION_DAYS = int(os.getenv("ANALYTICS_RETENTION_DAYS", 30))
 
 SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
 SERVER_PORT = int(os.getenv("SERVER_PORT", 8765))
 
+# Gravação das sessões em lote: intervalo entre bulk_writes e sessões por lote
+SESSION_FLUSH_MS = float(os.getenv("SESSION_FLUSH_MS", 50))
+SESSION_MAX_BATCH = int(os.getenv("SESSION_MAX_BATCH", 1000))
+
+# Limites de buffer por conexão WebSocket (mensagem máxima, fila de recepção e escrita)
+WS_MAX_SIZE = int(os.getenv("WS_MAX_SIZE", 1024 * 1024))
+WS_MAX_QUEUE = int(os.getenv("WS_MAX_QUEUE", 4))
+WS_WRITE_LIMIT = int(os.getenv("WS_WRITE_LIMIT", 16 * 1024))
+
+# permessage-deflate (WS_COMPRESSION: deflate ou none). Mensagens menores que
+# WS_COMPRESSION_MIN_SIZE bytes, como o time_update de cada segundo, saem sem
+# compressão; o nível 1 custa bem menos CPU nos resultados grandes (bench_compression.py)
+WS_COMPRESSION = os.getenv("WS_COMPRESSION", "deflate")
+WS_COMPRESSION_MIN_SIZE = int(os.getenv("WS_COMPRESSION_MIN_SIZE", 256))
+WS_COMPRESSION_WINDOW_BITS = int(os.getenv("WS_COMPRESSION_WINDOW_BITS", 12))
+WS_COMPRESSION_MEM_LEVEL = int(os.getenv("WS_COMPRESSION_MEM_LEVEL", 5))
+WS_COMPRESSION_LEVEL = int(os.getenv("WS_COMPRESSION_LEVEL", 1))
+
+# Broadcast de hora: clientes por lote e fração do segundo usada para espalhar os lotes
+BROADCAST_SHARD_SIZE = int(os.getenv("BROADCAST_SHARD_SIZE", 1000))
+BROADCAST_SPREAD = float(os.getenv("BROADCAST_SPREAD", 0.5))
+BROADCAST_LAG_WARNING_MS = float(os.getenv("BROADCAST_LAG_WARNING_MS", 50))
+
+# Agendador de Fibonacci: pool de cálculo (thread ou process), limite de pedidos
+# pendentes por cliente, aging (s de custo descontados por s de espera) e custo
+# estimado abaixo do qual o cálculo roda direto no loop
+FIB_EXECUTOR = os.getenv("FIB_EXECUTOR", "thread")
+FIB_WORKERS = int(os.getenv("FIB_WORKERS", 2))
+FIB_MAX_PENDING_PER_CLIENT = int(os.getenv("FIB_MAX_PENDING_PER_CLIENT", 8))
+FIB_AGING_RATE = float(os.getenv("FIB_AGING_RATE", 1.0))
+FIB_INLINE_MAX_MS = float(os.getenv("FIB_INLINE_MAX_MS", 1))
+
+# Máximo de valores em um pedido HTTP em lote (/fib?n=1,2,3) e maior n aceito
+# pelo endpoint HTTP, que não tem autenticação
+HTTP_FIB_MAX_BATCH = int(os.getenv("HTTP_FIB_MAX_BATCH", 100))
+HTTP_FIB_MAX_N = int(os.getenv("HTTP_FIB_MAX_N", 100000))
+
+# Fibonacci modular em lote (fibonacci_mod_batch): máximo de valores por pedido e
+# threads dedicadas, para não disputar as do banco (o numpy libera o GIL). Lotes
+# grandes também precisam de WS_MAX_SIZE maior: ~20 bytes por n de 18 dígitos
+FIB_MOD_BATCH_MAX = int(os.getenv("FIB_MOD_BATCH_MAX", 200000))
+FIB_MOD_BATCH_WORKERS = int(os.getenv("FIB_MOD_BATCH_WORKERS", 2))
+
+# Canais pub/sub: envios simultâneos por publicação, timeout por envio,
+# buffer máximo de escrita antes de descartar e tópicos por cliente
+PUBSUB_FANOUT_CONCURRENCY = int(os.getenv("PUBSUB_FANOUT_CONCURRENCY", 256))
+PUBSUB_SEND_TIMEOUT = float(os.getenv("PUBSUB_SEND_TIMEOUT", 5))
+PUBSUB_MAX_BUFFER = int(os.getenv("PUBSUB_MAX_BUFFER", 256 * 1024))
+PUBSUB_MAX_TOPICS_PER_CLIENT = int(os.getenv("PUBSUB_MAX_TOPICS_PER_CLIENT", 32))
+
+# Armazenamento persistente de checkpoints de Fibonacci (desativado se vazio)
+FIB_STORE_PATH = os.getenv("FIB_STORE_PATH", "")
+FIB_STORE_MAX_BYTES = int(os.getenv("FIB_STORE_MAX_BYTES", 512 * 1024 * 1024))
+FIB_STORE_MIN_N = int(os.getenv("FIB_STORE_MIN_N", 10000))
+
+# Cache de resultados em memória compartilhada entre processos (0 desativa)
+FIB_SHARED_CACHE_NAME = os.getenv("FIB_SHARED_CACHE_NAME", "websocket_fibonacci_cache")
+FIB_SHARED_CACHE_BYTES = int(os.getenv("FIB_SHARED_CACHE_BYTES", 0))
+FIB_SHARED_CACHE_SLOTS = int(os.getenv("FIB_SHARED_CACHE_SLOTS", 4096))
+FIB_SHARED_CACHE_MIN_N = int(os.getenv("FIB_SHARED_CACHE_MIN_N", 1000))
+
+# Um único F(n) enorme em vários núcleos: a partir de FIB_PARALLEL_MIN_N o cálculo
+# usa fast doubling e reparte as maiores multiplicações entre FIB_PARALLEL_WORKERS
+# processos (0 desativa; 1 usa o fast doubling num núcleo só)
+FIB_PARALLEL_WORKERS = int(os.getenv("FIB_PARALLEL_WORKERS", 0))
+FIB_PARALLEL_MIN_N = int(os.getenv("FIB_PARALLEL_MIN_N", 5000000))
+
+# Watchdog do loop de eventos: paradas acima deste limite têm a pilha capturada (0 desativa)
+WATCHDOG_THRESHOLD_MS = float(os.getenv("WATCHDOG_THRESHOLD_MS", 250))
+
+# Comandos administrativos (admin_profile) exigem este token; vazio desativa
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", 30))
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", 5))
+
+# Gravação do tráfego de entrada para replay (vazio desativa)
+CAPTURE_PATH = os.getenv("CAPTURE_PATH", "")
+CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Desligamento gracioso: prazo total, janela em que os clientes são espalhados
+# ao reconectar e socket Unix para passar o socket de escuta ao novo processo
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", 30))
+DRAIN_RECONNECT_SPREAD = float(os.getenv("DRAIN_RECONNECT_SPREAD", 5))
+HANDOFF_PATH = os.getenv("HANDOFF_PATH", "")
+
+# Implementação do loop de eventos: asyncio, uvloop ou auto
+EVENT_LOOP = os.getenv("EVENT_LOOP", "asyncio")
+
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
\ No newline at end of file
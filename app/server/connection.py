@@ -0,0 +1,37 @@
+import time
+
+
+class ConnectionState:
+    # Estado de cada conexão em um único objeto com __slots__, sem __dict__ por instância
+    __slots__ = (
+        "websocket",
+        "id",
+        "username",
+        "connected_at",
+        "last_tick",
+        "last_activity",
+        "time_push_interval",
+        "messages_received",
+        "messages_sent",
+        "topics"
+    )
+
+    def __init__(self, websocket, connection_id: int, username: str):
+        self.websocket = websocket
+        self.id = connection_id
+        self.username = username
+        self.connected_at = time.time()
+        self.last_tick = 0.0
+        self.last_activity = time.monotonic()
+        self.time_push_interval = 1
+        self.messages_received = 0
+        self.messages_sent = 0
+        self.topics = None
+
+    @property
+    def client_id(self) -> str:
+        return f"client_{self.id}"
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+        self.messages_received += 1
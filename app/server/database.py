@@ -1,196 +1,242 @@
 import datetime
 import logging
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+import threading
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import OperationFailure, PyMongoError
 
-from config import MONGO_URI, MONGO_DB, MONGO_COLLECTION
+from config import (
+    MONGO_URI, MONGO_DB, MONGO_COLLECTION, MONGO_LEASE_COLLECTION, MONGO_ANALYTICS_COLLECTION,
+    MONGO_HOST, MONGO_PORT, ANALYTICS_RETENTION_DAYS,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS, MONGO_COMPRESSORS
+)
 
 logger = logging.getLogger('websocket_server.database')
 
-try:
-    client = MongoClient(MONGO_URI)
-    db = client[MONGO_DB]
-    collection = db[MONGO_COLLECTION]
-    logger.info(f"Conexão com MongoDB estabelecida: {MONGO_URI}")
-except PyMongoError as e:
-    logger.error(f"Erro ao conectar com MongoDB: {str(e)}")
-    raise
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    # Um único pool para todo o processo, criado no primeiro uso
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                options = {
+                    'maxPoolSize': MONGO_MAX_POOL_SIZE,
+                    'minPoolSize': MONGO_MIN_POOL_SIZE,
+                    'connectTimeoutMS': MONGO_CONNECT_TIMEOUT_MS,
+                    'serverSelectionTimeoutMS': MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    'socketTimeoutMS': MONGO_SOCKET_TIMEOUT_MS
+                }
+                if MONGO_COMPRESSORS:
+                    options['compressors'] = MONGO_COMPRESSORS
+                _client = MongoClient(MONGO_URI, **options)
+                logger.info(f"Pool de conexões com MongoDB criado: {MONGO_HOST}:{MONGO_PORT}")
+    return _client
+
+def configure_client(client):
+    # Permite injetar outro cliente compatível (ex.: mongomock nos benchmarks)
+    global _client
+    with _client_lock:
+        _client = client
+
+def get_collection():
+    return get_client()[MONGO_DB][MONGO_COLLECTION]
+
+def get_lease_collection():
+    return get_client()[MONGO_DB][MONGO_LEASE_COLLECTION]
+
+def get_analytics_collection():
+    return get_client()[MONGO_DB][MONGO_ANALYTICS_COLLECTION]
 
 def init_database():
     try:
-        collection.create_index('id', unique=True)
+        db = get_client()[MONGO_DB]
+        if MONGO_COLLECTION not in db.list_collection_names():
+            db.create_collection(MONGO_COLLECTION)
+        get_collection().create_index('id', unique=True)
+        # Derrubar as sessões de uma instância é um update_many por este índice
+        get_collection().create_index([('instance_id', 1), ('online', 1)])
+        get_lease_collection().create_index('expires_at')
+        try:
+            # Serve às consultas por período e remove os minutos mais antigos que a retenção
+            get_analytics_collection().create_index(
+                'minute', expireAfterSeconds=ANALYTICS_RETENTION_DAYS * 24 * 3600
+            )
+        except OperationFailure as e:
+            # Índice criado antes com outra retenção: mantém o existente
+            logger.warning(f"Índice de retenção das estatísticas não atualizado: {str(e)}")
         logger.info("Banco de dados MongoDB inicializado.")
     except PyMongoError as e:
         logger.error(f"Erro ao inicializar o banco de dados: {str(e)}")
         raise
 
-def add_user_to_db(user_id, username):
-    current_time = datetime.datetime.now()
-    user_data = {
-        'id': user_id,
-        'username': username,
-        'connected_at': current_time,
-        'last_active': current_time,
-        'online': True,
-        'disconnected_at': None
-    }
-    
+def ping_database():
     try:
-        result = collection.update_one(
-            {'id': user_id}, 
-            {'$set': user_data}, 
-            upsert=True
-        )
-        
-        if result.upserted_id or result.modified_count > 0:
-            logger.info(f"Usuário {username} ({user_id}) adicionado ao banco de dados.")
-            return True
-        else:
-            logger.warning(f"Nenhuma modificação ao adicionar usuário {username} ({user_id}).")
-            return False
-            
+        get_client().admin.command('ping')
+        return True
     except PyMongoError as e:
-        logger.error(f"Erro ao adicionar usuário ao banco de dados: {str(e)}")
+        logger.warning(f"MongoDB não respondeu ao ping: {str(e)}")
         return False
 
-def remove_user_from_db(user_id):
+def write_sessions(updates):
+    # Grava de uma vez as mudanças de sessão acumuladas: {user_id: (campos, upsert)}.
+    # Sem ordem entre as operações, já que há no máximo uma por usuário
+    operations = [
+        UpdateOne({'id': user_id}, {'$set': fields}, upsert=upsert)
+        for user_id, (fields, upsert) in updates.items()
+    ]
+    if not operations:
+        return 0
+
+    result = get_collection().bulk_write(operations, ordered=False)
+    logger.info(f"{len(operations)} sessões gravadas em lote "
+                f"({result.upserted_count} novas, {result.modified_count} alteradas)")
+    return len(operations)
+
+def write_rollups(instance_id, rollups):
+    # Um documento por instância e minuto com os totais absolutos do minuto: só
+    # esta instância escreve nele, e repetir a gravação dá sempre o mesmo documento
+    operations = []
+    for minute, rollup in rollups.items():
+        operations.append(UpdateOne(
+            {'_id': f"{instance_id}:{minute.strftime('%Y%m%d%H%M')}"},
+            {'$set': {
+                'instance_id': instance_id,
+                'minute': minute,
+                'connects': rollup.connects,
+                'disconnects': rollup.disconnects,
+                'peak_users': rollup.peak_users,
+                'min_users': rollup.min_users,
+                'messages': rollup.messages
+            }},
+            upsert=True
+        ))
+    if operations:
+        get_analytics_collection().bulk_write(operations, ordered=False)
+    return len(operations)
+
+def get_rollups(start, end):
+    # Pelo índice de minute; as falhas chegam ao chamador, que responde com erro
+    return list(get_analytics_collection().find({'minute': {'$gte': start, '$lt': end}}, {'_id': 0}))
+
+def get_all_connected_users():
     try:
-        result = collection.delete_one({'id': user_id})
+        users = list(get_collection().find({'online': True}, {'_id': 0}))  
+        return users
         
-        if result.deleted_count > 0:
-            logger.info(f"Usuário {user_id} removido do banco de dados.")
-            return True
-        else:
-            logger.warning(f"Usuário {user_id} não encontrado para remoção.")
-            return False
-            
     except PyMongoError as e:
-        logger.error(f"Erro ao remover usuário do banco de dados: {str(e)}")
-        return False
+        logger.error(f"Erro ao recuperar usuários conectados: {str(e)}")
+        return []
     
-def set_user_offline(user_id):
+def get_all_users():
     try:
-        current_time = datetime.datetime.now()
-        result = collection.update_one(
-            {'id': user_id},
-            {'$set': {'online': False, 'disconnected_at': current_time}}
-        )
+        users = list(get_collection().find({}, {'_id': 0}))  
+        return users
         
-        if result.modified_count > 0:
-            logger.info(f"Usuário {user_id} atualizado para offline.")
-            return True
-        else:
-            logger.warning(f"Usuário {user_id} não encontrado para atualização de status.")
-            return False
-            
     except PyMongoError as e:
-        logger.error(f"Erro ao atualizar status do usuário: {str(e)}")
-        return False
+        logger.error(f"Erro ao recuperar usuários: {str(e)}")
+        return []
 
-def update_user_activity(user_id):
+def renew_lease(instance_id, ttl_seconds):
+    # Uma escrita por instância a cada renovação mantém online todas as sessões dela.
+    # Devolve True se o lease teve de ser recriado (vencido e removido por outra instância)
+    current_time = datetime.datetime.now()
     try:
-        user = collection.find_one({'id': user_id})
-        if not user:
-            logger.warning(f"Usuário {user_id} não encontrado para atualização de atividade.")
-            return False
-            
-        old_timestamp = user.get('last_active')
-        current_time = datetime.datetime.now()
-        
-        result = collection.update_one(
-            {'id': user_id},
-            {'$set': {
-                'last_active': current_time,
-                'online': True
-            }}
+        result = get_lease_collection().update_one(
+            {'_id': instance_id},
+            {
+                '$set': {
+                    'renewed_at': current_time,
+                    'expires_at': current_time + datetime.timedelta(seconds=ttl_seconds)
+                },
+                '$setOnInsert': {'started_at': current_time}
+            },
+            upsert=True
         )
-        
-        if result.modified_count > 0:
-            logger.info(f"Atividade do usuário {user_id} atualizada: {old_timestamp} -> {current_time}")
-            return True
-        else:
-            logger.warning(f"Atualização de atividade para {user_id} não modificou nenhum documento.")
-            return False
-            
+        return result.upserted_id is not None
+
     except PyMongoError as e:
-        logger.error(f"Erro ao atualizar atividade do usuário: {str(e)}")
+        logger.error(f"Erro ao renovar o lease da instância {instance_id}: {str(e)}")
         return False
 
-def update_username(user_id, new_username):
+def set_instance_sessions_offline(instance_id):
     try:
-        result = collection.update_one(
-            {'id': user_id},
-            {'$set': {'username': new_username}}
+        result = get_collection().update_many(
+            {'instance_id': instance_id, 'online': True},
+            {'$set': {'online': False, 'disconnected_at': datetime.datetime.now()}}
         )
-        
         if result.modified_count > 0:
-            logger.info(f"Nome de usuário atualizado para {new_username} ({user_id})")
-            return new_username
-        else:
-            logger.warning(f"Usuário {user_id} não encontrado para atualização de nome.")
-            return None
-            
+            logger.info(f"{result.modified_count} sessões da instância {instance_id} marcadas como offline")
+        return result.modified_count
+
     except PyMongoError as e:
-        logger.error(f"Erro ao atualizar nome de usuário: {str(e)}")
-        return None
+        logger.error(f"Erro ao encerrar as sessões da instância {instance_id}: {str(e)}")
+        return 0
 
-def get_all_connected_users():
+def set_instance_sessions_online(instance_id, user_ids):
+    # Reafirma as sessões de uma instância viva cujo lease tinha vencido (ex.: banco fora do ar)
     try:
-        users = list(collection.find({'online': True}, {'_id': 0}))  
-        return users
-        
+        result = get_collection().update_many(
+            {'id': {'$in': list(user_ids)}},
+            {'$set': {'online': True, 'disconnected_at': None, 'instance_id': instance_id}}
+        )
+        return result.modified_count
+
     except PyMongoError as e:
-        logger.error(f"Erro ao recuperar usuários conectados: {str(e)}")
-        return []
-    
-def get_all_users():
+        logger.error(f"Erro ao restaurar as sessões da instância {instance_id}: {str(e)}")
+        return 0
+
+def expire_stale_leases():
+    # Leases vencidos são de instâncias que caíram sem se despedir. A remoção
+    # condicional decide qual instância encerra as sessões, e um lease renovado
+    # nesse meio tempo não é removido
+    current_time = datetime.datetime.now()
+    count = 0
     try:
-        users = list(collection.find({}, {'_id': 0}))  
-        return users
-        
+        expired = [lease['_id'] for lease in get_lease_collection().find(
+            {'expires_at': {'$lt': current_time}}, {'_id': 1}
+        )]
+        for instance_id in expired:
+            claimed = get_lease_collection().delete_one({'_id': instance_id, 'expires_at': {'$lt': current_time}})
+            if claimed.deleted_count:
+                logger.warning(f"Lease da instância {instance_id} vencido, encerrando suas sessões")
+                count += set_instance_sessions_offline(instance_id)
     except PyMongoError as e:
-        logger.error(f"Erro ao recuperar usuários: {str(e)}")
-        return []
+        logger.error(f"Erro ao expirar leases vencidos: {str(e)}")
+    return count
 
-def mark_inactive_users_as_offline(inactive_minutes=5):
+def release_lease(instance_id):
     try:
-        cutoff_time = datetime.datetime.now() - datetime.timedelta(minutes=inactive_minutes)
+        get_lease_collection().delete_one({'_id': instance_id})
+    except PyMongoError as e:
+        logger.error(f"Erro ao liberar o lease da instância {instance_id}: {str(e)}")
 
-        logger.info(f"Procurando usuários inativos desde: {cutoff_time}")
-        
-        inactive_users = list(collection.find({
-            'online': True,
-            'last_active': {'$lt': cutoff_time}
-        }))
-        
-        if inactive_users:
-            for user in inactive_users:
-                logger.info(f"Usuário inativo encontrado: {user['username']} ({user['id']}), último ativo: {user['last_active']}")
-        
-        result = collection.update_many(
-            {
-                'online': True,
-                'last_active': {'$lt': cutoff_time}
-            },
-            {
-                '$set': {
-                    'online': False,
-                    'disconnected_at': datetime.datetime.now()
-                }
-            }
+def reconcile_sessions(instance_id, ttl_seconds):
+    # Na subida: assume o próprio lease, derruba as instâncias vencidas e as sessões
+    # online que não pertencem a nenhuma instância viva (inclusive as sem instance_id)
+    renew_lease(instance_id, ttl_seconds)
+    count = expire_stale_leases()
+    try:
+        live = [lease['_id'] for lease in get_lease_collection().find({}, {'_id': 1})]
+        result = get_collection().update_many(
+            {'online': True, 'instance_id': {'$nin': live}},
+            {'$set': {'online': False, 'disconnected_at': datetime.datetime.now()}}
         )
-        
-        count = result.modified_count
-        if count > 0:
-            logger.info(f"Marcados {count} usuários inativos como offline")
-        return count
+        count += result.modified_count
     except PyMongoError as e:
-        logger.error(f"Erro ao marcar usuários inativos: {str(e)}")
-        return 0
+        logger.error(f"Erro ao reconciliar sessões: {str(e)}")
+    logger.info(f"Reconciliação concluída: {count} sessões órfãs marcadas como offline")
+    return count
 
 def close_connection():
+    global _client
+    if _client is None:
+        return
     try:
-        client.close()
+        _client.close()
+        _client = None
         logger.info("Conexão com MongoDB fechada.")
     except PyMongoError as e:
         logger.error(f"Erro ao fechar conexão com MongoDB: {str(e)}")
\ No newline at end of file
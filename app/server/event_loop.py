@@ -0,0 +1,26 @@
+import asyncio
+import logging
+
+logger = logging.getLogger('websocket_server.event_loop')
+
+EVENT_LOOP_BACKENDS = ("asyncio", "uvloop", "auto")
+
+# Compartilhado com o cliente (app/client/main.py), que passa o próprio logger
+def install_event_loop(backend: str = "asyncio", log: logging.Logger = logger) -> str:
+    # "auto" usa o uvloop quando instalado e cai no loop padrão caso contrário
+    if backend not in EVENT_LOOP_BACKENDS:
+        log.warning(f"Loop de eventos desconhecido '{backend}', usando asyncio")
+        return "asyncio"
+
+    if backend == "asyncio":
+        return "asyncio"
+
+    try:
+        import uvloop
+    except ImportError:
+        if backend == "uvloop":
+            log.warning("uvloop não está instalado, usando o loop padrão do asyncio")
+        return "asyncio"
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
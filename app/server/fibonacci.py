@@ -1,28 +1,320 @@
-
 import logging
+import operator
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List
 
 logger = logging.getLogger('websocket_server.fibonacci')
 
+_result_store = None
+_store_min_n = 0
+_shared_cache = None
+_shared_cache_min_n = 0
+
+def configure_result_store(store, min_n: int = 10000):
+    # Valores de n abaixo de min_n são baratos demais para valer um checkpoint em disco
+    global _result_store, _store_min_n
+    _result_store = store
+    _store_min_n = min_n
+
+def configure_shared_cache(cache, min_n: int = 1000):
+    global _shared_cache, _shared_cache_min_n
+    _shared_cache = cache
+    _shared_cache_min_n = min_n
+
+def get_shared_cache():
+    return _shared_cache, _shared_cache_min_n
+
+# Modo paralelo para n enorme: fast doubling com as multiplicações gigantes
+# repartidas entre processos (0 desativa; 1 usa o fast doubling sem pool)
+_parallel_workers = 0
+_parallel_min_n = 0
+_parallel_pool = None
+_parallel_lock = threading.Lock()
+# Abaixo deste tamanho (bits) a ida e volta ao processo custa mais que o produto
+_PARALLEL_MIN_BITS = 1 << 20
+
+def configure_parallel(workers: int, min_n: int = 5_000_000):
+    global _parallel_workers, _parallel_min_n, _parallel_pool
+    with _parallel_lock:
+        if _parallel_pool is not None:
+            _parallel_pool.shutdown(cancel_futures=True)
+            _parallel_pool = None
+        _parallel_workers = workers
+        _parallel_min_n = min_n
+
+def get_parallel():
+    return _parallel_workers, _parallel_min_n
+
+def _get_parallel_pool():
+    # Criado no primeiro n grande: quem nunca calcula um não sobe os processos
+    global _parallel_pool
+    with _parallel_lock:
+        if _parallel_pool is None and _parallel_workers > 1:
+            _parallel_pool = ProcessPoolExecutor(max_workers=_parallel_workers)
+            logger.info(f"Pool de multiplicação paralela com {_parallel_workers} processos")
+        return _parallel_pool
+
+# Custo aproximado do laço iterativo: sobrecarga por iteração mais as somas de
+# inteiros cada vez maiores, que crescem com n²
+_SECONDS_PER_STEP = 4e-8
+_SECONDS_PER_STEP_SQUARED = 1.2e-11
+_SECONDS_PER_CACHED_BIT = 1e-9
+
+# Fast doubling: dominado pelos últimos produtos (Karatsuba, ~n^1,585). No modo
+# paralelo cada produto rende 3^profundidade partes, com perdas de IPC e da
+# soma final que ficam no processo principal
+_FAST_DOUBLING_SCALE = 2.3e-11
+_KARATSUBA_EXPONENT = 1.585
+_PARALLEL_EFFICIENCY = 0.6
+
+def estimate_cost(n: int, use_checkpoints: bool = True) -> float:
+    # Estimativa em segundos, considerando o que já está em cache ou em checkpoint.
+    # Quem calcula fora deste processo não enxerga os checkpoints (use_checkpoints=False)
+    if n < 2:
+        return 0.0
+
+    if _shared_cache is not None and n >= _shared_cache_min_n and _shared_cache.contains(n):
+        return n * _SECONDS_PER_CACHED_BIT
+
+    if _parallel_workers > 0 and n >= _parallel_min_n:
+        return _FAST_DOUBLING_SCALE * n ** _KARATSUBA_EXPONENT / _parallel_speedup()
+
+    start = 0
+    if use_checkpoints and _result_store is not None and n >= _store_min_n:
+        k = _result_store.nearest_key(n)
+        if k is not None:
+            if k == n:
+                return n * _SECONDS_PER_CACHED_BIT
+            start = k
+
+    steps = n - start
+    return steps * _SECONDS_PER_STEP + (n * n - start * start) * _SECONDS_PER_STEP_SQUARED
+
 def calculate_fibonacci(n: int) -> int:
     if not isinstance(n, int):
         logger.warning(f"Valor não inteiro recebido: {n}")
         raise TypeError("O valor de n deve ser um inteiro")
-    
+
     if n < 0:
         logger.warning(f"Valor negativo recebido: {n}")
         raise ValueError("O valor de n não pode ser negativo")
-    
+
     if n == 0:
         return 0
     elif n == 1:
         return 1
-    
-    a, b = 0, 1
-    
+
+    use_shared_cache = _shared_cache is not None and n >= _shared_cache_min_n
+    if use_shared_cache:
+        cached = _shared_cache.get(n)
+        if cached is not None:
+            return cached
+
+    if _parallel_workers > 0 and n >= _parallel_min_n:
+        logger.info(f"Calculando Fibonacci({n}) por fast doubling com {_parallel_workers} processo(s)")
+        result = _fast_doubling(n)
+        if use_shared_cache:
+            _shared_cache.put(n, result)
+        return result
+
+    start, a, b = 1, 0, 1
+
+    if _result_store is not None and n >= _store_min_n:
+        checkpoint = _result_store.nearest_pair(n)
+        if checkpoint is not None:
+            k, first, second = checkpoint
+            if k == n:
+                if use_shared_cache:
+                    _shared_cache.put(n, first)
+                return first
+            # Retoma a iteração a partir do checkpoint (F(k), F(k+1))
+            start, a, b = k + 1, first, second
+            logger.info(f"Retomando Fibonacci({n}) a partir do checkpoint F({k})")
+
     if n > 35:
         logger.info(f"Calculando Fibonacci para um valor grande: {n}")
-    
-    for _ in range(2, n + 1):
+
+    for _ in range(start + 1, n + 1):
         a, b = b, a + b
-    
-    return b
\ No newline at end of file
+
+    if _result_store is not None and n >= _store_min_n:
+        _result_store.put_pair(n - 1, a, b)
+
+    if use_shared_cache:
+        _shared_cache.put(n, b)
+
+    return b
+
+def _parallel_depth() -> int:
+    # Níveis de Karatsuba abertos por produto: um passo tem 3 produtos, cada nível multiplica por 3
+    depth, parts = 0, 3
+    while parts < _parallel_workers and depth < 3:
+        depth, parts = depth + 1, parts * 3
+    return depth
+
+def _parallel_speedup() -> float:
+    if _parallel_workers <= 1:
+        return 1.0
+    parts = 3 ** (_parallel_depth() + 1)
+    return max(1.0, _PARALLEL_EFFICIENCY * min(_parallel_workers, parts))
+
+def _multiply(x: int, y=None) -> int:
+    # Executado nos processos do pool; y None é quadrado, mais barato no CPython
+    return x * x if y is None else x * y
+
+def _karatsuba_plan(x: int, y, depth: int, leaves: list):
+    # Abre x·y (ou x² se y for None) em produtos independentes pelos níveis de cima do
+    # Karatsuba: z0 = x0·y0, z2 = x1·y1, z1 = (x0+x1)(y0+y1) - z0 - z2
+    size = max(x.bit_length(), y.bit_length() if y is not None else 0)
+    if depth == 0 or size < 2 * _PARALLEL_MIN_BITS:
+        leaves.append((x, y))
+        return len(leaves) - 1
+
+    shift = size // 2
+    mask = (1 << shift) - 1
+    x1, x0 = x >> shift, x & mask
+    if y is None:
+        parts = (_karatsuba_plan(x0, None, depth - 1, leaves), _karatsuba_plan(x1, None, depth - 1, leaves),
+                 _karatsuba_plan(x0 + x1, None, depth - 1, leaves))
+    else:
+        y1, y0 = y >> shift, y & mask
+        parts = (_karatsuba_plan(x0, y0, depth - 1, leaves), _karatsuba_plan(x1, y1, depth - 1, leaves),
+                 _karatsuba_plan(x0 + x1, y0 + y1, depth - 1, leaves))
+    return shift, parts
+
+def _karatsuba_combine(plan, values: list) -> int:
+    if isinstance(plan, int):
+        return values[plan]
+    shift, (low, high, middle) = plan
+    z0 = _karatsuba_combine(low, values)
+    z2 = _karatsuba_combine(high, values)
+    z1 = _karatsuba_combine(middle, values) - z0 - z2
+    return (z2 << (2 * shift)) + (z1 << shift) + z0
+
+def _products(pairs: list) -> list:
+    # Produtos de um passo do fast doubling: pequenos aqui mesmo, grandes no pool
+    pool = _get_parallel_pool()
+    if pool is None or max(x.bit_length() for x, _ in pairs) < _PARALLEL_MIN_BITS:
+        return [_multiply(x, y) for x, y in pairs]
+
+    leaves = []
+    plans = [_karatsuba_plan(x, y, _parallel_depth(), leaves) for x, y in pairs]
+    futures = [pool.submit(_multiply, x, y) for x, y in leaves]
+    values = [future.result() for future in futures]
+    return [_karatsuba_combine(plan, values) for plan in plans]
+
+def _fast_doubling(n: int) -> int:
+    # F(2k) = F(k)(2F(k+1) - F(k)), F(2k+1) = F(k)² + F(k+1)²; os três produtos de
+    # cada passo são independentes
+    a, b = 0, 1
+    bits = bin(n)[2:]
+    for bit in bits[:-1]:
+        c, a_squared, b_squared = _products([(a, 2 * b - a), (a, None), (b, None)])
+        d = a_squared + b_squared
+        a, b = (d, c + d) if bit == "1" else (c, d)
+
+    # O último passo só precisa de F(n), não de F(n+1)
+    if bits[-1] == "1":
+        a_squared, b_squared = _products([(a, None), (b, None)])
+        return a_squared + b_squared
+    return _products([(a, 2 * b - a)])[0]
+
+# Fibonacci modular em lote. O numpy é opcional: importado no primeiro uso (os
+# processos de cálculo e a subida do servidor não pagam por ele) e, se faltar,
+# o lote cai no laço por elemento
+MAX_BATCH_MODULUS = 1 << 62
+_DIRECT_MODULUS = 1 << 32
+_MAX_BATCH_N = (1 << 63) - 1
+_BATCH_CHUNK = 16384
+_numpy = None
+
+def _load_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            logger.warning("numpy não está instalado, Fibonacci modular em lote usará o laço por elemento")
+            _numpy = False
+    return _numpy
+
+def fibonacci_mod(n: int, modulus: int) -> int:
+    # Fast doubling com inteiros do Python: F(2k) = F(k)(2F(k+1) - F(k)), F(2k+1) = F(k)² + F(k+1)²
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        c = a * (2 * b - a) % modulus
+        d = (a * a + b * b) % modulus
+        a, b = (d, (c + d) % modulus) if bit == "1" else (c, d)
+    return a % modulus
+
+def _validate_batch(ns: List[int], modulus: int):
+    if not isinstance(modulus, int) or not 1 <= modulus <= MAX_BATCH_MODULUS:
+        raise ValueError("O módulo deve ser um inteiro entre 1 e 2^62")
+    for n in ns:
+        if not 0 <= n <= _MAX_BATCH_N:
+            raise ValueError("Os valores de n devem estar entre 0 e 2^63 - 1")
+
+def _mulmod_wide(np, a, b, m, signed_m, scale):
+    # a·b mod m para m ≤ 2^62 sem estourar 64 bits: a e b em metades de 31 bits,
+    # cada produto parcial < 2^62, recombinados por Horner com deslocamentos de 31 bits
+    mask = np.uint64((1 << 31) - 1)
+    shift = np.uint64(31)
+    a1, a0 = a >> shift, a & mask
+    b1, b0 = b >> shift, b & mask
+    t = (a1 * b1) % m
+    t = _shift31_mod(np, t, m, signed_m, scale)
+    t = (t + (a1 * b0) % m + (a0 * b1) % m) % m
+    t = _shift31_mod(np, t, m, signed_m, scale)
+    return (t + (a0 * b0) % m) % m
+
+def _shift31_mod(np, x, m, signed_m, scale):
+    # x·2^31 mod m com x < m: o quociente vem do float64 (erro de no máximo 1) e o
+    # resto sai exato da aritmética de 64 bits com estouro, corrigido em ±m
+    q = (x.astype(np.float64) * scale).astype(np.uint64)
+    r = ((x << np.uint64(31)) - q * m).view(np.int64)
+    r = np.where(r < 0, r + signed_m, r)
+    r = np.where(r >= signed_m, r - signed_m, r)
+    return r.view(np.uint64)
+
+def fibonacci_mod_batch(ns: Iterable[int], modulus: int) -> List[int]:
+    # F(n) mod m para muitos n de uma vez: o fast doubling anda em passo único por
+    # todos os elementos, um bit de n por vez, com operações vetoriais do numpy
+    try:
+        # Aceita int e os inteiros do numpy, mas não float nem texto
+        ns = [operator.index(n) for n in ns]
+    except TypeError:
+        raise TypeError("Os valores de n devem ser inteiros")
+    _validate_batch(ns, modulus)
+    if not ns:
+        return []
+
+    np = _load_numpy()
+    if not np or modulus == 1:
+        return [fibonacci_mod(n, modulus) for n in ns]
+
+    m = np.uint64(modulus)
+    if modulus <= _DIRECT_MODULUS:
+        # Valores < 2^32: o produto cabe em 64 bits
+        mulmod = lambda x, y: (x * y) % m
+    else:
+        signed_m, scale = np.int64(modulus), float(1 << 31) / modulus
+        mulmod = lambda x, y: _mulmod_wide(np, x, y, m, signed_m, scale)
+
+    # Em blocos: os vetores temporários de cada passo cabem no cache
+    results = []
+    for start in range(0, len(ns), _BATCH_CHUNK):
+        chunk = ns[start:start + _BATCH_CHUNK]
+        values = np.array(chunk, dtype=np.uint64)
+        a = np.zeros(len(chunk), dtype=np.uint64)
+        b = np.ones(len(chunk), dtype=np.uint64)
+        for position in range(max(chunk).bit_length() - 1, -1, -1):
+            # 2b - a + m < 3m ≤ 3·2^62 não estoura
+            c = mulmod(a, (b + b + m - a) % m)
+            d = (mulmod(a, a) + mulmod(b, b)) % m
+            bit = ((values >> np.uint64(position)) & np.uint64(1)).astype(bool)
+            a, b = np.where(bit, d, c), np.where(bit, (c + d) % m, d)
+        results.extend(a.tolist())
+
+    return results
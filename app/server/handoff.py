@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+import socket
+
+logger = logging.getLogger('websocket_server.handoff')
+
+# Troca de processo sem janela de accept: o sucessor se conecta ao socket Unix
+# do antecessor e recebe os descritores dos sockets de escuta (SCM_RIGHTS). O
+# antecessor então para de aceitar e entra em drain; as conexões que chegarem
+# nesse meio tempo esperam no backlog do kernel, que é compartilhado.
+_MAGIC = b"WSFD"
+_MAX_FDS = 16
+
+
+def receive_listeners(path: str, timeout: float = 5.0):
+    # Lado do sucessor: devolve os sockets herdados, ou [] se não houver antecessor
+    if not path or not os.path.exists(path):
+        return []
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(path)
+            message, fds, _, _ = socket.recv_fds(conn, len(_MAGIC), _MAX_FDS)
+    except OSError as e:
+        # Caminho antigo de um processo que já não existe
+        logger.info(f"Nenhum antecessor respondeu em {path}: {str(e)}")
+        return []
+
+    if message != _MAGIC or not fds:
+        for fd in fds:
+            os.close(fd)
+        logger.warning(f"Resposta inválida na passagem de sockets por {path}")
+        return []
+
+    listeners = [socket.socket(fileno=fd) for fd in fds]
+    logger.info(f"Recebidos {len(listeners)} socket(s) de escuta do processo anterior via {path}")
+    return listeners
+
+
+class HandoffListener:
+    # Lado do antecessor: atende um único sucessor e chama on_handoff depois de
+    # entregar os descritores
+    def __init__(self, path: str, get_sockets, on_handoff):
+        self.path = path
+        self.get_sockets = get_sockets
+        self.on_handoff = on_handoff
+        self._sock = None
+
+    def open(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen(1)
+        self._sock.setblocking(False)
+        logger.info(f"Aguardando sucessor para passagem de sockets em {self.path}")
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        while self._sock is not None:
+            conn, _ = await loop.sock_accept(self._sock)
+            with conn:
+                conn.setblocking(True)
+                try:
+                    socket.send_fds(conn, [_MAGIC], [sock.fileno() for sock in self.get_sockets()])
+                except OSError as e:
+                    logger.error(f"Falha ao entregar os sockets de escuta: {str(e)}")
+                    continue
+
+            logger.info("Sockets de escuta entregues ao sucessor")
+            # O sucessor recria o caminho; aqui só se fecha o socket
+            self._sock.close()
+            self._sock = None
+            self.on_handoff()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
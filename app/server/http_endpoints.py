@@ -0,0 +1,61 @@
+import http
+import json
+import logging
+from urllib.parse import parse_qs, urlsplit
+
+from websockets.datastructures import Headers
+from websockets.http11 import Response
+
+logger = logging.getLogger('websocket_server.http')
+
+
+class HttpRequest:
+    # Normaliza as duas assinaturas do hook process_request do websockets:
+    # a API legada chama (path, headers) e a nova chama (connection, request)
+    __slots__ = ("path", "query", "headers", "connection", "legacy")
+
+    def __init__(self, first, second):
+        if isinstance(first, str):
+            self.legacy = True
+            self.connection = None
+            target = first
+            self.headers = second
+        else:
+            self.legacy = False
+            self.connection = first
+            target = second.path
+            self.headers = second.headers
+
+        parts = urlsplit(target)
+        self.path = parts.path
+        self.query = parse_qs(parts.query)
+
+    @property
+    def is_websocket_upgrade(self):
+        return "websocket" in self.headers.get("Upgrade", "").lower()
+
+    @property
+    def remote_address(self):
+        if self.connection is not None:
+            address = getattr(self.connection, "remote_address", None)
+            if address:
+                return address[0]
+        return None
+
+
+def json_response(request: HttpRequest, status: http.HTTPStatus, payload):
+    body = payload if isinstance(payload, str) else json.dumps(payload)
+    return text_response(request, status, body, "application/json")
+
+
+def text_response(request: HttpRequest, status: http.HTTPStatus, body: str, content_type="text/plain; charset=utf-8"):
+    data = body.encode("utf-8")
+    headers = [
+        ("Content-Type", content_type),
+        ("Content-Length", str(len(data))),
+        ("Cache-Control", "no-store"),
+    ]
+
+    if request.legacy:
+        return status, headers, data
+    return Response(status.value, status.phrase, Headers(headers), data)
@@ -3,8 +3,18 @@ import logging
 import signal
 
 from server import WebSocketServer
-from database import init_database
-from config import SERVER_HOST, SERVER_PORT, LOG_LEVEL, LOG_FORMAT
+from handoff import receive_listeners
+from fibonacci import configure_result_store, configure_shared_cache, configure_parallel
+from result_store import ResultStore
+from shared_cache import SharedFibonacciCache
+from event_loop import install_event_loop
+from config import (
+    SERVER_HOST, SERVER_PORT, LOG_LEVEL, LOG_FORMAT, EVENT_LOOP,
+    FIB_STORE_PATH, FIB_STORE_MAX_BYTES, FIB_STORE_MIN_N,
+    FIB_SHARED_CACHE_NAME, FIB_SHARED_CACHE_BYTES, FIB_SHARED_CACHE_SLOTS, FIB_SHARED_CACHE_MIN_N,
+    FIB_PARALLEL_WORKERS, FIB_PARALLEL_MIN_N,
+    HANDOFF_PATH
+)
 
 logging.basicConfig(
     level=LOG_LEVEL,
@@ -15,33 +25,62 @@ logger = logging.getLogger('websocket_server')
 
 server = None
 
-def handle_shutdown(signum, frame):
+def handle_shutdown(signum):
     logger.info(f"Sinal recebido {signum}, iniciando desligamento gracioso...")
-    if server and hasattr(server, 'server') and server.server:
-        server.running = False
-        server.server.close()
+    if server and server.server:
+        # Primeiro sinal: drain; segundo: fecha as conexões restantes na hora
+        server.begin_drain()
         logger.info("Servidor está sendo encerrado...")
 
 async def main():
     global server
 
-    try:
-        init_database()
-    except Exception as e:
-        logger.error(f"Falha ao inicializar o banco de dados: {str(e)}")
-        return
+    if FIB_STORE_PATH:
+        try:
+            configure_result_store(ResultStore(FIB_STORE_PATH, FIB_STORE_MAX_BYTES), FIB_STORE_MIN_N)
+        except OSError as e:
+            logger.error(f"Falha ao abrir o armazenamento de resultados: {str(e)}")
+
+    shared_cache = None
+    if FIB_SHARED_CACHE_BYTES > 0:
+        try:
+            shared_cache = SharedFibonacciCache.open(
+                FIB_SHARED_CACHE_NAME, FIB_SHARED_CACHE_BYTES, FIB_SHARED_CACHE_SLOTS
+            )
+            configure_shared_cache(shared_cache, FIB_SHARED_CACHE_MIN_N)
+        except (OSError, ValueError) as e:
+            logger.error(f"Falha ao abrir o cache compartilhado: {str(e)}")
+
+    if FIB_PARALLEL_WORKERS > 0:
+        configure_parallel(FIB_PARALLEL_WORKERS, FIB_PARALLEL_MIN_N)
 
     server = WebSocketServer(host=SERVER_HOST, port=SERVER_PORT)
 
-    signal.signal(signal.SIGINT, handle_shutdown)
-    signal.signal(signal.SIGTERM, handle_shutdown)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, handle_shutdown, signum)
+
+    # Se houver um processo anterior ouvindo em HANDOFF_PATH, herda o socket de escuta dele
+    listeners = await asyncio.to_thread(receive_listeners, HANDOFF_PATH)
+    for extra in listeners[1:]:
+        logger.warning(f"Socket de escuta adicional ignorado: {extra.getsockname()}")
+        extra.close()
     
     try:
-        await server.start()
+        await server.start(sock=listeners[0] if listeners else None)
     except Exception as e:
         logger.error(f"Erro ao iniciar o servidor: {str(e)}")
+    finally:
+        configure_parallel(0)
+        if shared_cache:
+            configure_shared_cache(None)
+            # O segmento passa ao sucessor junto com os sockets de escuta: quem entregou
+            # não o remove, e quem os herdou passa a ser o responsável pela remoção
+            shared_cache.close(unlink=False if server.handed_off else (True if listeners else None))
 
 if __name__ == "__main__":
+    backend = install_event_loop(EVENT_LOOP)
+    logger.info(f"Loop de eventos: {backend}")
     try:
         asyncio.run(main())
         logger.info("Servidor encerrado.")
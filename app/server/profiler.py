@@ -0,0 +1,117 @@
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger('websocket_server.profiler')
+
+# Módulos do próprio servidor: o tempo inclusivo é reportado só para eles
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_APP_MODULES = {
+    name for name in os.listdir(_APP_DIR)
+    if name.endswith(".py") and name not in ("profiler.py", "watchdog.py", "main.py")
+}
+
+
+class SamplingProfiler:
+    # Amostra as pilhas periodicamente a partir de uma thread separada:
+    # nada é instrumentado, então o custo fica limitado ao intervalo de amostragem
+    def __init__(self, max_seconds: float = 30.0, min_interval: float = 0.001, max_stacks: int = 500):
+        self.max_seconds = max_seconds
+        self.min_interval = min_interval
+        self.max_stacks = max_stacks
+        self._running = threading.Lock()
+        self._labels = {}
+
+    @property
+    def busy(self) -> bool:
+        return self._running.locked()
+
+    def profile(self, seconds: float, interval: float, thread_ids=None):
+        # Bloqueante: deve ser chamado fora do loop de eventos (asyncio.to_thread)
+        if not (math.isfinite(seconds) and math.isfinite(interval)) or seconds <= 0 or interval <= 0:
+            raise ValueError("A duração e o intervalo da coleta devem ser números positivos")
+        if not self._running.acquire(blocking=False):
+            raise RuntimeError("Já existe uma coleta de perfil em andamento")
+
+        try:
+            seconds = min(max(seconds, 0.1), self.max_seconds)
+            interval = max(interval, self.min_interval)
+            own_thread = threading.get_ident()
+            stacks = Counter()
+            samples = 0
+
+            started = time.perf_counter()
+            deadline = started + seconds
+            next_sample = started
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                if now < next_sample:
+                    time.sleep(next_sample - now)
+                next_sample += interval
+
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread or (thread_ids is not None and thread_id not in thread_ids):
+                        continue
+                    stacks[self._collapse(frame)] += 1
+                frame = None
+                samples += 1
+
+            return self._report(stacks, samples, time.perf_counter() - started, interval)
+        finally:
+            self._running.release()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            directory, filename = os.path.split(code.co_filename)
+            # Frames de bibliotecas levam o pacote para não colidir com os módulos do servidor
+            if directory != _APP_DIR:
+                filename = f"{os.path.basename(directory)}/{filename}"
+            label = f"{filename}:{code.co_name}"
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, frame):
+        names = []
+        while frame is not None:
+            names.append(self._label(frame.f_code))
+            frame = frame.f_back
+        names.reverse()
+        return ";".join(names)
+
+    def _report(self, stacks, samples, elapsed, interval):
+        # Percentuais relativos ao número de amostragens: quanto do tempo cada frame esteve em alguma pilha
+        total = samples or 1
+        leaves = Counter()
+        inclusive = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(";")
+            leaves[frames[-1]] += count
+            for name in set(frames):
+                if name.split(":", 1)[0] in _APP_MODULES:
+                    inclusive[name] += count
+
+        # Formato "collapsed" (um stack por linha seguido da contagem), pronto para flamegraph.pl/speedscope
+        collapsed = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common(self.max_stacks))
+        return {
+            "samples": samples,
+            "duration": round(elapsed, 3),
+            "interval_ms": interval * 1000,
+            "format": "collapsed",
+            "stacks": collapsed,
+            "truncated": len(stacks) > self.max_stacks,
+            "top_self": self._top(leaves, total),
+            "top_inclusive": self._top(inclusive, total)
+        }
+
+    def _top(self, counter, total, limit=15):
+        return [
+            {"frame": name, "samples": count, "percent": round(count * 100 / total, 1)}
+            for name, count in counter.most_common(limit)
+        ]
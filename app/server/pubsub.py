@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Iterable, Set
+
+logger = logging.getLogger('websocket_server.pubsub')
+
+_RATE_WINDOW = 60
+
+
+class TopicStats:
+    __slots__ = ("messages", "deliveries", "dropped", "_buckets", "_bucket_seconds")
+
+    def __init__(self):
+        self.messages = 0
+        self.deliveries = 0
+        self.dropped = 0
+        self._buckets = [0] * _RATE_WINDOW
+        self._bucket_seconds = [0] * _RATE_WINDOW
+
+    def record(self, delivered, dropped):
+        second = int(time.monotonic())
+        index = second % _RATE_WINDOW
+        if self._bucket_seconds[index] != second:
+            self._bucket_seconds[index] = second
+            self._buckets[index] = 0
+        self._buckets[index] += 1
+
+        self.messages += 1
+        self.deliveries += delivered
+        self.dropped += dropped
+
+    def rate(self):
+        # Mensagens por segundo na última janela de 60 s
+        now = int(time.monotonic())
+        recent = sum(
+            count for count, second in zip(self._buckets, self._bucket_seconds)
+            if now - second < _RATE_WINDOW
+        )
+        return recent / _RATE_WINDOW
+
+
+class TopicRegistry:
+    def __init__(self, fanout_concurrency: int = 256, send_timeout: float = 5.0,
+                 max_buffer: int = 256 * 1024, max_topics_per_client: int = 32):
+        self.fanout_concurrency = fanout_concurrency
+        self.send_timeout = send_timeout
+        self.max_buffer = max_buffer
+        self.max_topics_per_client = max_topics_per_client
+        self.subscribers: Dict[str, Set] = {}
+        self.stats: Dict[str, TopicStats] = {}
+
+    def subscribe(self, topic: str, state):
+        if state.topics is None:
+            state.topics = set()
+        if topic not in state.topics and len(state.topics) >= self.max_topics_per_client:
+            raise ValueError(f"Limite de {self.max_topics_per_client} tópicos por cliente atingido")
+
+        state.topics.add(topic)
+        self.subscribers.setdefault(topic, set()).add(state)
+        self.stats.setdefault(topic, TopicStats())
+
+    def unsubscribe(self, topic: str, state):
+        if state.topics:
+            state.topics.discard(topic)
+        subscribers = self.subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(state)
+            if not subscribers:
+                # Sem inscritos o tópico deixa de existir, junto com as estatísticas
+                del self.subscribers[topic]
+                self.stats.pop(topic, None)
+
+    def unsubscribe_all(self, state):
+        for topic in list(state.topics or ()):
+            self.unsubscribe(topic, state)
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self.subscribers.get(topic))
+
+    async def publish(self, topic: str, payload, sender=None):
+        subscribers = list(self.subscribers.get(topic, ()))
+        if not subscribers:
+            # Publicar em tópicos sem inscritos não pode criar estado no servidor
+            return 0, 0
+        # A mensagem é serializada uma única vez e reaproveitada para todos os inscritos
+        message = json.dumps({
+            "type": "topic_message",
+            "topic": topic,
+            "from": sender,
+            "payload": payload
+        })
+        delivered, dropped = await self.fan_out(message, subscribers)
+        stats = self.stats.get(topic)
+        if stats is not None:
+            stats.record(delivered, dropped)
+        return delivered, dropped
+
+    async def fan_out(self, message: str, subscribers: Iterable):
+        semaphore = asyncio.Semaphore(self.fanout_concurrency)
+
+        async def deliver(state):
+            if self._buffered_bytes(state) > self.max_buffer:
+                # Consumidor lento: descarta em vez de acumular no buffer de escrita
+                return False
+            async with semaphore:
+                try:
+                    await asyncio.wait_for(state.websocket.send(message), self.send_timeout)
+                    state.messages_sent += 1
+                    return True
+                except Exception:
+                    return False
+
+        results = await asyncio.gather(*(deliver(state) for state in subscribers))
+        delivered = sum(results)
+        return delivered, len(results) - delivered
+
+    def _buffered_bytes(self, state):
+        transport = getattr(state.websocket, "transport", None)
+        if transport is None:
+            return 0
+        try:
+            return transport.get_write_buffer_size()
+        except (AttributeError, RuntimeError):
+            return 0
+
+    def topic_stats(self):
+        return [
+            {
+                "topic": topic,
+                "subscribers": len(self.subscribers.get(topic, ())),
+                "messages": stats.messages,
+                "deliveries": stats.deliveries,
+                "dropped": stats.dropped,
+                "rate_per_second": round(stats.rate(), 3)
+            }
+            for topic, stats in sorted(self.stats.items())
+        ]
@@ -0,0 +1,220 @@
+import bisect
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+logger = logging.getLogger('websocket_server.result_store')
+
+# Cada registro guarda um par de checkpoint (F(k), F(k+1)) em bytes little-endian:
+# magic, k, tamanho de F(k), tamanho de F(k+1), crc32 dos dados
+_HEADER = struct.Struct("<4sQQQI")
+_MAGIC = b"FIB1"
+
+
+class _Entry:
+    __slots__ = ("offset", "first_length", "second_length")
+
+    def __init__(self, offset, first_length, second_length):
+        self.offset = offset
+        self.first_length = first_length
+        self.second_length = second_length
+
+    @property
+    def size(self):
+        return _HEADER.size + self.first_length + self.second_length
+
+
+class ResultStore:
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._keys = []
+        self._file = None
+        self._map = None
+        self._mapped_size = 0
+        self._size = 0
+
+        self._open()
+
+    def _open(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._file = open(self.path, "a+b")
+        self._size = self._load_index()
+        logger.info(f"Armazenamento de resultados aberto em {self.path}: "
+                    f"{len(self._entries)} checkpoints, {self._size} bytes")
+
+    def _load_index(self):
+        self._entries.clear()
+        self._keys = []
+        self._remap()
+
+        offset = 0
+        file_size = self._mapped_size
+        while offset + _HEADER.size <= file_size:
+            magic, k, first_length, second_length, checksum = _HEADER.unpack_from(self._map, offset)
+            end = offset + _HEADER.size + first_length + second_length
+            if magic != _MAGIC or end > file_size:
+                break
+            if zlib.crc32(self._map[offset + _HEADER.size:end]) != checksum:
+                break
+
+            self._entries.pop(k, None)
+            self._entries[k] = _Entry(offset, first_length, second_length)
+            offset = end
+
+        if offset < file_size:
+            # Escrita interrompida por uma queda: descarta o final incompleto
+            logger.warning(f"Descartando {file_size - offset} bytes corrompidos no fim de {self.path}")
+            self._unmap()
+            self._file.truncate(offset)
+            self._sync()
+            self._remap()
+
+        self._keys = sorted(self._entries)
+        return offset
+
+    def _remap(self):
+        self._unmap()
+        self._file.flush()
+        size = os.fstat(self._file.fileno()).st_size
+        if size > 0:
+            self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        self._mapped_size = size
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._mapped_size = 0
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _read_int(self, start, length):
+        # int.from_bytes lê direto da fatia do mmap, sem bytes intermediário; a única
+        # cópia é a do próprio int, inevitável porque o cálculo continua a partir dele
+        view = memoryview(self._map)
+        try:
+            with view[start:start + length] as chunk:
+                return int.from_bytes(chunk, "little")
+        finally:
+            view.release()
+
+    def _read_pair(self, entry):
+        if entry.offset + entry.size > self._mapped_size:
+            self._remap()
+        start = entry.offset + _HEADER.size
+        first = self._read_int(start, entry.first_length)
+        second = self._read_int(start + entry.first_length, entry.second_length)
+        return first, second
+
+    def nearest_key(self, n: int):
+        # Só consulta o índice em memória, sem ler o par do disco
+        with self._lock:
+            position = bisect.bisect_right(self._keys, n)
+            return self._keys[position - 1] if position else None
+
+    def nearest_pair(self, n: int):
+        with self._lock:
+            position = bisect.bisect_right(self._keys, n)
+            if position == 0:
+                return None
+            k = self._keys[position - 1]
+            entry = self._entries[k]
+            self._entries.move_to_end(k)
+            first, second = self._read_pair(entry)
+            return k, first, second
+
+    def put_pair(self, k: int, first: int, second: int):
+        first_bytes = first.to_bytes((first.bit_length() + 7) // 8, "little")
+        second_bytes = second.to_bytes((second.bit_length() + 7) // 8, "little")
+        payload = first_bytes + second_bytes
+        record_size = _HEADER.size + len(payload)
+
+        if record_size > self.max_bytes:
+            logger.warning(f"Checkpoint F({k}) excede o limite do armazenamento ({record_size} bytes)")
+            return False
+
+        with self._lock:
+            if k in self._entries:
+                self._entries.move_to_end(k)
+                return True
+
+            if self._size + record_size > self.max_bytes:
+                self._evict(self.max_bytes - record_size)
+
+            header = _HEADER.pack(_MAGIC, k, len(first_bytes), len(second_bytes), zlib.crc32(payload))
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(header)
+            self._file.write(payload)
+            self._sync()
+
+            self._entries[k] = _Entry(self._size, len(first_bytes), len(second_bytes))
+            bisect.insort(self._keys, k)
+            self._size += record_size
+            return True
+
+    def _evict(self, target_size):
+        # Remove os checkpoints menos usados recentemente e compacta o arquivo
+        kept_size = sum(entry.size for entry in self._entries.values())
+        evicted = 0
+        while self._entries and kept_size > target_size:
+            _, entry = self._entries.popitem(last=False)
+            kept_size -= entry.size
+            evicted += 1
+
+        self._compact()
+        logger.info(f"{evicted} checkpoints removidos do armazenamento de resultados")
+
+    def _compact(self):
+        temporary_path = self.path + ".tmp"
+        if self._mapped_size < self._size:
+            self._remap()
+
+        new_entries = OrderedDict()
+        offset = 0
+        with open(temporary_path, "wb") as output:
+            for k, entry in self._entries.items():
+                output.write(self._map[entry.offset:entry.offset + entry.size])
+                new_entries[k] = _Entry(offset, entry.first_length, entry.second_length)
+                offset += entry.size
+            output.flush()
+            os.fsync(output.fileno())
+
+        self._unmap()
+        self._file.close()
+        os.replace(temporary_path, self.path)
+        self._sync_directory()
+
+        self._file = open(self.path, "a+b")
+        self._entries = new_entries
+        self._keys = sorted(new_entries)
+        self._size = offset
+        self._remap()
+
+    def _sync_directory(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        with self._lock:
+            self._unmap()
+            if self._file:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fibonacci import (
+    calculate_fibonacci, estimate_cost, configure_result_store, configure_shared_cache, get_shared_cache,
+    configure_parallel, get_parallel
+)
+from serialization import encode_fibonacci_result
+
+logger = logging.getLogger('websocket_server.scheduler')
+
+
+class SchedulerFull(Exception):
+    pass
+
+
+def run_job(n: int, result_format: str, extra: dict):
+    # Executado no pool (thread ou processo): calcula e já serializa, tirando
+    # também a conversão de inteiros enormes do loop de eventos
+    started = time.perf_counter()
+    result = calculate_fibonacci(n)
+    extra["service_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return encode_fibonacci_result(n, result, result_format, extra), result.bit_length(), extra["service_ms"]
+
+
+def _init_worker_process(shared_cache, shared_cache_min_n, parallel_workers, parallel_min_n):
+    # O armazenamento em disco tem um único escritor (o processo principal) e não
+    # é aberto nos workers, que calculam sem checkpoints; o cache compartilhado chega já anexado por nome (via pickle) a cada processo.
+    # Os workers já são processos: fast doubling sim, mas sem um pool próprio cada
+    configure_result_store(None)
+    configure_shared_cache(shared_cache, shared_cache_min_n)
+    configure_parallel(min(parallel_workers, 1), parallel_min_n)
+
+
+class _Job:
+    __slots__ = ("n", "result_format", "extra", "cost", "enqueued_at", "future", "client_id")
+
+    def __init__(self, client_id, n, result_format, extra, cost, future):
+        self.client_id = client_id
+        self.n = n
+        self.result_format = result_format
+        self.extra = extra
+        self.cost = cost
+        self.enqueued_at = time.monotonic()
+        self.future = future
+
+
+class _ClientQueue:
+    __slots__ = ("heap", "virtual_time", "running")
+
+    def __init__(self, virtual_time):
+        self.heap = []
+        self.virtual_time = virtual_time
+        self.running = 0
+
+
+class FibonacciScheduler:
+    # Fila justa por cliente: cada cliente acumula um tempo virtual com o custo
+    # estimado do que já executou, e dentro da fila de cada cliente o trabalho
+    # mais barato sai primeiro. A espera desconta o custo (aging) para que
+    # pedidos grandes não fiquem parados para sempre.
+    def __init__(self, workers: int = 2, executor: str = "thread", aging_rate: float = 1.0,
+                 max_pending_per_client: int = 8, inline_max_cost: float = 0.001):
+        self.workers = workers
+        self.executor_kind = executor
+        self.aging_rate = aging_rate
+        self.max_pending_per_client = max_pending_per_client
+        self.inline_max_cost = inline_max_cost
+        self.clients = {}
+        self.virtual_time = 0.0
+        self.queued = 0
+        self.completed = 0
+        self.total_queue_time = 0.0
+        self.total_service_time = 0.0
+        self._executor = None
+        self._slots = None
+        self._work = None
+        self._sequence = itertools.count()
+
+    def start(self):
+        if self.executor_kind == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker_process,
+                initargs=(*get_shared_cache(), *get_parallel())
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fibonacci")
+        self._slots = asyncio.Semaphore(self.workers)
+        self._work = asyncio.Event()
+        logger.info(f"Agendador de Fibonacci: {self.workers} worker(s) em {self.executor_kind}")
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def submit(self, client_id: str, n: int, result_format: str, extra: dict = None):
+        extra = dict(extra or {})
+        # Workers em processo recalculam do zero: o desconto dos checkpoints
+        # deixaria o SJF achar barato um pedido que não é
+        cost = estimate_cost(n, use_checkpoints=self.executor_kind != "process")
+
+        # Pedidos baratos não compensam a ida ao pool: rodam direto no loop
+        if cost <= self.inline_max_cost:
+            extra["queue_ms"] = 0.0
+            message, bits, service_ms = run_job(n, result_format, extra)
+            self._record(0.0, service_ms / 1000)
+            return message, bits
+
+        queue = self.clients.get(client_id)
+        if queue is None:
+            queue = self.clients[client_id] = _ClientQueue(self.virtual_time)
+        elif not queue.heap and not queue.running:
+            # Cliente que ficou ocioso não acumula crédito
+            queue.virtual_time = max(queue.virtual_time, self.virtual_time)
+
+        if len(queue.heap) + queue.running >= self.max_pending_per_client:
+            raise SchedulerFull(f"Limite de {self.max_pending_per_client} cálculos pendentes por cliente atingido")
+
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(client_id, n, result_format, extra, cost, future)
+        heapq.heappush(queue.heap, (cost, next(self._sequence), job))
+        self.queued += 1
+        self._work.set()
+        return await future
+
+    def cancel_client(self, client_id: str):
+        queue = self.clients.pop(client_id, None)
+        if queue is None:
+            return
+        for _, _, job in queue.heap:
+            job.future.cancel()
+        self.queued -= len(queue.heap)
+
+    def _pop_next(self):
+        now = time.monotonic()
+        best_score = None
+        best_queue = None
+        for queue in self.clients.values():
+            if not queue.heap:
+                continue
+            job = queue.heap[0][2]
+            score = queue.virtual_time + job.cost - self.aging_rate * (now - job.enqueued_at)
+            if best_score is None or score < best_score:
+                best_score = score
+                best_queue = queue
+
+        if best_queue is None:
+            return None, None
+
+        job = heapq.heappop(best_queue.heap)[2]
+        self.queued -= 1
+        self.virtual_time = max(self.virtual_time, best_queue.virtual_time)
+        best_queue.virtual_time += job.cost
+        return best_queue, job
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            while not self.queued:
+                self._work.clear()
+                await self._work.wait()
+
+            queue, job = self._pop_next()
+            if job.future.cancelled():
+                self._slots.release()
+                continue
+
+            queue.running += 1
+            loop.create_task(self._execute(loop, queue, job))
+
+    async def _execute(self, loop, queue, job):
+        queue_time = time.monotonic() - job.enqueued_at
+        job.extra["queue_ms"] = round(queue_time * 1000, 3)
+        try:
+            message, bits, service_ms = await loop.run_in_executor(
+                self._executor, run_job, job.n, job.result_format, job.extra
+            )
+            self._record(queue_time, service_ms / 1000)
+            if not job.future.done():
+                job.future.set_result((message, bits))
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            queue.running -= 1
+            self._slots.release()
+            if (not queue.heap and not queue.running and queue.virtual_time <= self.virtual_time
+                    and self.clients.get(job.client_id) is queue):
+                del self.clients[job.client_id]
+
+    def _record(self, queue_time, service_time):
+        self.completed += 1
+        self.total_queue_time += queue_time
+        self.total_service_time += service_time
+
+    def stats(self):
+        completed = self.completed or 1
+        return {
+            "queued": self.queued,
+            "running": sum(queue.running for queue in self.clients.values()),
+            "clients": len(self.clients),
+            "completed": self.completed,
+            "avg_queue_ms": round(self.total_queue_time * 1000 / completed, 3),
+            "avg_service_ms": round(self.total_service_time * 1000 / completed, 3)
+        }
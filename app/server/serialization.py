@@ -0,0 +1,151 @@
+import base64
+import decimal
+import json
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+logger = logging.getLogger('websocket_server.serialization')
+
+RESULT_FORMATS = ("decimal", "hex", "base64")
+
+# Abaixo deste tamanho o str() nativo é mais rápido que a conversão recursiva
+_STR_THRESHOLD_BITS = 4096
+_LEAF_BITS = 128
+
+# Potências de dois em Decimal compartilhadas entre conversões (LRU pelo expoente),
+# limitadas pela soma dos expoentes: 2^26 bits dão uns 8 MB. As maiores servem
+# a uma única conversão e ficam só no cache local dela
+_POWER_CACHE_MAX_BITS = 1 << 26
+_POWER_CACHE_ENTRY_MAX_BITS = _POWER_CACHE_MAX_BITS >> 3
+_power_cache: "OrderedDict[int, decimal.Decimal]" = OrderedDict()
+_power_cache_bits = 0
+_power_cache_lock = threading.Lock()
+
+# Até este número de dígitos o resultado decimal vai como número JSON; acima,
+# como string, porque o json.loads padrão recusa inteiros maiores
+_JSON_MAX_INT_DIGITS = getattr(sys.int_info, "default_max_str_digits", 4300)
+
+_DECIMAL_CONTEXT = decimal.Context(
+    prec=decimal.MAX_PREC,
+    Emax=decimal.MAX_EMAX,
+    Emin=decimal.MIN_EMIN,
+    traps=[decimal.Inexact]
+)
+
+
+def int_to_decimal_string(value: int) -> str:
+    if value < 0:
+        return "-" + int_to_decimal_string(-value)
+
+    if value.bit_length() <= _STR_THRESHOLD_BITS:
+        return str(value)
+
+    if gmpy2 is not None:
+        return gmpy2.mpz(value).digits(10)
+
+    return _divide_and_conquer(value)
+
+
+def _shared_power(bits):
+    with _power_cache_lock:
+        result = _power_cache.get(bits)
+        if result is not None:
+            _power_cache.move_to_end(bits)
+        return result
+
+
+def _store_power(bits, value):
+    global _power_cache_bits
+    if bits > _POWER_CACHE_ENTRY_MAX_BITS:
+        return
+    with _power_cache_lock:
+        if bits in _power_cache:
+            return
+        _power_cache[bits] = value
+        _power_cache_bits += bits
+        while _power_cache_bits > _POWER_CACHE_MAX_BITS:
+            evicted, _ = _power_cache.popitem(last=False)
+            _power_cache_bits -= evicted
+
+
+def _divide_and_conquer(value: int) -> str:
+    # Divide o inteiro em metades binárias e recombina em base decimal com a
+    # aritmética do libmpdec, cuja multiplicação é subquadrática. As potências
+    # de dois já convertidas para Decimal ficam em cache durante a conversão e,
+    # até o limite, entre conversões.
+    powers = {}
+    two = decimal.Decimal(2)
+
+    def power_of_two(bits):
+        result = powers.get(bits)
+        if result is None:
+            result = _shared_power(bits)
+        if result is None:
+            if bits <= _LEAF_BITS:
+                result = two ** bits
+            elif bits - 1 in powers:
+                previous = powers[bits - 1]
+                result = previous + previous
+            else:
+                half = bits >> 1
+                result = power_of_two(half) * power_of_two(bits - half)
+            _store_power(bits, result)
+        powers[bits] = result
+        return result
+
+    def convert(chunk, bits):
+        if bits <= _LEAF_BITS:
+            return decimal.Decimal(chunk)
+        half = bits >> 1
+        high = chunk >> half
+        low = chunk - (high << half)
+        return convert(low, half) + convert(high, bits - half) * power_of_two(half)
+
+    with decimal.localcontext(_DECIMAL_CONTEXT):
+        result = convert(value, value.bit_length())
+
+    return str(result)
+
+
+def int_to_hex_string(value: int) -> str:
+    return format(value, "x")
+
+
+def int_to_base64_string(value: int) -> str:
+    length = max(1, (value.bit_length() + 7) // 8)
+    return base64.b64encode(value.to_bytes(length, "big")).decode("ascii")
+
+
+def encode_fibonacci_result(n: int, result: int, result_format: str = "decimal", extra: dict = None) -> str:
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(f"Formato de resultado inválido: {result_format}")
+
+    if result_format == "decimal":
+        # Número JSON como sempre; acima do limite do json.loads padrão vai como
+        # string. Só dígitos (e o sinal), então as aspas bastam, sem json.dumps
+        digits = int_to_decimal_string(result)
+        if len(digits.lstrip("-")) <= _JSON_MAX_INT_DIGITS:
+            encoded_result = digits
+        else:
+            encoded_result = '"%s"' % digits
+    elif result_format == "hex":
+        encoded_result = json.dumps(int_to_hex_string(result))
+    else:
+        encoded_result = json.dumps(int_to_base64_string(result))
+
+    # Campos adicionais (id do pedido, tempos de fila e de cálculo) vão antes do resultado
+    extra_fields = "".join(
+        "%s: %s, " % (json.dumps(key), json.dumps(value)) for key, value in (extra or {}).items()
+    )
+
+    return (
+        '{"type": "fibonacci_result", "n": %d, "format": %s, %s"result": %s}'
+        % (n, json.dumps(result_format), extra_fields, encoded_result)
+    )
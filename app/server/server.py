@@ -1,24 +1,77 @@
 import asyncio
+import hmac
+import http
 import json
+import math
 import websockets
 import datetime
+import functools
 import logging
-from typing import Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Set
 
 from database import (
-    add_user_to_db, 
-    set_user_offline,
-    update_user_activity, 
-    update_username,
+    init_database,
+    ping_database,
+    write_sessions,
+    write_rollups,
+    get_rollups,
     get_all_users,
     get_all_connected_users,
-    mark_inactive_users_as_offline,
+    renew_lease,
+    release_lease,
+    expire_stale_leases,
+    reconcile_sessions,
+    set_instance_sessions_offline,
+    set_instance_sessions_online,
     close_connection
 )
-from fibonacci import calculate_fibonacci
+from scheduler import FibonacciScheduler, SchedulerFull
+from fibonacci import fibonacci_mod_batch
+from capture import TrafficRecorder
+from handoff import HandoffListener
+from session_writer import SessionWriter
+from analytics import SessionAnalytics, minute_of, summarize
+from compression import compression_options
+from serialization import RESULT_FORMATS
+from ticker import WallClockTicker
+from connection import ConnectionState
+from http_endpoints import HttpRequest, json_response, text_response
+from pubsub import TopicRegistry
+from watchdog import LoopWatchdog
+from profiler import SamplingProfiler
+from config import (
+    BROADCAST_SHARD_SIZE, BROADCAST_SPREAD, BROADCAST_LAG_WARNING_MS, MONGO_INIT_RETRY_SECONDS,
+    READINESS_PING_TTL_SECONDS,
+    WS_MAX_SIZE, WS_MAX_QUEUE, WS_WRITE_LIMIT,
+    WS_COMPRESSION, WS_COMPRESSION_MIN_SIZE, WS_COMPRESSION_WINDOW_BITS, WS_COMPRESSION_MEM_LEVEL,
+    WS_COMPRESSION_LEVEL,
+    PUBSUB_FANOUT_CONCURRENCY, PUBSUB_SEND_TIMEOUT, PUBSUB_MAX_BUFFER, PUBSUB_MAX_TOPICS_PER_CLIENT,
+    WATCHDOG_THRESHOLD_MS, ADMIN_TOKEN, PROFILER_MAX_SECONDS, PROFILER_INTERVAL_MS,
+    FIB_EXECUTOR, FIB_WORKERS, FIB_MAX_PENDING_PER_CLIENT, FIB_AGING_RATE, FIB_INLINE_MAX_MS,
+    CAPTURE_PATH, CAPTURE_MAX_BYTES, HTTP_FIB_MAX_BATCH, HTTP_FIB_MAX_N, FIB_MOD_BATCH_MAX, FIB_MOD_BATCH_WORKERS,
+    DRAIN_TIMEOUT, DRAIN_RECONNECT_SPREAD, HANDOFF_PATH,
+    INSTANCE_ID, LEASE_TTL_SECONDS, LEASE_RENEW_SECONDS, SESSION_FLUSH_MS, SESSION_MAX_BATCH,
+    ANALYTICS_FLUSH_SECONDS, ANALYTICS_RETENTION_DAYS
+)
 
 logger = logging.getLogger('websocket_server.server')
 
+# Intervalo máximo aceito para o envio de time_update a um cliente (0 = sob demanda)
+MAX_TIME_PUSH_INTERVAL = 3600
+
+# Tópico em que os resultados de Fibonacci calculados são anunciados
+FIBONACCI_TOPIC = "fibonacci"
+MAX_TOPIC_LENGTH = 64
+
+# Período máximo de uma consulta de estatísticas: tudo o que a retenção guarda
+MAX_STATS_MINUTES = ANALYTICS_RETENTION_DAYS * 24 * 60
+
+# Código de fechamento WebSocket para reinício do serviço
+CLOSE_SERVICE_RESTART = 1012
+
 def datetime_serializer(obj):
     if isinstance(obj, datetime.datetime):
         return obj.strftime("%Y-%m-%d %H:%M:%S")
@@ -28,39 +81,73 @@ class WebSocketServer:
     def __init__(self, host="localhost", port=8765):
         self.host = host
         self.port = port
-        self.connected_clients: Dict[str, websockets.WebSocketServerProtocol] = {}
+        self.connections: Dict[int, ConnectionState] = {}
         self.server = None
         self.running = True
-        self.last_time_sent = {}
+        self.ready = False
+        self.database_check = None
+        self.database_checked_at = 0.0
+        self.started_at = time.monotonic()
+        self.background_tasks = []
+        self.http_routes = {
+            "/healthz": self._handle_liveness,
+            "/readyz": self._handle_readiness,
+            "/fib": self._handle_http_fibonacci
+        }
+        self.ticker = WallClockTicker(period=1.0, lag_warning=BROADCAST_LAG_WARNING_MS / 1000)
+        self.presence_version = 0
+        self.presence_subscribers: Set[ConnectionState] = set()
+        self.presence_queue: asyncio.Queue = asyncio.Queue()
+        self.topics = TopicRegistry(
+            fanout_concurrency=PUBSUB_FANOUT_CONCURRENCY,
+            send_timeout=PUBSUB_SEND_TIMEOUT,
+            max_buffer=PUBSUB_MAX_BUFFER,
+            max_topics_per_client=PUBSUB_MAX_TOPICS_PER_CLIENT
+        )
+        self.watchdog = LoopWatchdog(WATCHDOG_THRESHOLD_MS / 1000) if WATCHDOG_THRESHOLD_MS > 0 else None
+        self.profiler = SamplingProfiler(max_seconds=PROFILER_MAX_SECONDS)
+        self.scheduler = FibonacciScheduler(
+            workers=FIB_WORKERS,
+            executor=FIB_EXECUTOR,
+            aging_rate=FIB_AGING_RATE,
+            max_pending_per_client=FIB_MAX_PENDING_PER_CLIENT,
+            inline_max_cost=FIB_INLINE_MAX_MS / 1000
+        )
+        self.fibonacci_tasks = set()
+        self.batch_executor = ThreadPoolExecutor(max_workers=FIB_MOD_BATCH_WORKERS,
+                                                 thread_name_prefix="fib-mod-batch")
+        self.recorder = None
+        self.draining = False
+        self.drain_task = None
+        self.lease_held = False
+        self.handoff = None
+        self.handed_off = False
+        self.sessions = SessionWriter(write_sessions, SESSION_FLUSH_MS / 1000, SESSION_MAX_BATCH)
+        self.analytics = SessionAnalytics(functools.partial(write_rollups, INSTANCE_ID), ANALYTICS_FLUSH_SECONDS)
+
+    async def maintain_lease(self):
+        # Uma escrita por intervalo mantém online todas as sessões desta instância;
+        # a mesma tarefa encerra as sessões de instâncias cujo lease venceu
+        logger.info(f"Lease da instância {INSTANCE_ID}: renovação a cada {LEASE_RENEW_SECONDS}s, "
+                    f"validade de {LEASE_TTL_SECONDS}s")
 
-    async def check_inactive_users(self):
-        logger.info("Iniciando tarefa de verificação de usuários inativos")
-        
         while self.running:
+            await asyncio.sleep(LEASE_RENEW_SECONDS)
             try:
-                users = get_all_connected_users()
-                logger.info(f"Verificando inatividade: {len(users)} usuários online")
-                
-                for user in users:
-                    last_active = user.get('last_active')
-                    connected_at = user.get('connected_at')
-                    user_id = user.get('id')
-                    username = user.get('username')
-                    
-                    if last_active:
-                        time_diff = datetime.datetime.now() - last_active
-                        minutes_inactive = time_diff.total_seconds() / 60
-                        logger.info(f"Usuário {username} ({user_id}) inativo por {minutes_inactive:.2f} minutos")
-                
-                inactive_count = mark_inactive_users_as_offline(5)
-                logger.info(f"Verificação concluída: {inactive_count} usuários marcados como offline por inatividade")
+                recreated = await asyncio.to_thread(renew_lease, INSTANCE_ID, LEASE_TTL_SECONDS)
+                if recreated and self.connections:
+                    # Outra instância considerou esta morta (ex.: banco inacessível por um tempo)
+                    logger.warning(f"Lease da instância {INSTANCE_ID} havia vencido, restaurando as sessões")
+                    await asyncio.to_thread(set_instance_sessions_online, INSTANCE_ID,
+                                            [state.client_id for state in self.connections.values()])
+                await asyncio.to_thread(expire_stale_leases)
             except Exception as e:
-                logger.error(f"Erro ao verificar usuários inativos: {str(e)}")
-            
-            await asyncio.sleep(60)
+                logger.error(f"Erro ao renovar o lease da instância: {str(e)}")
 
-    async def handle_list_users(self, websocket, client_id):
+    async def handle_list_users(self, state):
         try:
+            # As sessões ainda no buffer entram no banco antes da leitura
+            await self.sessions.flush()
             users = get_all_connected_users()
 
             current_time = datetime.datetime.now()
@@ -85,188 +172,735 @@ class WebSocketServer:
                 
                 serializable_users.append(serializable_user)
 
-            await websocket.send(json.dumps({
+            await self._send(state, json.dumps({
                 "type": "users_list",
                 "users": serializable_users
             }))
-            logger.info(f"Listagem de usuários enviada para {client_id}")
+            logger.info(f"Listagem de usuários enviada para {state.client_id}")
         except Exception as e:
             logger.error(f"Erro ao enviar listagem de usuários: {str(e)}")
-            await websocket.send(json.dumps({
+            await self._send(state, json.dumps({
                 "type": "error",
                 "message": f"Erro ao enviar listagem de usuários: {str(e)}"
             }))
     
     async def handle_client(self, websocket):
-        client_id = f"client_{id(websocket)}"
-        username = f"user_{client_id}"
+        connection_id = id(websocket)
+        state = ConnectionState(websocket, connection_id, f"user_client_{connection_id}")
         
         try:
-            self._initialize_client(client_id, username, websocket)
+            self._initialize_client(state)
             
-            await self._send_welcome_message(websocket, client_id)
-            await self._send_initial_time(websocket, client_id)
+            await self._send_welcome_message(state)
             
-            await self._process_client_messages(websocket, client_id, username)
+            await self._process_client_messages(state)
         
         except websockets.exceptions.ConnectionClosed as e:
-            logger.info(f"Conexão fechada com {client_id}: {e}")
+            logger.info(f"Conexão fechada com {state.client_id}: {e}")
         
         finally:
-            self._cleanup_client(client_id)
+            self._cleanup_client(state)
 
-    def _initialize_client(self, client_id, username, websocket):
-        self.connected_clients[client_id] = websocket
-        add_user_to_db(client_id, username)
-        logger.info(f"Novo cliente conectado: {client_id}")
+    def _initialize_client(self, state):
+        self.connections[state.id] = state
+        self.analytics.connected(len(self.connections))
+        if self.recorder:
+            self.recorder.connect(state.id)
+        # A gravação da sessão vai para o próximo lote; o handshake não espera o banco
+        self.sessions.connected(state.client_id, state.username, INSTANCE_ID, state.connected_at)
+        self._publish_presence("user_joined", state)
+        logger.info(f"Novo cliente conectado: {state.client_id}")
 
-    async def _send_welcome_message(self, websocket, client_id):
-        await websocket.send(json.dumps({
-            "type": "welcome",
-            "message": f"Bem-vindo ao servidor WebSocket! Seu ID é {client_id}",
-            "client_id": client_id
-        }))
+    async def _send(self, state, message):
+        await state.websocket.send(message)
+        state.messages_sent += 1
 
-    async def _send_initial_time(self, websocket, client_id):
-        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        await websocket.send(json.dumps({
-            "type": "time_update",
-            "time": current_time
+    async def _send_welcome_message(self, state):
+        # Boas-vindas e hora inicial num único quadro
+        now = time.time()
+        await self._send(state, json.dumps({
+            "type": "welcome",
+            "message": f"Bem-vindo ao servidor WebSocket! Seu ID é {state.client_id}",
+            "client_id": state.client_id,
+            "time": self._get_formatted_current_time(now),
+            **self._clock_sample()
         }))
-        self.last_time_sent[client_id] = current_time
-        update_user_activity(client_id)
+        state.last_tick = float(int(now))
 
-    async def _process_client_messages(self, websocket, client_id, username):
-        async for message in websocket:
+    async def _process_client_messages(self, state):
+        async for message in state.websocket:
             try:
+                state.touch()
                 data = json.loads(message)
-                logger.info(f"Mensagem recebida de {client_id}: {data}")
-                update_user_activity(client_id)
+                if self.recorder:
+                    redacted = isinstance(data, dict) and "token" in data
+                    self.recorder.message(state.id, json.dumps(self._redact(data)) if redacted else message)
+                logger.info(f"Mensagem recebida de {state.client_id}: {self._redact(data)}")
                 
-                await self._handle_message_by_type(websocket, client_id, username, data)
+                await self._handle_message_by_type(state, data)
                 
             except json.JSONDecodeError:
-                await self._send_error(websocket, f"Mensagem inválida recebida de {client_id}: {message}", 
+                if self.recorder:
+                    self.recorder.message(state.id, message)
+                await self._send_error(state, f"Mensagem inválida recebida de {state.client_id}: {message}", 
                                     "Formato JSON inválido.")
             
             except Exception as e:
-                await self._send_error(websocket, f"Erro ao processar mensagem de {client_id}: {str(e)}",
+                await self._send_error(state, f"Erro ao processar mensagem de {state.client_id}: {str(e)}",
                                     f"Erro ao processar mensagem: {str(e)}")
 
-    async def _handle_message_by_type(self, websocket, client_id, username, data):
+    def _redact(self, data):
+        if isinstance(data, dict) and "token" in data:
+            return {**data, "token": "***"}
+        return data
+
+    async def _handle_message_by_type(self, state, data):
         msg_type = data.get("type", "")
+        self.analytics.message(msg_type)
         
         if msg_type == "fibonacci":
-            await self._handle_fibonacci_request(websocket, client_id, data)
+            await self._handle_fibonacci_request(state, data)
         
         elif msg_type == "update_username":
-            await self._handle_username_update(websocket, client_id, data, username)
+            await self._handle_username_update(state, data)
         
         elif msg_type == "list_users":
-            await self.handle_list_users(websocket, client_id)
+            await self.handle_list_users(state)
+
+        elif msg_type == "clock_sync":
+            await self._handle_clock_sync(state, data)
 
-    async def _handle_fibonacci_request(self, websocket, client_id, data):
+        elif msg_type == "time_sync":
+            await self._handle_time_sync(state, data)
+
+        elif msg_type == "subscribe_presence":
+            await self._handle_presence_subscription(state)
+
+        elif msg_type == "unsubscribe_presence":
+            self.presence_subscribers.discard(state)
+
+        elif msg_type == "subscribe":
+            await self._handle_subscribe(state, data)
+
+        elif msg_type == "unsubscribe":
+            await self._handle_unsubscribe(state, data)
+
+        elif msg_type == "publish":
+            await self._handle_publish(state, data)
+
+        elif msg_type == "admin_profile":
+            await self._handle_admin_profile(state, data)
+
+        elif msg_type == "topic_stats":
+            await self._send(state, json.dumps({
+                "type": "topic_stats",
+                "topics": self.topics.topic_stats()
+            }))
+
+        elif msg_type == "fibonacci_mod_batch":
+            await self._handle_fibonacci_mod_batch(state, data)
+
+        elif msg_type == "session_stats":
+            await self._handle_session_stats(state, data)
+
+    async def _handle_session_stats(self, state, data):
+        # Série do período a partir dos agregados por minuto, sem ler as sessões
+        try:
+            minutes = int(data.get("minutes", 60))
+            if not 1 <= minutes <= MAX_STATS_MINUTES:
+                raise ValueError(f"O período deve ter entre 1 e {MAX_STATS_MINUTES} minutos")
+            bucket = int(data.get("bucket", max(1, minutes // 60)))
+            if not 1 <= bucket <= minutes:
+                raise ValueError("O agrupamento deve ter entre 1 minuto e o período inteiro")
+        except (ValueError, TypeError) as e:
+            await self._send_error(state, f"Pedido de estatísticas inválido de {state.client_id}: {str(e)}",
+                                f"Erro nas estatísticas: {str(e)}")
+            return
+
+        # Os minutos ainda em memória desta instância entram antes da leitura
+        await self.analytics.flush()
+        end = minute_of(datetime.datetime.now()) + datetime.timedelta(minutes=1)
+        start = end - datetime.timedelta(minutes=minutes)
+        try:
+            documents = await asyncio.to_thread(get_rollups, start, end)
+        except Exception as e:
+            await self._send_error(state, f"Erro ao consultar estatísticas: {str(e)}",
+                                "Erro ao consultar estatísticas")
+            return
+
+        await self._send(state, json.dumps({
+            "type": "session_stats",
+            **summarize(documents, start, end, bucket)
+        }))
+        logger.info(f"Estatísticas de {minutes} min enviadas para {state.client_id}")
+
+    async def _handle_fibonacci_request(self, state, data):
+        request_id = data.get("id")
         try:
             n = int(data.get("n", 0))
-            result = calculate_fibonacci(n)
-            await websocket.send(json.dumps({
-                "type": "fibonacci_result",
-                "n": n,
-                "result": result
-            }))
-            logger.info(f"Fibonacci({n}) = {result} calculado para {client_id}")
+            result_format = data.get("format", "decimal")
+            if n < 0:
+                raise ValueError("O valor de n não pode ser negativo")
+            if result_format not in RESULT_FORMATS:
+                raise ValueError(f"Formato de resultado inválido: {result_format}")
         except (ValueError, TypeError) as e:
-            await self._send_error(websocket, f"Erro de Fibonacci para {client_id}: {str(e)}",
-                                f"Erro ao calcular Fibonacci: {str(e)}")
+            await self._send_error(state, f"Erro de Fibonacci para {state.client_id}: {str(e)}",
+                                f"Erro ao calcular Fibonacci: {str(e)}", request_id)
+            return
 
-    async def _handle_username_update(self, websocket, client_id, data, current_username):
-        new_username = data.get("username", current_username)
-        username = update_username(client_id, new_username)
-        
-        if username:
-            await websocket.send(json.dumps({
-                "type": "username_updated",
-                "username": username
-            }))
-        else:
-            await self._send_error(websocket, f"Falha ao atualizar nome para {client_id}",
+        # O cálculo segue em segundo plano para não travar as demais mensagens do cliente;
+        # o "id" opcional do pedido volta na resposta para casar resultados fora de ordem
+        task = asyncio.create_task(self._run_fibonacci_job(state, n, result_format, request_id))
+        self.fibonacci_tasks.add(task)
+        task.add_done_callback(self.fibonacci_tasks.discard)
+
+    async def _run_fibonacci_job(self, state, n, result_format, request_id):
+        extra = {"id": request_id} if request_id is not None else None
+        try:
+            message, bits = await self.scheduler.submit(state.client_id, n, result_format, extra)
+            await self._send(state, message)
+            logger.info(f"Fibonacci({n}) ({bits} bits, {result_format}) calculado para {state.client_id}")
+
+            if self.topics.has_subscribers(FIBONACCI_TOPIC):
+                await self.topics.publish(FIBONACCI_TOPIC, {
+                    "n": n,
+                    "bits": bits,
+                    "client_id": state.client_id
+                })
+        except SchedulerFull as e:
+            await self._send_error(state, f"Fibonacci({n}) recusado para {state.client_id}: {str(e)}",
+                                str(e), request_id)
+        except (ValueError, TypeError) as e:
+            await self._send_error(state, f"Erro de Fibonacci para {state.client_id}: {str(e)}",
+                                f"Erro ao calcular Fibonacci: {str(e)}", request_id)
+        except (asyncio.CancelledError, websockets.exceptions.ConnectionClosed):
+            pass
+        except Exception as e:
+            logger.error(f"Falha no cálculo de Fibonacci({n}) para {state.client_id}: {str(e)}")
+
+    async def _handle_fibonacci_mod_batch(self, state, data):
+        request_id = data.get("id")
+        try:
+            values = data.get("n")
+            modulus = data.get("modulus")
+            if not isinstance(values, list) or not values:
+                raise ValueError("Informe a lista de valores em n")
+            if len(values) > FIB_MOD_BATCH_MAX:
+                raise ValueError(f"No máximo {FIB_MOD_BATCH_MAX} valores por pedido")
+            if isinstance(modulus, bool) or not isinstance(modulus, int):
+                raise ValueError("O módulo deve ser um número inteiro")
+            if any(isinstance(n, bool) or not isinstance(n, int) for n in values):
+                raise ValueError("Os valores de n devem ser números inteiros")
+        except ValueError as e:
+            await self._send_error(state, f"Erro de Fibonacci em lote para {state.client_id}: {str(e)}",
+                                f"Erro ao calcular Fibonacci em lote: {str(e)}", request_id)
+            return
+
+        # Como o Fibonacci individual, roda em segundo plano e entra no drain
+        task = asyncio.create_task(self._run_fibonacci_mod_batch(state, values, modulus, request_id))
+        self.fibonacci_tasks.add(task)
+        task.add_done_callback(self.fibonacci_tasks.discard)
+
+    async def _run_fibonacci_mod_batch(self, state, values, modulus, request_id):
+        started = time.perf_counter()
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.batch_executor, fibonacci_mod_batch, values, modulus
+            )
+            response = {
+                "type": "fibonacci_mod_batch_result",
+                "modulus": modulus,
+                "count": len(results),
+                "results": results,
+                "service_ms": round((time.perf_counter() - started) * 1000, 3)
+            }
+            if request_id is not None:
+                response["id"] = request_id
+            await self._send(state, json.dumps(response))
+            logger.info(f"Fibonacci mod {modulus} em lote ({len(results)} valores) calculado para {state.client_id}")
+        except (ValueError, TypeError) as e:
+            await self._send_error(state, f"Erro de Fibonacci em lote para {state.client_id}: {str(e)}",
+                                f"Erro ao calcular Fibonacci em lote: {str(e)}", request_id)
+        except (asyncio.CancelledError, websockets.exceptions.ConnectionClosed):
+            pass
+        except Exception as e:
+            logger.error(f"Falha no Fibonacci em lote para {state.client_id}: {str(e)}")
+
+    def _topic_from(self, data):
+        topic = data.get("topic")
+        if not isinstance(topic, str) or not 0 < len(topic) <= MAX_TOPIC_LENGTH:
+            raise ValueError(f"Tópico inválido: use um texto de 1 a {MAX_TOPIC_LENGTH} caracteres")
+        return topic
+
+    async def _handle_subscribe(self, state, data):
+        try:
+            topic = self._topic_from(data)
+            self.topics.subscribe(topic, state)
+        except ValueError as e:
+            await self._send_error(state, f"Inscrição recusada para {state.client_id}: {str(e)}", str(e))
+            return
+
+        await self._send(state, json.dumps({"type": "subscribed", "topic": topic}))
+        logger.info(f"{state.client_id} inscrito no tópico {topic}")
+
+    async def _handle_unsubscribe(self, state, data):
+        try:
+            topic = self._topic_from(data)
+        except ValueError as e:
+            await self._send_error(state, f"Cancelamento recusado para {state.client_id}: {str(e)}", str(e))
+            return
+
+        self.topics.unsubscribe(topic, state)
+        await self._send(state, json.dumps({"type": "unsubscribed", "topic": topic}))
+        logger.info(f"{state.client_id} saiu do tópico {topic}")
+
+    async def _handle_publish(self, state, data):
+        try:
+            topic = self._topic_from(data)
+        except ValueError as e:
+            await self._send_error(state, f"Publicação recusada para {state.client_id}: {str(e)}", str(e))
+            return
+
+        delivered, dropped = await self.topics.publish(topic, data.get("payload"), sender=state.client_id)
+        await self._send(state, json.dumps({
+            "type": "published",
+            "topic": topic,
+            "delivered": delivered,
+            "dropped": dropped
+        }))
+
+    def _is_admin(self, data):
+        token = data.get("token")
+        if not ADMIN_TOKEN or not isinstance(token, str):
+            return False
+        return hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+    async def _handle_admin_profile(self, state, data):
+        if not self._is_admin(data):
+            await self._send_error(state, f"Comando administrativo recusado para {state.client_id}",
+                                "Não autorizado")
+            return
+
+        if self.profiler.busy:
+            await self._send_error(state, f"Perfil já em andamento, pedido de {state.client_id} recusado",
+                                "Já existe uma coleta de perfil em andamento")
+            return
+
+        try:
+            seconds = float(data.get("seconds", 5))
+            interval = float(data.get("interval_ms", PROFILER_INTERVAL_MS)) / 1000
+            # float() e o json aceitam NaN e infinito, que nunca alcançam o prazo da coleta
+            if not (math.isfinite(seconds) and math.isfinite(interval)) or seconds <= 0 or interval <= 0:
+                raise ValueError
+        except (ValueError, TypeError):
+            await self._send_error(state, f"Parâmetros de perfil inválidos de {state.client_id}",
+                                "Parâmetros inválidos: seconds e interval_ms devem ser números positivos")
+            return
+
+        # "loop" restringe a amostragem à thread do loop de eventos
+        thread_ids = {threading.get_ident()} if data.get("threads") == "loop" else None
+
+        logger.info(f"Coleta de perfil de {seconds}s iniciada por {state.client_id}")
+        try:
+            report = await asyncio.to_thread(self.profiler.profile, seconds, interval, thread_ids)
+        except RuntimeError as e:
+            await self._send_error(state, f"Falha na coleta de perfil: {str(e)}", str(e))
+            return
+
+        await self._send(state, json.dumps({
+            "type": "admin_profile",
+            **report,
+            "stalls": self.watchdog.stats() if self.watchdog else None
+        }))
+        logger.info(f"Coleta de perfil concluída: {report['samples']} amostras em {report['duration']}s")
+
+    def _clock_sample(self):
+        return {
+            "server_time": time.time(),
+            "server_monotonic": time.monotonic(),
+            "utc_offset": datetime.datetime.now().astimezone().utcoffset().total_seconds()
+        }
+
+    async def _handle_clock_sync(self, state, data):
+        try:
+            interval = int(data.get("interval", 1))
+        except (ValueError, TypeError):
+            interval = -1
+
+        if not 0 <= interval <= MAX_TIME_PUSH_INTERVAL:
+            await self._send_error(state, f"Intervalo de hora inválido de {state.client_id}: {data.get('interval')}",
+                                f"Intervalo inválido: use um inteiro entre 0 e {MAX_TIME_PUSH_INTERVAL}")
+            return
+
+        state.time_push_interval = interval
+        await self._send(state, json.dumps({
+            "type": "clock_sync",
+            "interval": interval,
+            **self._clock_sample()
+        }))
+        logger.info(f"Sincronização de relógio ativada para {state.client_id} (intervalo: {interval}s)")
+
+    async def _handle_time_sync(self, state, data):
+        # Amostra no estilo NTP: o cliente estima o atraso a partir do t0 devolvido
+        await self._send(state, json.dumps({
+            "type": "time_sync",
+            "t0": data.get("t0"),
+            **self._clock_sample()
+        }))
+
+    async def _handle_username_update(self, state, data):
+        username = data.get("username", state.username)
+        if not isinstance(username, str) or not username.strip():
+            await self._send_error(state, f"Nome inválido recebido de {state.client_id}",
                                 "Falha ao atualizar nome de usuário")
+            return
+
+        state.username = username
+        self.sessions.renamed(state.client_id, username)
+        self._publish_presence("user_renamed", state)
+        await self._send(state, json.dumps({
+            "type": "username_updated",
+            "username": username
+        }))
 
-    async def _send_error(self, websocket, log_message, client_message):
+    async def _send_error(self, state, log_message, client_message, request_id=None):
         logger.error(log_message)
-        await websocket.send(json.dumps({
+        error = {
             "type": "error",
             "message": client_message
-        }))
+        }
+        if request_id is not None:
+            error["id"] = request_id
+        await self._send(state, json.dumps(error))
 
-    def _cleanup_client(self, client_id):
-        if client_id in self.connected_clients:
-            del self.connected_clients[client_id]
-        if client_id in self.last_time_sent:
-            del self.last_time_sent[client_id]
-        set_user_offline(client_id)
-        logger.info(f"Cliente {client_id} desconectado.")
+    def _cleanup_client(self, state):
+        self.scheduler.cancel_client(state.client_id)
+        if self.recorder:
+            self.recorder.disconnect(state.id)
+        self._remove_client(state)
+        self._mark_offline(state)
+        logger.info(f"Cliente {state.client_id} desconectado "
+                    f"({state.messages_received} mensagens recebidas, {state.messages_sent} enviadas).")
     
     async def broadcast_time(self):
-        while self.running:
-            if self.connected_clients:
-                current_time = self._get_formatted_current_time()
+        async for tick in self.ticker.ticks():
+            if not self.running:
+                break
+
+            if self.connections:
+                current_time = self._get_formatted_current_time(tick.wall_time)
                 message = self._create_time_update_message(current_time)
-                disconnected = await self._send_time_updates(current_time, message)
+                disconnected = await self._send_time_updates(message, tick)
                 self._handle_disconnected_clients(disconnected)
-            
-            await asyncio.sleep(1)
 
-    def _get_formatted_current_time(self):
-        return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    def _get_formatted_current_time(self, timestamp):
+        return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
 
     def _create_time_update_message(self, current_time):
         return json.dumps({
             "type": "time_update",
-            "time": current_time
+            "time": current_time,
+            "server_time": time.time()
         })
 
-    async def _send_time_updates(self, current_time, message):
+    async def _send_time_updates(self, message, tick):
         disconnected = []
-        
-        for client_id, websocket in self.connected_clients.items():
-            try:
-                if self._should_send_update(client_id, current_time):
-                    await websocket.send(message)
-                    self.last_time_sent[client_id] = current_time
-                    update_user_activity(client_id)
-            except websockets.exceptions.ConnectionClosed:
-                disconnected.append(client_id)
+        clients = list(self.connections.values())
+        shards = [clients[i:i + BROADCAST_SHARD_SIZE] for i in range(0, len(clients), BROADCAST_SHARD_SIZE)]
+        # Com muitos clientes, os lotes são espalhados dentro da janela do tick
+        # para evitar um pico de CPU a cada segundo
+        shard_interval = self.ticker.period * BROADCAST_SPREAD / len(shards)
+        loop = asyncio.get_running_loop()
+
+        for index, shard in enumerate(shards):
+            if index > 0:
+                delay = tick.deadline + index * shard_interval - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            for state in shard:
+                try:
+                    if self._should_send_update(state, tick.wall_time):
+                        await self._send(state, message)
+                        state.last_tick = tick.wall_time
+                except websockets.exceptions.ConnectionClosed:
+                    disconnected.append(state)
         
         return disconnected
 
-    def _should_send_update(self, client_id, current_time):
-        return (client_id not in self.last_time_sent or 
-                self.last_time_sent[client_id] != current_time)
+    def _should_send_update(self, state, tick_time):
+        interval = state.time_push_interval
+        if interval == 0:
+            return False
+        if interval > 1 and int(tick_time) % interval != 0:
+            return False
+        return state.last_tick != tick_time
 
     def _handle_disconnected_clients(self, disconnected):
-        for client_id in disconnected:
-            self._remove_client(client_id)
-            set_user_offline(client_id)
-            logger.info(f"Cliente {client_id} marcado como offline (conexão fechada durante broadcast).")
-
-    def _remove_client(self, client_id):
-        if client_id in self.connected_clients:
-            del self.connected_clients[client_id]
-        
-        if client_id in self.last_time_sent:
-            del self.last_time_sent[client_id]
-    async def start(self):
-        broadcast_task = asyncio.create_task(self.broadcast_time())
-        inactive_check_task = asyncio.create_task(self.check_inactive_users())
+        for state in disconnected:
+            self._remove_client(state)
+            self._mark_offline(state)
+            logger.info(f"Cliente {state.client_id} marcado como offline (conexão fechada durante broadcast).")
+
+    def _mark_offline(self, state):
+        # Durante o drain todas as sessões desta instância saem numa única escrita no fim
+        if not self.draining:
+            self.sessions.disconnected(state.client_id)
+
+    def _remove_client(self, state):
+        if self.connections.pop(state.id, None) is not None:
+            self.analytics.disconnected(len(self.connections))
+            self.presence_subscribers.discard(state)
+            self.topics.unsubscribe_all(state)
+            self._publish_presence("user_left", state)
+
+    def _presence_user(self, state):
+        return {
+            "client_id": state.client_id,
+            "username": state.username,
+            "connected_at": datetime.datetime.fromtimestamp(state.connected_at).strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def _publish_presence(self, event, state):
+        # Cada mudança gera um único delta versionado, serializado uma vez só
+        self.presence_version += 1
+        if not self.presence_subscribers:
+            return
+        self.presence_queue.put_nowait(json.dumps({
+            "type": event,
+            "version": self.presence_version,
+            "user": self._presence_user(state)
+        }))
+
+    async def _handle_presence_subscription(self, state):
+        # O snapshot sai com a versão atual; deltas com versão menor ou igual são ignorados pelo cliente
+        self.presence_subscribers.add(state)
+        await self._send(state, json.dumps({
+            "type": "presence_snapshot",
+            "version": self.presence_version,
+            "users": [self._presence_user(connection) for connection in self.connections.values()]
+        }))
+        logger.info(f"{state.client_id} inscrito nas atualizações de presença")
+
+    async def dispatch_presence(self):
+        # Um único despachante mantém a ordem das versões para todos os inscritos
+        while self.running:
+            message = await self.presence_queue.get()
+            subscribers = list(self.presence_subscribers)
+            # Com o mesmo limite do pub/sub: um inscrito travado não segura os deltas
+            # dos demais, e quem estoura o prazo ou falha deixa de receber presença
+            results = await asyncio.gather(
+                *(asyncio.wait_for(self._send(subscriber, message), self.topics.send_timeout)
+                  for subscriber in subscribers),
+                return_exceptions=True
+            )
+            for subscriber, result in zip(subscribers, results):
+                if isinstance(result, Exception):
+                    if isinstance(result, asyncio.TimeoutError):
+                        logger.warning(f"{subscriber.client_id} removido da presença: envio excedeu "
+                                       f"{self.topics.send_timeout}s")
+                    self.presence_subscribers.discard(subscriber)
+
+    async def _process_request(self, first, second):
+        request = HttpRequest(first, second)
+        # /fib/{n} cai na rota do prefixo /fib; nenhum outro caminho tem sufixo
+        route = self.http_routes.get(request.path)
+        if route is None and request.path.startswith("/fib/"):
+            route = self._handle_http_fibonacci
+        if route:
+            return await route(request)
+
+        if request.is_websocket_upgrade and not self.ready:
+            return json_response(request, http.HTTPStatus.SERVICE_UNAVAILABLE, {"status": "starting"})
+
+        return None
 
+    async def _handle_liveness(self, request):
+        return json_response(request, http.HTTPStatus.OK, {"status": "alive"})
+
+    async def _database_reachable(self):
+        # O /readyz é sondado com frequência: um ping por READINESS_PING_TTL_SECONDS,
+        # compartilhado pelas sondagens que chegam enquanto ele está em andamento
+        check = self.database_check
+        if check is None or (check.done() and
+                             time.monotonic() - self.database_checked_at >= READINESS_PING_TTL_SECONDS):
+            self.database_checked_at = time.monotonic()
+            check = self.database_check = asyncio.ensure_future(asyncio.to_thread(ping_database))
+        return await asyncio.shield(check)
+
+    async def _handle_readiness(self, request):
+        if self.ready:
+            if await self._database_reachable():
+                return json_response(request, http.HTTPStatus.OK, {"status": "ready"})
+            return json_response(request, http.HTTPStatus.SERVICE_UNAVAILABLE, {"status": "database_unavailable"})
+        status = "draining" if self.draining else "starting"
+        return json_response(request, http.HTTPStatus.SERVICE_UNAVAILABLE, {"status": status})
+
+    async def _handle_http_fibonacci(self, request):
+        # Cálculo avulso sem sessão: nada de boas-vindas, presença ou registro no banco.
+        # Usa o mesmo agendador (cache, fila justa e limite por cliente) do WebSocket,
+        # com o IP de origem como cliente
+        result_format = request.query.get("format", ["decimal"])[0]
+        try:
+            if request.path.startswith("/fib/"):
+                values = [request.path[len("/fib/"):]]
+            else:
+                values = ",".join(request.query.get("n", [])).split(",")
+            try:
+                numbers = [int(value) for value in values if value.strip()]
+            except ValueError:
+                raise ValueError("O valor de n deve ser um número inteiro")
+            if not numbers:
+                raise ValueError("Informe n em /fib/{n} ou /fib?n=1,2,3")
+            if len(numbers) > HTTP_FIB_MAX_BATCH:
+                raise ValueError(f"No máximo {HTTP_FIB_MAX_BATCH} valores por pedido")
+            if any(n < 0 for n in numbers):
+                raise ValueError("O valor de n não pode ser negativo")
+            if any(n > HTTP_FIB_MAX_N for n in numbers):
+                raise ValueError(f"O valor de n não pode passar de {HTTP_FIB_MAX_N}")
+            if result_format not in RESULT_FORMATS:
+                raise ValueError(f"Formato de resultado inválido: {result_format}")
+        except ValueError as e:
+            return json_response(request, http.HTTPStatus.BAD_REQUEST, {"type": "error", "message": str(e)})
+
+        client_id = f"http_{request.remote_address or 'local'}"
+        messages = []
+        try:
+            # Em lotes do tamanho do limite por cliente para não esbarrar na admissão
+            chunk = max(1, self.scheduler.max_pending_per_client)
+            for start in range(0, len(numbers), chunk):
+                results = await asyncio.gather(*(
+                    self.scheduler.submit(client_id, n, result_format)
+                    for n in numbers[start:start + chunk]
+                ))
+                messages.extend(message for message, _ in results)
+        except SchedulerFull as e:
+            return json_response(request, http.HTTPStatus.TOO_MANY_REQUESTS, {"type": "error", "message": str(e)})
+
+        logger.info(f"Fibonacci via HTTP para {client_id}: {len(numbers)} valor(es)")
+        if request.path.startswith("/fib/"):
+            return text_response(request, http.HTTPStatus.OK, messages[0], "application/json")
+        return text_response(request, http.HTTPStatus.OK, "[" + ", ".join(messages) + "]", "application/json")
+
+    async def _initialize_database(self):
+        # Roda depois que o socket já está aberto, fora do loop de eventos
+        while self.running:
+            try:
+                await asyncio.to_thread(init_database)
+                break
+            except Exception as e:
+                logger.error(f"Falha ao inicializar o banco de dados, nova tentativa em "
+                             f"{MONGO_INIT_RETRY_SECONDS}s: {str(e)}")
+                await asyncio.sleep(MONGO_INIT_RETRY_SECONDS)
+        else:
+            return
+
+        # Sessões deixadas online por instâncias que caíram saem antes de aceitar clientes
+        await asyncio.to_thread(reconcile_sessions, INSTANCE_ID, LEASE_TTL_SECONDS)
+        self.lease_held = True
+
+        self.ready = True
+        elapsed_ms = (time.monotonic() - self.started_at) * 1000
+        logger.info(f"Servidor pronto para receber clientes em {elapsed_ms:.1f} ms")
+        self.background_tasks.append(asyncio.create_task(self.maintain_lease()))
+
+    def _on_handoff(self):
+        self.handed_off = True
+        self.begin_drain()
+
+    def begin_drain(self):
+        if self.drain_task is None and self.server is not None:
+            self.drain_task = asyncio.create_task(self.drain())
+        elif self.draining:
+            # Segundo pedido de desligamento: não espera mais ninguém
+            logger.info("Encerrando as conexões restantes sem aguardar o drain")
+            asyncio.create_task(self.close_connections())
+
+    async def drain(self):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + DRAIN_TIMEOUT
+        self.draining = True
+        self.ready = False
+        # Para de aceitar conexões; as abertas continuam sendo atendidas
+        self.server.close(close_connections=False)
+        logger.info(f"Drain iniciado: {len(self.connections)} conexões, "
+                    f"{len(self.fibonacci_tasks)} cálculos em andamento")
+
+        # Cada cliente recebe um atraso diferente para não reconectarem todos juntos
+        clients = list(self.connections.values())
+        for index, state in enumerate(clients):
+            delay = DRAIN_RECONNECT_SPREAD * index / len(clients)
+            try:
+                await self._send(state, json.dumps({"type": "reconnect", "delay": round(delay, 3)}))
+            except websockets.exceptions.ConnectionClosed:
+                pass
+
+        if self.fibonacci_tasks:
+            await asyncio.wait(list(self.fibonacci_tasks), timeout=max(0.0, deadline - loop.time()))
+            if self.fibonacci_tasks:
+                logger.warning(f"{len(self.fibonacci_tasks)} cálculos não terminaram dentro do prazo do drain")
+
+        # Os clientes saem sozinhos depois do atraso; quem sobrar é fechado com 1012
+        while self.connections and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        await self.close_connections()
+        logger.info(f"Drain concluído em {loop.time() - started:.1f}s")
+
+    async def close_connections(self):
+        await asyncio.gather(
+            *(state.websocket.close(CLOSE_SERVICE_RESTART, "Servidor reiniciando")
+              for state in list(self.connections.values())),
+            return_exceptions=True
+        )
+
+    def _release_lease(self):
+        if self.lease_held:
+            set_instance_sessions_offline(INSTANCE_ID)
+            release_lease(INSTANCE_ID)
+            self.lease_held = False
+
+    async def start(self, sock=None):
+        if self.watchdog:
+            self.watchdog.start()
+
+        self.scheduler.start()
+        if CAPTURE_PATH:
+            try:
+                self.recorder = TrafficRecorder(CAPTURE_PATH, CAPTURE_MAX_BYTES)
+            except OSError as e:
+                logger.error(f"Falha ao abrir o arquivo de captura: {str(e)}")
+        self.background_tasks.append(asyncio.create_task(self.scheduler.run()))
+        self.background_tasks.append(asyncio.create_task(self.broadcast_time()))
+        self.background_tasks.append(asyncio.create_task(self.dispatch_presence()))
+        self.background_tasks.append(asyncio.create_task(self.sessions.run()))
+        self.background_tasks.append(asyncio.create_task(self.analytics.run()))
+
+        # Com um socket herdado do processo anterior não há novo bind
+        address = {"sock": sock} if sock is not None else {"host": self.host, "port": self.port}
         self.server = await websockets.serve(
             self.handle_client, 
-            self.host, 
-            self.port
+            **address,
+            process_request=self._process_request,
+            max_size=WS_MAX_SIZE,
+            max_queue=WS_MAX_QUEUE,
+            write_limit=WS_WRITE_LIMIT,
+            **compression_options(WS_COMPRESSION, WS_COMPRESSION_MIN_SIZE, WS_COMPRESSION_WINDOW_BITS,
+                                  WS_COMPRESSION_MEM_LEVEL, WS_COMPRESSION_LEVEL)
         )
         
-        logger.info(f"Servidor WebSocket iniciado em ws://{self.host}:{self.port}")
+        elapsed_ms = (time.monotonic() - self.started_at) * 1000
+        logger.info(f"Servidor WebSocket iniciado em ws://{self.host}:{self.port} ({elapsed_ms:.1f} ms)")
+        self.background_tasks.append(asyncio.create_task(self._initialize_database()))
+
+        if HANDOFF_PATH:
+            try:
+                self.handoff = HandoffListener(HANDOFF_PATH, lambda: self.server.sockets, self._on_handoff)
+                self.handoff.open()
+                self.background_tasks.append(asyncio.create_task(self.handoff.serve()))
+            except OSError as e:
+                logger.error(f"Falha ao abrir o socket de passagem em {HANDOFF_PATH}: {str(e)}")
+                self.handoff = None
         
         try:
             await self.server.wait_closed()
@@ -274,11 +908,26 @@ class WebSocketServer:
             logger.error(f"Erro no servidor: {str(e)}")
         finally:
             self.running = False
-            broadcast_task.cancel()
-            inactive_check_task.cancel() 
-            try:
-                await broadcast_task
-                await inactive_check_task
-            except asyncio.CancelledError:
-                pass
+            if self.handoff:
+                self.handoff.close()
+            # O último lote de sessões precisa chegar ao banco antes de liberar o lease
+            await self.sessions.close()
+            logger.info(f"Resumo da gravação de sessões: {self.sessions.stats()}")
+            await self.analytics.close()
+            for task in self.background_tasks:
+                task.cancel()
+            for task in self.background_tasks:
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            if self.watchdog:
+                self.watchdog.stop()
+                logger.info(f"Resumo do watchdog: {self.watchdog.stats()}")
+            logger.info(f"Resumo do agendador de Fibonacci: {self.scheduler.stats()}")
+            self.scheduler.close()
+            self.batch_executor.shutdown(wait=False, cancel_futures=True)
+            if self.recorder:
+                self.recorder.close()
+            self._release_lease()
             close_connection()
\ No newline at end of file
@@ -0,0 +1,110 @@
+import asyncio
+import datetime
+import logging
+import time
+from typing import Callable, Dict, Tuple
+
+logger = logging.getLogger('websocket_server.session_writer')
+
+
+class SessionWriter:
+    # Tira a persistência das sessões do caminho do handshake: entradas, saídas e
+    # renomeações ficam num buffer por usuário e vão ao banco num único bulk_write
+    # por intervalo (ou antes, se o buffer encher). Mudanças do mesmo usuário dentro
+    # do intervalo viram uma operação só, com os campos mais recentes valendo.
+    def __init__(self, write: Callable, flush_interval: float = 0.05, max_batch: int = 1000,
+                 retry_interval: float = 1.0):
+        self.write = write
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.retry_interval = retry_interval
+        self._pending: Dict[str, Tuple[dict, bool]] = {}
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._closed = False
+        self.batches = 0
+        self.operations = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.max_batch_seen = 0
+        self.write_seconds = 0.0
+
+    def _merge(self, user_id: str, fields: dict, upsert: bool = False):
+        pending = self._pending.get(user_id)
+        if pending is None:
+            self._pending[user_id] = (fields, upsert)
+        else:
+            self._pending[user_id] = ({**pending[0], **fields}, pending[1] or upsert)
+            self.coalesced += 1
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    def connected(self, user_id: str, username: str, instance_id: str, connected_at: float):
+        self._merge(user_id, {
+            'id': user_id,
+            'username': username,
+            'connected_at': datetime.datetime.fromtimestamp(connected_at),
+            'online': True,
+            'disconnected_at': None,
+            'instance_id': instance_id
+        }, upsert=True)
+
+    def disconnected(self, user_id: str):
+        self._merge(user_id, {'online': False, 'disconnected_at': datetime.datetime.now()})
+
+    def renamed(self, user_id: str, username: str):
+        self._merge(user_id, {'username': username})
+
+    async def flush(self) -> bool:
+        # Um lote por vez: dois lotes em paralelo poderiam gravar fora de ordem
+        async with self._lock:
+            if not self._pending:
+                return True
+            batch, self._pending = self._pending, {}
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.write, batch)
+            except Exception as e:
+                # Volta para o buffer por baixo das mudanças que chegaram durante a escrita
+                self.failures += 1
+                logger.error(f"Falha ao gravar {len(batch)} sessões em lote, nova tentativa no próximo ciclo: {str(e)}")
+                for user_id, (fields, upsert) in batch.items():
+                    newer = self._pending.get(user_id)
+                    if newer is not None:
+                        fields, upsert = {**fields, **newer[0]}, upsert or newer[1]
+                    self._pending[user_id] = (fields, upsert)
+                return False
+
+            self.batches += 1
+            self.operations += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.write_seconds += time.perf_counter() - started
+            return True
+
+    async def run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not await self.flush():
+                # Banco fora do ar: espera um pouco antes de tentar de novo
+                await asyncio.sleep(self.retry_interval)
+
+    async def close(self):
+        # Espera o lote em andamento e grava o que sobrou antes do desligamento
+        self._closed = True
+        self._wakeup.set()
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "operations": self.operations,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "pending": len(self._pending),
+            "max_batch": self.max_batch_seen,
+            "avg_write_ms": round(self.write_seconds / self.batches * 1000, 3) if self.batches else 0.0
+        }
@@ -0,0 +1,200 @@
+import fcntl
+import logging
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+logger = logging.getLogger('websocket_server.shared_cache')
+
+# Layout do segmento: cabeçalho, tabela de índice e área circular de dados.
+# Cada slot do índice tem um número de sequência (seqlock): fica ímpar durante
+# a escrita, então leitores não precisam de lock e descartam leituras cruzadas.
+_HEADER = struct.Struct("<4sQQQ")
+_SLOT = struct.Struct("<QqQQ")
+_MAGIC = b"FSC1"
+
+_EMPTY = -1
+_TOMBSTONE = -2
+_MAX_PROBE = 16
+
+
+class SharedFibonacciCache:
+    def __init__(self, shm: shared_memory.SharedMemory, created: bool):
+        self._shm = shm
+        self._created = created
+        magic, self.slots, self.capacity, _ = _HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"Segmento de memória compartilhada inválido: {shm.name}")
+        self._index_offset = _HEADER.size
+        self._arena_offset = self._index_offset + self.slots * _SLOT.size
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @classmethod
+    def open(cls, name: str, capacity_bytes: int, slots: int = 4096):
+        # Cria o segmento ou se anexa a um já existente (outro worker pode tê-lo criado)
+        with _file_lock(name):
+            try:
+                size = _HEADER.size + slots * _SLOT.size + capacity_bytes
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                shm = shared_memory.SharedMemory(name=name)
+                _untrack(shm)
+                logger.info(f"Anexado ao cache compartilhado {name}")
+                return cls(shm, created=False)
+
+            _untrack(shm)
+            _HEADER.pack_into(shm.buf, 0, _MAGIC, slots, capacity_bytes, 0)
+            empty_slot = _SLOT.pack(0, _EMPTY, 0, 0)
+            for slot in range(slots):
+                shm.buf[_HEADER.size + slot * _SLOT.size:_HEADER.size + (slot + 1) * _SLOT.size] = empty_slot
+            logger.info(f"Cache compartilhado {name} criado: {capacity_bytes} bytes, {slots} slots")
+            return cls(shm, created=True)
+
+    def __reduce__(self):
+        return (_attach, (self.name,))
+
+    def _slot_position(self, slot):
+        return self._index_offset + slot * _SLOT.size
+
+    def _read_slot(self, slot):
+        return _SLOT.unpack_from(self._shm.buf, self._slot_position(slot))
+
+    def _write_slot(self, slot, n, offset, length):
+        position = self._slot_position(slot)
+        sequence = _SLOT.unpack_from(self._shm.buf, position)[0]
+        struct.pack_into("<Q", self._shm.buf, position, sequence + 1)
+        _SLOT.pack_into(self._shm.buf, position, sequence + 1, n, offset, length)
+        struct.pack_into("<Q", self._shm.buf, position, sequence + 2)
+
+    def _probe(self, n):
+        home = n % self.slots
+        for step in range(_MAX_PROBE):
+            yield (home + step) % self.slots
+
+    def contains(self, n: int) -> bool:
+        for slot in self._probe(n):
+            sequence, slot_n, _, _ = self._read_slot(slot)
+            if slot_n == _EMPTY:
+                return False
+            if slot_n == n and not sequence & 1:
+                return True
+        return False
+
+    def get_bytes(self, n: int) -> Optional[bytes]:
+        for slot in self._probe(n):
+            sequence, slot_n, offset, length = self._read_slot(slot)
+            if slot_n == _EMPTY:
+                return None
+            if slot_n != n or sequence & 1:
+                continue
+
+            start = self._arena_offset + offset
+            data = bytes(self._shm.buf[start:start + length])
+            if self._read_slot(slot)[0] != sequence:
+                # O escritor reaproveitou o slot durante a cópia
+                return None
+            return data
+        return None
+
+    def get(self, n: int) -> Optional[int]:
+        data = self.get_bytes(n)
+        if data is None:
+            return None
+        return int.from_bytes(data, "little")
+
+    def put(self, n: int, value: int) -> bool:
+        return self.put_bytes(n, value.to_bytes((value.bit_length() + 7) // 8, "little"))
+
+    def put_bytes(self, n: int, data: bytes) -> bool:
+        length = len(data)
+        if length > self.capacity:
+            return False
+
+        with _file_lock(self.name):
+            free_slot = None
+            for slot in self._probe(n):
+                _, slot_n, _, _ = self._read_slot(slot)
+                if slot_n == n:
+                    return True
+                if free_slot is None and slot_n in (_EMPTY, _TOMBSTONE):
+                    free_slot = slot
+                if slot_n == _EMPTY:
+                    break
+
+            head = _HEADER.unpack_from(self._shm.buf, 0)[3]
+            if head + length > self.capacity:
+                head = 0
+            self._evict_range(head, head + length)
+
+            start = self._arena_offset + head
+            self._shm.buf[start:start + length] = data
+
+            if free_slot is None:
+                # Sem slot livre na sequência de sondagem: substitui a entrada na posição inicial
+                free_slot = n % self.slots
+            self._write_slot(free_slot, n, head, length)
+
+            struct.pack_into("<Q", self._shm.buf, _HEADER.size - 8, head + length)
+            return True
+
+    def _evict_range(self, start, end):
+        # A área de dados é circular: entradas que ocupam o trecho a ser sobrescrito saem do índice
+        for slot in range(self.slots):
+            _, slot_n, offset, length = self._read_slot(slot)
+            if slot_n < 0:
+                continue
+            if offset < end and offset + length > start:
+                self._write_slot(slot, _TOMBSTONE, 0, 0)
+
+    def stats(self):
+        entries = 0
+        used_bytes = 0
+        for slot in range(self.slots):
+            _, slot_n, _, length = self._read_slot(slot)
+            if slot_n >= 0:
+                entries += 1
+                used_bytes += length
+        return {"entries": entries, "bytes": used_bytes, "capacity": self.capacity}
+
+    def close(self, unlink: bool = None):
+        # Por padrão só quem criou o segmento o remove
+        self._shm.close()
+        if self._created if unlink is None else unlink:
+            try:
+                resource_tracker.register(self._shm._name, "shared_memory")
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    _untrack(shm)
+    return SharedFibonacciCache(shm, created=False)
+
+
+def _untrack(shm):
+    # O ciclo de vida do segmento é controlado por close(); sem isso o
+    # resource_tracker o removeria quando qualquer processo anexado saísse
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+@contextmanager
+def _file_lock(name):
+    path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
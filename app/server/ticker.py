@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger('websocket_server.ticker')
+
+
+class Tick:
+    __slots__ = ("wall_time", "deadline", "lag", "skipped")
+
+    def __init__(self, wall_time, deadline, lag, skipped):
+        self.wall_time = wall_time
+        self.deadline = deadline
+        self.lag = lag
+        self.skipped = skipped
+
+
+class WallClockTicker:
+    def __init__(self, period: float = 1.0, lag_warning: float = 0.05):
+        self.period = period
+        self.lag_warning = lag_warning
+        self.ticks_fired = 0
+        self.late_ticks = 0
+        self.skipped_ticks = 0
+        self.max_lag = 0.0
+
+    def _next_boundary(self, previous):
+        boundary = (math.floor(time.time() / self.period) + 1) * self.period
+        if previous is not None and boundary <= previous:
+            # Acordou um pouco antes da fronteira: não repete o mesmo tick
+            boundary = previous + self.period
+        return boundary
+
+    async def ticks(self):
+        loop = asyncio.get_running_loop()
+        previous = None
+
+        while True:
+            boundary = self._next_boundary(previous)
+            # O prazo é convertido para o relógio do loop, que é monotônico
+            deadline = loop.time() + (boundary - time.time())
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+
+            lag = max(0.0, loop.time() - deadline)
+            skipped = 0
+            if previous is not None:
+                skipped = max(0, round((boundary - previous) / self.period) - 1)
+
+            self._record(lag, skipped)
+            previous = boundary
+            yield Tick(boundary, deadline, lag, skipped)
+
+    def _record(self, lag, skipped):
+        self.ticks_fired += 1
+        self.max_lag = max(self.max_lag, lag)
+
+        if skipped:
+            self.skipped_ticks += skipped
+            logger.warning(f"{skipped} tick(s) perdidos: o loop ficou ocupado por mais de um período")
+
+        if lag > self.lag_warning:
+            self.late_ticks += 1
+            logger.warning(f"Tick atrasado em {lag * 1000:.1f} ms")
+
+    def stats(self):
+        return {
+            "ticks": self.ticks_fired,
+            "late_ticks": self.late_ticks,
+            "skipped_ticks": self.skipped_ticks,
+            "max_lag_ms": round(self.max_lag * 1000, 3)
+        }
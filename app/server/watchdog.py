@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+logger = logging.getLogger('websocket_server.watchdog')
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class LoopWatchdog:
+    # O loop registra um batimento a cada intervalo; uma thread separada verifica
+    # se o batimento parou e, nesse caso, captura a pilha da thread do loop
+    def __init__(self, threshold: float, interval: float = None, stack_depth: int = 12):
+        self.threshold = threshold
+        self.interval = interval or max(threshold / 4, 0.01)
+        self.stack_depth = stack_depth
+        self.stalls = 0
+        self.total_stall_time = 0.0
+        self.max_stall = 0.0
+        self.sites = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._loop = None
+        self._loop_thread_id = None
+        self._handle = None
+        self._thread = None
+        self._last_beat = time.monotonic()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._beat()
+        self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Watchdog do loop ativo (limite: {self.threshold * 1000:.0f} ms)")
+
+    def stop(self):
+        self._stop.set()
+        if self._handle:
+            self._handle.cancel()
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        if not self._stop.is_set():
+            self._handle = self._loop.call_later(self.interval, self._beat)
+
+    def _run(self):
+        stall_started = None
+        stall_lag = 0.0
+        stall_sites = Counter()
+
+        while not self._stop.wait(self.interval):
+            lag = time.monotonic() - self._last_beat - self.interval
+
+            if lag > self.threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                site, stack = self._call_site(frame)
+                del frame
+                stall_sites[site] += 1
+                stall_lag = lag
+
+                if stall_started is None:
+                    stall_started = self._last_beat
+                    logger.warning(f"Loop de eventos parado há {lag * 1000:.0f} ms em {site}\n{stack}")
+
+            elif stall_started is not None:
+                self._record_stall(stall_lag, stall_sites)
+                stall_started = None
+                stall_lag = 0.0
+                stall_sites = Counter()
+
+    def _call_site(self, frame):
+        summary = traceback.extract_stack(frame)
+        # O ponto responsável é o frame mais interno que pertence ao próprio servidor
+        site = None
+        for entry in reversed(summary):
+            if entry.filename.startswith(_APP_DIR) and not entry.filename.endswith("watchdog.py"):
+                site = f"{os.path.basename(entry.filename)}:{entry.name}:{entry.lineno}"
+                break
+        if site is None:
+            last = summary[-1]
+            site = f"{os.path.basename(last.filename)}:{last.name}:{last.lineno}"
+        return site, "".join(traceback.format_list(summary[-self.stack_depth:])).rstrip()
+
+    def _record_stall(self, lag, stall_sites):
+        with self._lock:
+            self.stalls += 1
+            self.total_stall_time += lag
+            self.max_stall = max(self.max_stall, lag)
+            self.sites.update(stall_sites)
+
+        top = ", ".join(f"{site} ({count})" for site, count in stall_sites.most_common(3))
+        logger.warning(f"Loop de eventos bloqueado por ~{lag * 1000:.0f} ms; amostras: {top}")
+
+    def stats(self, top: int = 10):
+        with self._lock:
+            return {
+                "threshold_ms": self.threshold * 1000,
+                "stalls": self.stalls,
+                "total_stall_ms": round(self.total_stall_time * 1000, 1),
+                "max_stall_ms": round(self.max_stall * 1000, 1),
+                "sites": [{"site": site, "samples": count} for site, count in self.sites.most_common(top)]
+            }
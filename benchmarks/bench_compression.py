@@ -0,0 +1,168 @@
+import argparse
+import itertools
+import json
+import sys
+import time
+
+from common import add_server_path, print_table, save_results
+
+add_server_path()
+
+from websockets.extensions.permessage_deflate import PerMessageDeflate  # noqa: E402
+from websockets.frames import Frame, Opcode  # noqa: E402
+
+from fibonacci import calculate_fibonacci  # noqa: E402
+from serialization import encode_fibonacci_result  # noqa: E402
+
+FIBONACCI_N = [100, 1_000, 10_000, 100_000, 1_000_000]
+THRESHOLDS = [0, 128, 256, 512, 1024, 4096]
+
+# Mistura por cliente e por minuto usada para estimar o efeito de cada limite:
+# um time_update por segundo, alguns deltas de presença e cálculos de vários tamanhos
+TRAFFIC_MIX = {
+    "time_update": 60,
+    "user_joined": 5,
+    "users_list (20)": 1,
+    "fibonacci n=100 decimal": 4,
+    "fibonacci n=1000 decimal": 4,
+    "fibonacci n=10000 decimal": 2,
+    "fibonacci n=100000 hex": 1,
+}
+
+
+def time_update_messages(count):
+    start = time.time()
+    return [json.dumps({
+        "type": "time_update",
+        "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start + second)),
+        "server_time": start + second
+    }) for second in range(count)]
+
+
+def presence_messages(count):
+    return [json.dumps({
+        "type": "user_joined",
+        "version": version,
+        "user": {"client_id": f"client_{140000000000000 + version * 7919}",
+                 "username": f"user_client_{140000000000000 + version * 7919}",
+                 "connected_at": "2024-01-01 12:00:00"}
+    }) for version in range(count)]
+
+
+def users_list_message(count):
+    return json.dumps({"type": "users_list", "users": [{
+        "id": f"client_{140000000000000 + index}",
+        "username": f"usuario_{index}",
+        "connected_at": "2024-01-01 12:00:00",
+        "online": True,
+        "disconnected_at": None,
+        "instance_id": "websocket-server-1-3f2a9c1d",
+        "online_time": f"0h {index % 60}m {index % 60}s"
+    } for index in range(count)]})
+
+
+def build_samples(fibonacci_n, distinct):
+    if hasattr(sys, "set_int_max_str_digits"):
+        sys.set_int_max_str_digits(0)
+
+    samples = {
+        "time_update": time_update_messages(60),
+        "user_joined": presence_messages(20),
+        "users_list (20)": [users_list_message(20)],
+        "users_list (1000)": [users_list_message(1000)],
+    }
+    # Resultados diferentes (n, n+1, ...): repetir o mesmo F(n) deixaria o
+    # compressor achar a mensagem anterior inteira na janela
+    for n in fibonacci_n:
+        values = [calculate_fibonacci(n + offset) for offset in range(distinct)]
+        for result_format in ("decimal", "hex", "base64"):
+            samples[f"fibonacci n={n} {result_format}"] = [
+                encode_fibonacci_result(n + offset, value, result_format,
+                                        {"id": offset, "queue_ms": 0.0, "service_ms": 1.0})
+                for offset, value in enumerate(values)
+            ]
+    return samples
+
+
+def run_stream(messages, window_bits, mem_level, level):
+    # Mesmo caminho do servidor: o extension do websockets com context takeover,
+    # passando as mensagens em sequência para o compressor aproveitar o histórico
+    encoder = PerMessageDeflate(False, False, 15, window_bits, {"memLevel": mem_level, "level": level})
+    decoder = PerMessageDeflate(False, False, window_bits, 15)
+    frames = [Frame(Opcode.TEXT, message.encode("utf-8")) for message in messages]
+
+    started = time.perf_counter()
+    encoded = [encoder.encode(frame) for frame in frames]
+    encode_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for frame in encoded:
+        decoder.decode(frame)
+    decode_seconds = time.perf_counter() - started
+
+    return {
+        "raw_bytes": sum(len(frame.data) for frame in frames) / len(frames),
+        "compressed_bytes": sum(len(frame.data) for frame in encoded) / len(frames),
+        "encode_us": encode_seconds / len(frames) * 1e6,
+        "decode_us": decode_seconds / len(frames) * 1e6,
+    }
+
+
+def estimate_mix(per_message, thresholds):
+    # Bytes e CPU de compressão por cliente e por minuto para cada limite de tamanho
+    rows = []
+    for threshold in thresholds:
+        sent = cpu = raw = 0.0
+        for name, count in TRAFFIC_MIX.items():
+            stats = per_message[name]
+            raw += stats["raw_bytes"] * count
+            if stats["raw_bytes"] < threshold:
+                sent += stats["raw_bytes"] * count
+            else:
+                sent += stats["compressed_bytes"] * count
+                cpu += stats["encode_us"] * count
+        rows.append({"min_size": threshold, "raw_bytes": raw, "sent_bytes": sent, "encode_us": cpu})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU x banda do permessage-deflate nas mensagens do servidor")
+    parser.add_argument("--fibonacci-n", type=int, nargs="+", default=FIBONACCI_N)
+    parser.add_argument("--window-bits", type=int, nargs="+", default=[12, 15])
+    parser.add_argument("--mem-levels", type=int, nargs="+", default=[5, 8])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 6])
+    parser.add_argument("--thresholds", type=int, nargs="+", default=THRESHOLDS)
+    parser.add_argument("--distinct", type=int, default=3, help="Resultados diferentes medidos por tamanho de n")
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    samples = build_samples(args.fibonacci_n, args.distinct)
+    results = []
+    for window_bits, mem_level, level in itertools.product(args.window_bits, args.mem_levels, args.levels):
+        settings = f"wbits={window_bits} mem={mem_level} nível={level}"
+        per_message = {}
+        rows = []
+        for name, messages in samples.items():
+            stats = run_stream(messages, window_bits, mem_level, level)
+            per_message[name] = stats
+            results.append({"settings": settings, "message": name, **stats})
+            rows.append([name, f"{stats['raw_bytes']:.0f}", f"{stats['compressed_bytes']:.0f}",
+                         f"{stats['compressed_bytes'] / stats['raw_bytes'] * 100:.1f}%",
+                         f"{stats['encode_us']:.1f}", f"{stats['decode_us']:.1f}"])
+
+        print(f"\n{settings}")
+        print_table(["mensagem", "bytes", "comprimido", "razão", "comprimir (µs)", "descomprimir (µs)"], rows)
+
+        mix = estimate_mix(per_message, args.thresholds)
+        print("Mistura por cliente e por minuto:")
+        print_table(["min_size", "bytes sem compressão", "bytes enviados", "CPU de compressão (µs)"],
+                    [[row["min_size"], f"{row['raw_bytes']:.0f}", f"{row['sent_bytes']:.0f}", f"{row['encode_us']:.1f}"]
+                     for row in mix])
+        results.extend({"settings": settings, "mix": row} for row in mix)
+
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT_DIR, print_table, save_results, spawn_server
+
+BACKENDS = ["asyncio", "uvloop"]
+
+
+def run_harness(port, backend, args):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as output:
+        output_path = output.name
+
+    env = dict(os.environ, EVENT_LOOP=backend)
+    subprocess.run(
+        [sys.executable, "load_harness.py", "--uri", f"ws://127.0.0.1:{port}",
+         "--clients", str(args.clients), "--duration", str(args.duration), "--output", output_path],
+        cwd=os.path.join(ROOT_DIR, "benchmarks"), env=env, check=True, stdout=subprocess.DEVNULL
+    )
+    with open(output_path) as result_file:
+        result = json.load(result_file)
+    os.unlink(output_path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara vazão e latência entre asyncio e uvloop")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8792)
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    results = {}
+    rows = []
+    for backend in args.backends:
+        # Servidor e cliente de carga usam o mesmo loop em cada rodada
+        process = spawn_server(args.port, EVENT_LOOP=backend)
+        try:
+            result = run_harness(args.port, backend, args)
+        finally:
+            process.terminate()
+            process.wait()
+
+        results[backend] = result
+        summary = result["summary"]
+        total = sum(stats["count"] for stats in summary.values())
+        for message_type, stats in summary.items():
+            rows.append([result["loop"], message_type, f"{stats['throughput']:.1f}",
+                         f"{stats['p50_ms']:.2f}", f"{stats['p99_ms']:.2f}"])
+        rows.append([result["loop"], "total", f"{total / result['duration']:.1f}", "", ""])
+
+    print_table(["loop", "tipo", "msg/s", "p50 (ms)", "p99 (ms)"], rows)
+
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import random
+import time
+
+from common import add_server_path, print_table, save_results
+
+add_server_path()
+
+from fibonacci import fibonacci_mod, fibonacci_mod_batch  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000, 300_000]
+# Um módulo pelo caminho de 32 bits e outro pelo de 62 bits
+MODULI = [1_000_000_007, (1 << 61) - 1]
+
+
+def run(func, *args, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def per_element(values, modulus):
+    return [fibonacci_mod(n, modulus) for n in values]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fibonacci mod m em lote com numpy contra o laço por elemento")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--moduli", type=int, nargs="+", default=MODULI)
+    parser.add_argument("--max-n", type=int, default=10 ** 18, help="Maior n sorteado")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = []
+    rows = []
+    for modulus in args.moduli:
+        for size in args.sizes:
+            values = [rng.randrange(args.max_n) for _ in range(size)]
+            vector_seconds, vector = run(fibonacci_mod_batch, values, modulus, repeat=args.repeat)
+            loop_seconds, expected = run(per_element, values, modulus, repeat=1)
+            if vector != expected:
+                raise AssertionError(f"Resultados diferentes para o módulo {modulus} com {size} valores")
+
+            results.append({"modulus": modulus, "size": size, "vector_seconds": vector_seconds,
+                            "loop_seconds": loop_seconds})
+            rows.append([modulus, size, f"{vector_seconds * 1000:.1f}", f"{loop_seconds * 1000:.1f}",
+                         f"{size / vector_seconds:,.0f}", f"{loop_seconds / vector_seconds:.1f}x"])
+
+    print_table(["módulo", "valores", "lote (ms)", "laço (ms)", "valores/s (lote)", "ganho"], rows)
+
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+
+from common import add_server_path, print_table, probe, save_results
+
+add_server_path()
+
+import websockets  # noqa: E402
+
+import database  # noqa: E402
+from fake_mongo import FakeMongoClient  # noqa: E402
+
+CLIENT_COUNTS = [500, 2000]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def serve(port, latency):
+    # Processo do servidor: o mesmo WebSocketServer de main.py, com o banco em memória
+    # e atraso por operação simulando a ida e volta até o MongoDB
+    logging.basicConfig(level=logging.WARNING)
+    database.configure_client(FakeMongoClient(latency))
+    from server import WebSocketServer
+    asyncio.run(WebSocketServer("127.0.0.1", port).start())
+
+
+def start_server(port, latency, timeout=30.0):
+    process = multiprocessing.Process(target=serve, args=(port, latency), daemon=True)
+    process.start()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if probe(port, "/readyz") == 200:
+            return process
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("O servidor não ficou pronto a tempo")
+
+
+async def open_connection(uri, semaphore, latencies, frames, errors, opened):
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            websocket = await websockets.connect(uri, ping_interval=None, open_timeout=30)
+            # Conta os quadros até a hora inicial chegar: o handshake termina aí
+            count = 0
+            while True:
+                data = json.loads(await websocket.recv())
+                count += 1
+                if "time" in data:
+                    break
+        except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+            errors.append(str(e))
+            return
+        latencies.append(time.perf_counter() - started)
+        frames.append(count)
+        opened.append(websocket)
+
+
+async def storm(uri, clients, concurrency):
+    # Todos os clientes chegam de uma vez, como numa reconexão em massa depois de um deploy,
+    # e continuam conectados até o fim da rodada
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, frames, errors, opened = [], [], [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        open_connection(uri, semaphore, latencies, frames, errors, opened) for _ in range(clients)
+    ))
+    elapsed = time.perf_counter() - started
+    await asyncio.gather(*(websocket.close() for websocket in opened), return_exceptions=True)
+
+    return {
+        "clients": clients,
+        "connected": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "connections_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "frames_per_handshake": sum(frames) / len(frames) if frames else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conexões por segundo numa reconexão em massa")
+    parser.add_argument("--clients", type=int, nargs="+", default=CLIENT_COUNTS)
+    parser.add_argument("--concurrency", type=int, default=500, help="Handshakes simultâneos no cliente")
+    parser.add_argument("--latency-ms", type=float, nargs="+", default=[0.0, 1.0],
+                        help="Atraso simulado por operação no banco")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8793)
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    uri = f"ws://127.0.0.1:{args.port}"
+    results = []
+    rows = []
+    for latency_ms in args.latency_ms:
+        process = start_server(args.port, latency_ms / 1000)
+        try:
+            for clients in args.clients:
+                rounds = [asyncio.run(storm(uri, clients, args.concurrency)) for _ in range(args.rounds)]
+                # Vale a rodada mediana em conexões por segundo
+                result = sorted(rounds, key=lambda item: item["connections_per_second"])[len(rounds) // 2]
+                result["latency_ms"] = latency_ms
+                results.append(result)
+                rows.append([f"{latency_ms:g}", clients, result["connected"], result["errors"],
+                             f"{result['connections_per_second']:.0f}", f"{result['p50_ms']:.1f}",
+                             f"{result['p99_ms']:.1f}", f"{result['frames_per_handshake']:.1f}"])
+        finally:
+            process.terminate()
+            process.join()
+
+    print_table(["atraso do banco (ms)", "clientes", "conectados", "erros", "conexões/s",
+                 "p50 (ms)", "p99 (ms)", "quadros até a hora"], rows)
+
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
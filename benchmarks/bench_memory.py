@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import resource
+
+from common import print_table, save_results, spawn_server
+
+import websockets
+
+
+def read_rss(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def raise_fd_limit(count):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, count + 1024)
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+async def open_connections(uri, count, concurrency):
+    connections = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def open_one():
+        async with semaphore:
+            websocket = await websockets.connect(uri, ping_interval=None, compression=None)
+            await websocket.recv()
+            connections.append(websocket)
+
+    await asyncio.gather(*(open_one() for _ in range(count)))
+    return connections
+
+
+async def measure(pid, uri, count, concurrency, settle):
+    baseline = read_rss(pid)
+    connections = await open_connections(uri, count, concurrency)
+    await asyncio.sleep(settle)
+    loaded = read_rss(pid)
+
+    await asyncio.gather(*(websocket.close() for websocket in connections), return_exceptions=True)
+    return baseline, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a memória do servidor por conexão ociosa")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--port", type=int, default=8791)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--settle", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    raise_fd_limit(max(args.clients))
+    uri = f"ws://127.0.0.1:{args.port}"
+
+    rows = []
+    results = []
+    for count in args.clients:
+        process = spawn_server(args.port, args.timeout)
+        try:
+            baseline, loaded = asyncio.run(measure(process.pid, uri, count, args.concurrency, args.settle))
+        finally:
+            process.terminate()
+            process.wait()
+
+        per_connection = (loaded - baseline) / count
+        results.append({"clients": count, "baseline_rss": baseline, "loaded_rss": loaded,
+                        "bytes_per_connection": per_connection})
+        rows.append([count, f"{baseline / 2**20:.1f}", f"{loaded / 2**20:.1f}", f"{per_connection:.0f}"])
+
+    print_table(["clientes", "RSS inicial (MiB)", "RSS com clientes (MiB)", "bytes/conexão"], rows)
+
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import os
+import time
+
+from common import add_server_path, print_table, save_results
+
+add_server_path()
+
+import fibonacci  # noqa: E402
+
+SIZES = [10_000_000, 30_000_000, 100_000_000]
+WORKERS = [1, 2, 4, 8]
+
+
+def run(n, workers, repeat):
+    # Cada contagem de processos sobe o próprio pool, aquecido antes de medir
+    fibonacci.configure_parallel(workers, 0)
+    try:
+        pool = fibonacci._get_parallel_pool()
+        if pool is not None:
+            list(pool.map(fibonacci._multiply, range(workers * 4)))
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fibonacci.calculate_fibonacci(n)
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+    finally:
+        fibonacci.configure_parallel(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speedup de um único F(n) enorme com o número de processos")
+    parser.add_argument("--n", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--workers", type=int, nargs="+", default=WORKERS)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    print(f"Núcleos disponíveis: {os.cpu_count()}")
+    results = []
+    rows = []
+    for n in args.n:
+        baseline = None
+        expected = None
+        for workers in args.workers:
+            seconds, result = run(n, workers, args.repeat)
+            if expected is None:
+                baseline, expected = seconds, result
+            elif result != expected:
+                raise AssertionError(f"F({n}) diferente com {workers} processo(s)")
+
+            speedup = baseline / seconds
+            results.append({"n": n, "workers": workers, "seconds": seconds, "speedup": speedup,
+                            "bits": expected.bit_length()})
+            rows.append([n, workers, f"{seconds:.2f}", f"{speedup:.2f}x", f"{speedup / workers * args.workers[0]:.0%}"])
+
+    print_table(["n", "processos", "tempo (s)", "speedup", "eficiência"], rows)
+
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import random
+import sys
+
+from common import add_server_path, measure, print_table, save_results
+
+add_server_path()
+
+from serialization import int_to_base64_string, int_to_decimal_string, int_to_hex_string  # noqa: E402
+
+DEFAULT_BITS = [1_000, 10_000, 100_000, 1_000_000, 4_000_000]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara str() com a conversão decimal subquadrática")
+    parser.add_argument("--bits", type=int, nargs="+", default=DEFAULT_BITS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    if hasattr(sys, "set_int_max_str_digits"):
+        sys.set_int_max_str_digits(0)
+
+    rows = []
+    results = []
+    for bits in args.bits:
+        value = random.getrandbits(bits) | (1 << (bits - 1))
+        assert int_to_decimal_string(value) == str(value)
+
+        timings = {
+            "str": measure(str, value, repeat=args.repeat),
+            "decimal": measure(int_to_decimal_string, value, repeat=args.repeat),
+            "hex": measure(int_to_hex_string, value, repeat=args.repeat),
+            "base64": measure(int_to_base64_string, value, repeat=args.repeat),
+        }
+        results.append({"bits": bits, **timings})
+        rows.append([
+            bits,
+            f"{timings['str'] * 1000:.3f}",
+            f"{timings['decimal'] * 1000:.3f}",
+            f"{timings['hex'] * 1000:.3f}",
+            f"{timings['base64'] * 1000:.3f}",
+            f"{timings['str'] / timings['decimal']:.1f}x",
+        ])
+
+    print_table(["bits", "str (ms)", "decimal (ms)", "hex (ms)", "base64 (ms)", "ganho"], rows)
+
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
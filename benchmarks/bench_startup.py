@@ -0,0 +1,61 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import SERVER_DIR, print_table, probe, save_results
+
+
+def measure_startup(port, timeout):
+    env = dict(os.environ, SERVER_HOST="127.0.0.1", SERVER_PORT=str(port))
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py"], cwd=SERVER_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    listening = ready = None
+    try:
+        while time.perf_counter() - started < timeout:
+            elapsed = time.perf_counter() - started
+            if listening is None and probe(port, "/healthz") == 200:
+                listening = elapsed
+            if listening is not None and probe(port, "/readyz") == 200:
+                ready = elapsed
+                break
+            time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait()
+
+    return listening, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo até o servidor escutar e ficar pronto")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    runs = [measure_startup(args.port, args.timeout) for _ in range(args.runs)]
+    listening = [run[0] * 1000 for run in runs if run[0] is not None]
+    ready = [run[1] * 1000 for run in runs if run[1] is not None]
+
+    rows = []
+    for label, values in (("escutando (liveness)", listening), ("pronto (readiness)", ready)):
+        if values:
+            rows.append([label, len(values), f"{statistics.median(values):.1f}", f"{max(values):.1f}"])
+        else:
+            rows.append([label, 0, "-", "-"])
+    print_table(["etapa", "execuções", "mediana (ms)", "máximo (ms)"], rows)
+
+    if args.output:
+        save_results(args.output, {"listening_ms": listening, "ready_ms": ready})
+
+
+if __name__ == "__main__":
+    main()
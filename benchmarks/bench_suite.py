@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+from common import ROOT_DIR, add_server_path, measure, print_table, save_results
+
+add_server_path()
+
+import database  # noqa: E402
+from analytics import summarize  # noqa: E402
+from connection import ConnectionState  # noqa: E402
+from fibonacci import calculate_fibonacci  # noqa: E402
+from serialization import encode_fibonacci_result  # noqa: E402
+from server import WebSocketServer  # noqa: E402
+from fake_mongo import FakeMongoClient  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+FIBONACCI_N = [10, 100, 1_000, 10_000, 100_000]
+SERIALIZATION_N = [1_000, 100_000, 1_000_000]
+USER_COUNTS = [100, 10_000, 100_000]
+GROUPS = ["fibonacci", "serialization", "list_users", "activity", "analytics"]
+
+
+class NullWebSocket:
+    def __init__(self):
+        self.bytes_sent = 0
+
+    async def send(self, message):
+        self.bytes_sent += len(message)
+
+
+def use_fake_database(latency):
+    client = FakeMongoClient(latency)
+    database.configure_client(client)
+    database.init_database()
+    return client
+
+
+# Metade das sessões pertence a uma instância viva e metade a uma cujo lease venceu
+LIVE_INSTANCE = "benchmark_live"
+DEAD_INSTANCE = "benchmark_dead"
+
+
+def populate_users(client, count, online_fraction=0.9):
+    collection = client[database.MONGO_DB][database.MONGO_COLLECTION]
+    collection.delete_many({})
+    now = datetime.datetime.now()
+    online = int(count * online_fraction)
+    collection.insert_many([
+        {
+            "id": f"client_{index}",
+            "username": f"usuario_{index}",
+            "connected_at": now - datetime.timedelta(seconds=index),
+            "online": index < online,
+            "disconnected_at": None,
+            "instance_id": DEAD_INSTANCE if index % 2 else LIVE_INSTANCE
+        }
+        for index in range(count)
+    ])
+
+    leases = client[database.MONGO_DB][database.MONGO_LEASE_COLLECTION]
+    leases.delete_many({})
+    leases.insert_many([
+        {"_id": LIVE_INSTANCE, "expires_at": now + datetime.timedelta(minutes=1)},
+        {"_id": DEAD_INSTANCE, "expires_at": now - datetime.timedelta(minutes=1)}
+    ])
+
+
+def bench_fibonacci(args, results):
+    for n in args.fibonacci_n:
+        results.append({"group": "fibonacci", "case": f"n={n}",
+                        "seconds": measure(calculate_fibonacci, n, repeat=args.repeat)})
+
+
+def bench_serialization(args, results):
+    if hasattr(sys, "set_int_max_str_digits"):
+        sys.set_int_max_str_digits(0)
+    for n in args.serialization_n:
+        value = calculate_fibonacci(n)
+        for result_format in ("decimal", "hex", "base64"):
+            results.append({"group": "serialization", "case": f"n={n} {result_format}",
+                            "seconds": measure(encode_fibonacci_result, n, value, result_format, repeat=args.repeat)})
+        results.append({"group": "serialization", "case": f"n={n} json.dumps",
+                        "seconds": measure(lambda: json.dumps({"type": "fibonacci_result", "n": n, "result": str(value)}),
+                                           repeat=args.repeat)})
+
+
+def bench_list_users(args, results, client):
+    server = WebSocketServer()
+    state = ConnectionState(NullWebSocket(), 0, "benchmark")
+    loop = asyncio.new_event_loop()
+    try:
+        for count in args.users:
+            populate_users(client, count)
+            seconds = measure(lambda: loop.run_until_complete(server.handle_list_users(state)),
+                              repeat=args.repeat, min_time=0.0)
+            results.append({"group": "list_users", "case": f"usuarios={count}", "seconds": seconds})
+    finally:
+        loop.close()
+
+
+def bench_activity(args, results, client):
+    for count in args.users:
+        populate_users(client, count)
+        offline = {"client_1": ({"online": False, "disconnected_at": datetime.datetime.now()}, False)}
+        results.append({"group": "activity", "case": f"write_sessions offline usuarios={count}",
+                        "seconds": measure(database.write_sessions, offline, repeat=args.repeat)})
+        results.append({"group": "activity", "case": f"renew_lease usuarios={count}",
+                        "seconds": measure(database.renew_lease, LIVE_INSTANCE, 30, repeat=args.repeat)})
+
+        # Expirar e reconciliar mudam o estado: repopula antes de cada medição
+        for name, operation in (("expire_stale_leases", database.expire_stale_leases),
+                                ("reconcile_sessions", lambda: database.reconcile_sessions(LIVE_INSTANCE, 30))):
+            def run_once():
+                populate_users(client, count)
+                started = time.perf_counter()
+                operation()
+                return time.perf_counter() - started
+            timings = sorted(run_once() for _ in range(args.repeat))
+            results.append({"group": "activity", "case": f"{name} usuarios={count}",
+                            "seconds": timings[len(timings) // 2]})
+
+
+def populate_rollups(client, days, instances=2):
+    collection = client[database.MONGO_DB][database.MONGO_ANALYTICS_COLLECTION]
+    collection.delete_many({})
+    end = datetime.datetime.now().replace(second=0, microsecond=0)
+    collection.insert_many([
+        {
+            "_id": f"instance_{instance}:{minute}",
+            "instance_id": f"instance_{instance}",
+            "minute": end - datetime.timedelta(minutes=minute),
+            "connects": minute % 7,
+            "disconnects": minute % 5,
+            "peak_users": 500 + minute % 50,
+            "min_users": 450 + minute % 50,
+            "messages": {"fibonacci": 300, "time_sync": 60, "list_users": 5}
+        }
+        for instance in range(instances) for minute in range(days * 24 * 60)
+    ])
+    return end + datetime.timedelta(minutes=1)
+
+
+def bench_analytics(args, results, client):
+    # Estatísticas de um dia pelos agregados por minuto, contra varrer as sessões
+    end = populate_rollups(client, days=1)
+    start = end - datetime.timedelta(days=1)
+    results.append({"group": "analytics", "case": "session_stats 24h por hora",
+                    "seconds": measure(lambda: summarize(database.get_rollups(start, end), start, end, 60),
+                                       repeat=args.repeat)})
+    for count in args.users:
+        populate_users(client, count)
+        results.append({"group": "analytics", "case": f"get_all_users usuarios={count}",
+                        "seconds": measure(database.get_all_users, repeat=args.repeat)})
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(entry["group"], entry["case"]): entry["seconds"] for entry in json.load(f)["results"]}
+
+    rows = []
+    for entry in results:
+        before = baseline.get((entry["group"], entry["case"]))
+        if before is None:
+            continue
+        change = (entry["seconds"] - before) / before * 100 if before else 0.0
+        rows.append([entry["group"], entry["case"], f"{before * 1000:.3f}", f"{entry['seconds'] * 1000:.3f}",
+                     f"{change:+.1f}%"])
+    print(f"\nComparação com {baseline_path}:")
+    print_table(["grupo", "caso", "antes (ms)", "agora (ms)", "variação"], rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de fibonacci.py, serialização e database.py")
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--fibonacci-n", type=int, nargs="+", default=FIBONACCI_N)
+    parser.add_argument("--serialization-n", type=int, nargs="+", default=SERIALIZATION_N)
+    parser.add_argument("--users", type=int, nargs="+", default=USER_COUNTS)
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Atraso simulado por operação no banco em memória")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Arquivo JSON (padrão: benchmarks/results/<data>.json)")
+    parser.add_argument("--compare", help="Resultados de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    # Os caminhos do banco registram cada operação; nos benchmarks isso só adicionaria ruído
+    logging.getLogger("websocket_server").setLevel(logging.CRITICAL)
+
+    results = []
+    if "fibonacci" in args.groups:
+        bench_fibonacci(args, results)
+    if "serialization" in args.groups:
+        bench_serialization(args, results)
+
+    if {"list_users", "activity", "analytics"} & set(args.groups):
+        client = use_fake_database(args.latency_ms / 1000)
+        if "list_users" in args.groups:
+            bench_list_users(args, results, client)
+        if "activity" in args.groups:
+            bench_activity(args, results, client)
+        if "analytics" in args.groups:
+            bench_analytics(args, results, client)
+
+    print_table(["grupo", "caso", "tempo (ms)"],
+                [[entry["group"], entry["case"], f"{entry['seconds'] * 1000:.3f}"] for entry in results])
+
+    if args.compare:
+        compare(results, args.compare)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    save_results(output, {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "latency_ms": args.latency_ms,
+        "results": results
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT_DIR, "app", "server")
+CLIENT_DIR = os.path.join(ROOT_DIR, "app", "client")
+
+
+def add_server_path():
+    if SERVER_DIR not in sys.path:
+        sys.path.insert(0, SERVER_DIR)
+
+
+def add_client_path():
+    if CLIENT_DIR not in sys.path:
+        sys.path.insert(0, CLIENT_DIR)
+
+
+def measure(func, *args, repeat=5, min_time=0.2):
+    # Repete a chamada até acumular min_time e devolve a mediana por chamada
+    timings = []
+    for _ in range(repeat):
+        loops = 0
+        start = time.perf_counter()
+        while True:
+            func(*args)
+            loops += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        timings.append(elapsed / loops)
+    return statistics.median(timings)
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    print("  ".join(str(header).ljust(width) for header, width in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(value).ljust(width) for value, width in zip(row, widths)))
+
+
+def save_results(path, results):
+    with open(path, "w") as output:
+        json.dump(results, output, indent=2)
+    print(f"Resultados salvos em {path}")
+
+
+def probe(port, path):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=0.5)
+    try:
+        connection.request("GET", path)
+        return connection.getresponse().status
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+
+def spawn_server(port, timeout=30.0, **env_overrides):
+    env = dict(os.environ, SERVER_HOST="127.0.0.1", SERVER_PORT=str(port), LOG_LEVEL="WARNING")
+    env.update({key: str(value) for key, value in env_overrides.items()})
+    process = subprocess.Popen(
+        [sys.executable, "main.py"], cwd=SERVER_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if probe(port, "/readyz") == 200:
+            return process
+        time.sleep(0.1)
+    process.terminate()
+    process.wait()
+    raise RuntimeError("O servidor não ficou pronto a tempo (o MongoDB está acessível?)")
@@ -0,0 +1,240 @@
+import itertools
+import time
+
+# Substituto em memória do subconjunto do pymongo usado por database.py.
+# Mantém um índice por "id" (como o índice único real) e pode somar um atraso
+# fixo por operação para simular a ida e volta até o servidor.
+
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class BulkWriteResult:
+    def __init__(self, matched_count, modified_count, upserted_count):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_count = upserted_count
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+
+_OPERATORS = {
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$ne": lambda value, operand: value != operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+
+def _matches(document, query):
+    for field, condition in query.items():
+        value = document.get(field)
+        if isinstance(condition, dict) and condition and next(iter(condition)).startswith("$"):
+            for operator, operand in condition.items():
+                if not _OPERATORS[operator](value, operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(document, projection):
+    if not projection:
+        return dict(document)
+    if projection.get("_id") == 0 and len(projection) == 1:
+        return {key: value for key, value in document.items() if key != "_id"}
+    included = {key for key, flag in projection.items() if flag}
+    result = {key: value for key, value in document.items() if key in included}
+    if projection.get("_id", 1):
+        result["_id"] = document["_id"]
+    return result
+
+
+def _path(document, field):
+    # "messages.fibonacci" -> (document["messages"], "fibonacci"), criando os níveis
+    *parents, key = field.split(".")
+    for parent in parents:
+        document = document.setdefault(parent, {})
+    return document, key
+
+
+def _apply_update(document, update, inserting=False):
+    before = dict(document)
+    # Campos aninhados mudam dentro do mesmo dicionário; a comparação rasa não os vê
+    nested_change = False
+    for operator, fields in update.items():
+        if operator == "$set":
+            document.update(fields)
+        elif operator == "$setOnInsert":
+            if inserting:
+                document.update(fields)
+        elif operator == "$unset":
+            for field in fields:
+                document.pop(field, None)
+        elif operator == "$inc":
+            for field, amount in fields.items():
+                target, key = _path(document, field)
+                target[key] = target.get(key, 0) + amount
+                nested_change = nested_change or (target is not document and amount != 0)
+        elif operator in ("$max", "$min"):
+            pick = max if operator == "$max" else min
+            for field, value in fields.items():
+                document[field] = value if document.get(field) is None else pick(document[field], value)
+        else:
+            raise NotImplementedError(f"Operador não suportado: {operator}")
+    return nested_change or document != before
+
+
+class FakeCollection:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._documents = {}
+        self._by_id = {}
+        self._ids = itertools.count(1)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _candidates(self, query):
+        # Consultas por "id" usam o índice; o resto percorre a coleção
+        key = query.get("id")
+        if key is not None and not isinstance(key, dict):
+            object_id = self._by_id.get(key)
+            return [self._documents[object_id]] if object_id is not None else []
+        return list(self._documents.values())
+
+    def _find(self, query):
+        return [document for document in self._candidates(query) if _matches(document, query)]
+
+    def _insert(self, document):
+        document = dict(document)
+        document.setdefault("_id", next(self._ids))
+        self._documents[document["_id"]] = document
+        if "id" in document:
+            self._by_id[document["id"]] = document["_id"]
+        return document["_id"]
+
+    def create_index(self, keys, **kwargs):
+        self._wait()
+        return keys if isinstance(keys, str) else "_".join(f"{key}_{direction}" for key, direction in keys)
+
+    def insert_one(self, document):
+        self._wait()
+        return self._insert(document)
+
+    def insert_many(self, documents):
+        self._wait()
+        return InsertManyResult([self._insert(document) for document in documents])
+
+    def find_one(self, query=None, projection=None):
+        self._wait()
+        for document in self._find(query or {}):
+            return _project(document, projection)
+        return None
+
+    def find(self, query=None, projection=None):
+        self._wait()
+        return iter([_project(document, projection) for document in self._find(query or {})])
+
+    def count_documents(self, query):
+        self._wait()
+        return len(self._find(query))
+
+    def update_one(self, query, update, upsert=False):
+        self._wait()
+        for document in self._find(query):
+            return UpdateResult(1, int(_apply_update(document, update)))
+        if not upsert:
+            return UpdateResult(0, 0)
+        document = {key: value for key, value in query.items() if not isinstance(value, dict)}
+        _apply_update(document, update, inserting=True)
+        return UpdateResult(0, 0, self._insert(document))
+
+    def bulk_write(self, operations, ordered=True):
+        # Uma ida e volta para o lote inteiro; só UpdateOne, como em database.py
+        self._wait()
+        matched = modified = upserted = 0
+        for operation in operations:
+            documents = self._find(operation._filter)
+            if documents:
+                matched += 1
+                modified += int(_apply_update(documents[0], operation._doc))
+            elif operation._upsert:
+                document = {key: value for key, value in operation._filter.items() if not isinstance(value, dict)}
+                _apply_update(document, operation._doc, inserting=True)
+                self._insert(document)
+                upserted += 1
+        return BulkWriteResult(matched, modified, upserted)
+
+    def update_many(self, query, update):
+        self._wait()
+        matched = self._find(query)
+        modified = sum(_apply_update(document, update) for document in matched)
+        return UpdateResult(len(matched), modified)
+
+    def delete_one(self, query):
+        self._wait()
+        for document in self._find(query):
+            del self._documents[document["_id"]]
+            self._by_id.pop(document.get("id"), None)
+            return DeleteResult(1)
+        return DeleteResult(0)
+
+    def delete_many(self, query):
+        self._wait()
+        matched = self._find(query)
+        for document in matched:
+            del self._documents[document["_id"]]
+            self._by_id.pop(document.get("id"), None)
+        return DeleteResult(len(matched))
+
+
+class FakeDatabase:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(self.latency)
+        return self._collections[name]
+
+    def list_collection_names(self):
+        return list(self._collections)
+
+    def create_collection(self, name):
+        return self[name]
+
+    def command(self, name, *args, **kwargs):
+        return {"ok": 1.0}
+
+
+class FakeMongoClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._databases = {}
+        self.admin = FakeDatabase(latency)
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = FakeDatabase(self.latency)
+        return self._databases[name]
+
+    def close(self):
+        pass
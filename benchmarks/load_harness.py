@@ -0,0 +1,123 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+from common import add_client_path, print_table, save_results
+
+add_client_path()
+
+import websockets  # noqa: E402
+from event_loop import install_event_loop  # noqa: E402
+
+# Mistura de mensagens próxima do tráfego real: (peso, tipo enviado, tipo da resposta)
+MESSAGE_MIX = [
+    (50, "fibonacci", "fibonacci_result"),
+    (20, "list_users", "users_list"),
+    (20, "time_sync", "time_sync"),
+    (10, "update_username", "username_updated"),
+]
+
+
+def build_message(message_type, client_index):
+    if message_type == "fibonacci":
+        return {"type": "fibonacci", "n": random.randint(10, 2000)}
+    if message_type == "update_username":
+        return {"type": "update_username", "username": f"carga_{client_index}_{random.randint(0, 999)}"}
+    if message_type == "time_sync":
+        return {"type": "time_sync", "t0": time.monotonic()}
+    return {"type": message_type}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_client(uri, client_index, deadline, think_time, latencies, errors):
+    weights = [weight for weight, _, _ in MESSAGE_MIX]
+    try:
+        async with websockets.connect(uri, ping_interval=None) as websocket:
+            while time.monotonic() < deadline:
+                _, message_type, response_type = random.choices(MESSAGE_MIX, weights)[0]
+                started = time.perf_counter()
+                await websocket.send(json.dumps(build_message(message_type, client_index)))
+
+                while True:
+                    data = json.loads(await websocket.recv())
+                    if data.get("type") == response_type:
+                        break
+                    if data.get("type") == "error":
+                        errors.append(data.get("message"))
+                        break
+
+                latencies.setdefault(message_type, []).append(time.perf_counter() - started)
+                if think_time:
+                    await asyncio.sleep(random.expovariate(1 / think_time))
+    except (OSError, websockets.exceptions.WebSocketException) as e:
+        errors.append(str(e))
+
+
+async def run_load(uri, clients, duration, think_time, ramp_up):
+    latencies = {}
+    errors = []
+    deadline = time.monotonic() + ramp_up + duration
+
+    tasks = []
+    for index in range(clients):
+        tasks.append(asyncio.create_task(run_client(uri, index, deadline, think_time, latencies, errors)))
+        if ramp_up:
+            await asyncio.sleep(ramp_up / clients)
+
+    await asyncio.gather(*tasks)
+    return latencies, errors
+
+
+def summarize(latencies, duration):
+    summary = {}
+    for message_type, values in sorted(latencies.items()):
+        summary[message_type] = {
+            "count": len(values),
+            "throughput": len(values) / duration,
+            "p50_ms": statistics.median(values) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera carga com a mistura real de mensagens e mede latência")
+    parser.add_argument("--uri", default="ws://127.0.0.1:8765")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pausa média entre mensagens (s)")
+    parser.add_argument("--ramp-up", type=float, default=2.0)
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    backend = install_event_loop(os.getenv("EVENT_LOOP", "asyncio"))
+    latencies, errors = asyncio.run(run_load(args.uri, args.clients, args.duration, args.think_time, args.ramp_up))
+    summary = summarize(latencies, args.duration)
+
+    rows = [
+        [message_type, stats["count"], f"{stats['throughput']:.1f}",
+         f"{stats['p50_ms']:.2f}", f"{stats['p95_ms']:.2f}", f"{stats['p99_ms']:.2f}"]
+        for message_type, stats in summary.items()
+    ]
+    total = sum(stats["count"] for stats in summary.values())
+    print(f"Loop do cliente: {backend} | {args.clients} clientes | {total / args.duration:.1f} msg/s | {len(errors)} erros")
+    print_table(["tipo", "mensagens", "msg/s", "p50 (ms)", "p95 (ms)", "p99 (ms)"], rows)
+
+    if args.output:
+        save_results(args.output, {"loop": backend, "clients": args.clients, "duration": args.duration,
+                                   "errors": len(errors), "summary": summary})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import time
+from collections import deque
+
+from common import add_server_path, print_table, save_results
+
+add_server_path()
+
+import websockets  # noqa: E402
+from capture import CONNECT, MESSAGE, BINARY, DISCONNECT, read_capture  # noqa: E402
+
+# Tipo de resposta esperado para cada tipo de pedido. Os pedidos de Fibonacci
+# respondem fora de ordem: o replay marca cada um com um "id" próprio e casa a
+# resposta (ou o erro) por ele; os demais respondem na ordem em que chegaram
+RESPONSE_TYPES = {
+    "fibonacci": "fibonacci_result",
+    "fibonacci_mod_batch": "fibonacci_mod_batch_result",
+    "update_username": "username_updated",
+    "list_users": "users_list",
+    "clock_sync": "clock_sync",
+    "time_sync": "time_sync",
+    "subscribe_presence": "presence_snapshot",
+    "subscribe": "subscribed",
+    "unsubscribe": "unsubscribed",
+    "publish": "published",
+    "topic_stats": "topic_stats",
+    "session_stats": "session_stats",
+}
+TAGGED_TYPES = {"fibonacci", "fibonacci_mod_batch"}
+
+
+def read_jsonl(path):
+    # Formato texto: uma linha por evento com "t" (s), "conn" e "message";
+    # "event" opcional ("connect"/"disconnect"), senão a conexão abre na primeira mensagem
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            event = record.get("event", "message")
+            if event == "connect":
+                yield record["t"], record["conn"], CONNECT, b""
+            elif event == "disconnect":
+                yield record["t"], record["conn"], DISCONNECT, b""
+            else:
+                message = record["message"]
+                yield record["t"], record["conn"], MESSAGE, message if isinstance(message, str) else json.dumps(message)
+
+
+def load_sessions(path):
+    reader = read_jsonl(path) if path.endswith(".jsonl") else read_capture(path)
+    sessions = {}
+    for timestamp, connection, kind, payload in reader:
+        session = sessions.setdefault(connection, {"start": timestamp, "events": []})
+        if kind in (MESSAGE, BINARY):
+            session["events"].append((timestamp, payload))
+        elif kind == DISCONNECT:
+            session["end"] = timestamp
+    return sessions
+
+
+class Replayer:
+    def __init__(self, uri, speed):
+        self.uri = uri
+        self.speed = speed
+        self.latencies = {}
+        self.errors = 0
+        self.unmatched = 0
+        self.started = None
+
+    async def _wait_until(self, timestamp):
+        # speed 0 = o mais rápido possível, preservando apenas a ordem por conexão
+        if not self.speed:
+            return
+        delay = self.started + timestamp / self.speed - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _match(self, request_type, sent_at, received_at):
+        if request_type is not None:
+            self.latencies.setdefault(request_type, []).append(received_at - sent_at)
+
+    async def _receive(self, websocket, tagged, ordered):
+        async for raw in websocket:
+            received_at = time.perf_counter()
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                continue
+            if not isinstance(data, dict):
+                continue
+            response_type = data.get("type")
+            is_error = response_type == "error"
+            if is_error:
+                self.errors += 1
+
+            request_id = data.get("id")
+            if request_id in tagged:
+                request_type, expected, sent_at = tagged.pop(request_id)
+                if not is_error:
+                    self._match(request_type, sent_at, received_at)
+            elif is_error:
+                # Erro sem id responde ao pedido em ordem mais antigo ainda pendente
+                if ordered:
+                    ordered.popleft()
+            else:
+                for index, (request_type, expected, sent_at) in enumerate(ordered):
+                    if expected == response_type:
+                        del ordered[index]
+                        self._match(request_type, sent_at, received_at)
+                        break
+
+    def _prepare(self, payload, tagged, ordered, ids):
+        # Devolve o quadro a enviar, registrando o que se espera como resposta
+        if not isinstance(payload, str):
+            return payload
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            # JSON inválido sempre volta como erro, na ordem
+            ordered.append((None, "error", time.perf_counter()))
+            return payload
+        request_type = data.get("type") if isinstance(data, dict) else None
+        response_type = RESPONSE_TYPES.get(request_type)
+        if not response_type:
+            return payload
+        if request_type in TAGGED_TYPES:
+            request_id = f"replay-{next(ids)}"
+            payload = json.dumps({**data, "id": request_id})
+            tagged[request_id] = (request_type, response_type, time.perf_counter())
+        else:
+            ordered.append((request_type, response_type, time.perf_counter()))
+        return payload
+
+    async def replay_session(self, session):
+        await self._wait_until(session["start"])
+        tagged = {}
+        ordered = deque()
+        ids = itertools.count()
+        try:
+            async with websockets.connect(self.uri, max_size=None, ping_interval=None) as websocket:
+                receiver = asyncio.create_task(self._receive(websocket, tagged, ordered))
+                for timestamp, payload in session["events"]:
+                    await self._wait_until(timestamp)
+                    await websocket.send(self._prepare(payload, tagged, ordered, ids))
+
+                await self._wait_until(session.get("end", session["events"][-1][0] if session["events"] else 0))
+                # Dá um tempo para as últimas respostas chegarem antes de fechar
+                deadline = time.monotonic() + 10
+                while (tagged or ordered) and time.monotonic() < deadline:
+                    await asyncio.sleep(0.01)
+                self.unmatched += len(tagged) + len(ordered)
+                receiver.cancel()
+        except (OSError, websockets.exceptions.WebSocketException):
+            self.errors += 1
+
+    async def run(self, sessions):
+        self.started = time.monotonic()
+        await asyncio.gather(*(self.replay_session(session) for session in sessions.values()))
+        return time.monotonic() - self.started
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(latencies):
+    return {
+        request_type: {
+            "count": len(values),
+            "p50_ms": statistics.median(values) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+        for request_type, values in sorted(latencies.items())
+    }
+
+
+def print_comparison(summary, baseline):
+    rows = []
+    for request_type, stats in summary.items():
+        before = baseline.get(request_type)
+        if not before:
+            continue
+        row = [request_type]
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            delta = (stats[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            row.append(f"{before[key]:.2f} -> {stats[key]:.2f} ({delta:+.1f}%)")
+        rows.append(row)
+    print("\nComparação com a execução de referência:")
+    print_table(["tipo", "p50 (ms)", "p95 (ms)", "p99 (ms)"], rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduz uma captura de tráfego contra um servidor local")
+    parser.add_argument("capture", help="Arquivo de captura (CAPTURE_PATH) ou .jsonl com t/conn/message")
+    parser.add_argument("--uri", default="ws://127.0.0.1:8765")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="1 = tempo real, N = N vezes mais rápido, 0 = o mais rápido possível")
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    parser.add_argument("--compare", help="Resultados JSON de outra execução para comparar latências")
+    args = parser.parse_args()
+
+    sessions = load_sessions(args.capture)
+    messages = sum(len(session["events"]) for session in sessions.values())
+    print(f"{len(sessions)} conexões e {messages} mensagens em {os.path.basename(args.capture)}")
+
+    replayer = Replayer(args.uri, args.speed)
+    elapsed = asyncio.run(replayer.run(sessions))
+    summary = summarize(replayer.latencies)
+
+    print(f"Replay em {elapsed:.2f}s (velocidade {args.speed or 'máxima'}) | "
+          f"{replayer.errors} erros | {replayer.unmatched} sem resposta")
+    print_table(
+        ["tipo", "respostas", "p50 (ms)", "p95 (ms)", "p99 (ms)"],
+        [[request_type, stats["count"], f"{stats['p50_ms']:.2f}", f"{stats['p95_ms']:.2f}", f"{stats['p99_ms']:.2f}"]
+         for request_type, stats in summary.items()]
+    )
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(summary, json.load(f)["summary"])
+
+    if args.output:
+        save_results(args.output, {"capture": args.capture, "speed": args.speed, "elapsed": elapsed,
+                                   "errors": replayer.errors, "unmatched": replayer.unmatched, "summary": summary})
+
+
+if __name__ == "__main__":
+    main()
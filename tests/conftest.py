@@ -0,0 +1,13 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Os módulos do servidor e do cliente se importam pelo nome, como em main.py
+for directory in ("app/client", "app/server"):
+    path = os.path.join(ROOT_DIR, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# MongoDB em memória dos benchmarks (fake_mongo.py), por último para não sombrear nada
+sys.path.append(os.path.join(ROOT_DIR, "benchmarks"))
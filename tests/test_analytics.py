@@ -0,0 +1,161 @@
+import asyncio
+import datetime
+import types
+
+import pytest
+
+import analytics
+import database
+from analytics import OTHER_MESSAGES, MinuteRollup, SessionAnalytics, summarize
+from fake_mongo import FakeMongoClient
+
+START = datetime.datetime(2026, 1, 1, 12, 0)
+
+
+class Clock(datetime.datetime):
+    current = START
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    Clock.current = START
+    monkeypatch.setattr(analytics, "datetime", types.SimpleNamespace(datetime=Clock, timedelta=datetime.timedelta))
+    return Clock
+
+
+class Store:
+    # Guarda os minutos como write_rollups: um documento por minuto, sobrescrito a cada gravação
+    def __init__(self, failures=0, apply_before_failing=False):
+        self.failures = failures
+        self.apply_before_failing = apply_before_failing
+        self.documents = {}
+        self.writes = 0
+
+    def __call__(self, batch):
+        self.writes += 1
+        if self.failures and not self.apply_before_failing:
+            self.failures -= 1
+            raise ConnectionError("banco fora do ar")
+        for minute, rollup in batch.items():
+            self.documents[minute] = {
+                "minute": minute, "connects": rollup.connects, "disconnects": rollup.disconnects,
+                "peak_users": rollup.peak_users, "min_users": rollup.min_users, "messages": dict(rollup.messages)
+            }
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("resposta perdida depois de gravar")
+
+
+def rollup(minute, connects=0, disconnects=0, peak=0, low=0, messages=None):
+    return {"minute": minute, "connects": connects, "disconnects": disconnects,
+            "peak_users": peak, "min_users": low, "messages": messages or {}}
+
+
+def test_counts_per_minute(clock):
+    async def scenario():
+        store = Store()
+        stats = SessionAnalytics(store)
+        stats.connected(1)
+        stats.connected(2)
+        stats.message("fibonacci")
+        stats.message("desconhecido")
+        stats.message(None)
+        clock.current = START + datetime.timedelta(minutes=1)
+        stats.disconnected(1)
+        await stats.flush()
+        return store.documents
+
+    documents = asyncio.run(scenario())
+    first, second = documents[START], documents[START + datetime.timedelta(minutes=1)]
+    assert first == rollup(START, connects=2, peak=2, low=0, messages={"fibonacci": 1, OTHER_MESSAGES: 2})
+    # O minuto novo começa com os usuários do fim do anterior
+    assert second["peak_users"] == 2 and second["min_users"] == 1 and second["disconnects"] == 1
+
+
+def test_retry_after_partial_write_does_not_double_count(clock):
+    async def scenario():
+        store = Store(failures=1, apply_before_failing=True)
+        stats = SessionAnalytics(store)
+        stats.connected(1)
+        stats.message("fibonacci")
+        assert not await stats.flush()
+        stats.connected(2)
+        assert await stats.flush()
+        return store.documents[START]
+
+    document = asyncio.run(scenario())
+    assert document["connects"] == 2
+    assert document["messages"] == {"fibonacci": 1}
+
+
+def test_failed_minutes_are_written_later_and_past_minutes_released(clock):
+    async def scenario():
+        store = Store(failures=1)
+        stats = SessionAnalytics(store)
+        stats.connected(1)
+        assert not await stats.flush()
+
+        clock.current = START + datetime.timedelta(minutes=2)
+        assert await stats.flush()
+        # Só o minuto atual continua em memória
+        return store, sorted(stats._buckets)
+
+    store, buckets = asyncio.run(scenario())
+    assert store.documents[START]["connects"] == 1
+    assert START + datetime.timedelta(minutes=2) in store.documents
+    assert buckets == [START + datetime.timedelta(minutes=2)]
+
+
+def test_rewriting_a_minute_gives_the_same_document(monkeypatch):
+    monkeypatch.setattr(database, "_client", FakeMongoClient())
+    minute = MinuteRollup(1)
+    minute.connects = 3
+    minute.peak_users = 4
+    minute.messages = {"fibonacci": 2}
+
+    # Um lote repetido (falha depois de o banco aplicar) não soma de novo
+    database.write_rollups("instancia", {START: minute})
+    database.write_rollups("instancia", {START: minute})
+    minute.connects = 5
+    database.write_rollups("instancia", {START: minute})
+
+    (document,) = database.get_rollups(START, START + datetime.timedelta(minutes=1))
+    assert document == {"instance_id": "instancia", "minute": START, "connects": 5, "disconnects": 0,
+                        "peak_users": 4, "min_users": 1, "messages": {"fibonacci": 2}}
+
+
+def test_summarize_sums_instances_and_groups_buckets():
+    minute = datetime.timedelta(minutes=1)
+    documents = [
+        rollup(START, connects=3, peak=3, low=1, messages={"fibonacci": 2}),
+        rollup(START, connects=1, peak=4, low=2, messages={"fibonacci": 1, "publish": 1}),
+        rollup(START + minute, disconnects=2, peak=5, low=0),
+        rollup(START + 5 * minute, connects=1, peak=1, low=1),
+        # Fora do período
+        rollup(START - minute, connects=100, peak=100),
+        rollup(START + 6 * minute, connects=100, peak=100),
+    ]
+
+    summary = summarize(documents, START, START + 6 * minute, 2)
+
+    assert summary["from"] == "2026-01-01 12:00" and summary["to"] == "2026-01-01 12:06"
+    assert [point["time"] for point in summary["series"]] == ["2026-01-01 12:00", "2026-01-01 12:02",
+                                                               "2026-01-01 12:04"]
+    first, empty, last = summary["series"]
+    # Usuários simultâneos de um minuto somam as instâncias; o intervalo fica com o pico dos minutos
+    assert first == {"time": "2026-01-01 12:00", "connects": 4, "disconnects": 2, "peak_users": 7,
+                     "min_users": 0, "messages": 4}
+    assert empty["peak_users"] is None and empty["connects"] == 0
+    assert last["connects"] == 1 and last["peak_users"] == 1
+    assert summary["totals"] == {"connects": 5, "disconnects": 2, "peak_users": 7,
+                                 "messages": {"fibonacci": 3, "publish": 1}}
+
+
+def test_summarize_partial_last_bucket():
+    summary = summarize([], START, START + datetime.timedelta(minutes=5), 2)
+    assert len(summary["series"]) == 3
+    assert summary["totals"]["connects"] == 0
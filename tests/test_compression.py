@@ -0,0 +1,79 @@
+import pytest
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
+from websockets.frames import Frame, Opcode
+
+from compression import SelectiveDeflateFactory, SelectivePerMessageDeflate, compression_options
+
+
+def negotiate(min_size=256, window_bits=12):
+    # Mesma negociação de um handshake real: oferta do cliente, resposta do servidor
+    client_factory = ClientPerMessageDeflateFactory(
+        server_max_window_bits=window_bits, client_max_window_bits=window_bits
+    )
+    server_factory = SelectiveDeflateFactory(
+        min_size=min_size, server_max_window_bits=window_bits, client_max_window_bits=window_bits,
+        compress_settings={"memLevel": 5, "level": 1}
+    )
+    response, server_extension = server_factory.process_request_params(client_factory.get_request_params(), [])
+    client_extension = client_factory.process_response_params(response, [])
+    return server_extension, client_extension
+
+
+def test_negotiated_extension_keeps_threshold_and_window():
+    server_extension, client_extension = negotiate(min_size=100, window_bits=10)
+    assert isinstance(server_extension, SelectivePerMessageDeflate)
+    assert server_extension.min_size == 100
+    assert server_extension.local_max_window_bits == 10
+    assert client_extension.remote_max_window_bits == 10
+
+
+def test_small_messages_skip_compression():
+    server_extension, _ = negotiate(min_size=256)
+    small = Frame(Opcode.TEXT, b'{"type": "time_update"}')
+    assert server_extension.encode(small) is small
+
+    large = server_extension.encode(Frame(Opcode.TEXT, b"1" * 4096))
+    assert large.rsv1
+    assert len(large.data) < 4096
+
+
+def test_threshold_is_decided_per_message_across_fragments():
+    server_extension, _ = negotiate(min_size=256)
+    first = server_extension.encode(Frame(Opcode.TEXT, b"x" * 10, fin=False))
+    continuation = server_extension.encode(Frame(Opcode.CONT, b"x" * 4096))
+    assert not first.rsv1 and continuation.data == b"x" * 4096
+
+    first = server_extension.encode(Frame(Opcode.TEXT, b"y" * 4096, fin=False))
+    continuation = server_extension.encode(Frame(Opcode.CONT, b"y" * 10))
+    assert first.rsv1
+    assert continuation.data != b"y" * 10
+
+
+def test_control_frames_pass_through():
+    server_extension, _ = negotiate(min_size=0)
+    ping = Frame(Opcode.PING, b"ping")
+    assert server_extension.encode(ping) is ping
+
+
+def test_client_decodes_mixed_stream_with_shared_context():
+    # Mensagens sem compressão no meio não podem dessincronizar a janela do zlib
+    server_extension, client_extension = negotiate(min_size=256)
+    messages = [b"5" * 2000, b"tick", b"5" * 2000 + b"6" * 500, b"tock", b"7" * 300]
+    for payload in messages:
+        frame = server_extension.encode(Frame(Opcode.TEXT, payload))
+        assert frame.rsv1 == (len(payload) >= 256)
+        assert client_extension.decode(frame).data == payload
+
+
+def test_compression_options_modes():
+    assert compression_options("none", 256, 12, 5, 1) == {"compression": None}
+
+    options = compression_options("deflate", 512, 11, 4, 6)
+    factory = options["extensions"][0]
+    assert options["compression"] is None
+    assert factory.min_size == 512
+    assert factory.server_max_window_bits == 11
+    assert factory.compress_settings == {"memLevel": 4, "level": 6}
+
+    with pytest.raises(ValueError):
+        compression_options("brotli", 256, 12, 5, 1)
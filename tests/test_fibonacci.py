@@ -0,0 +1,186 @@
+import random
+import sys
+
+import pytest
+
+import fibonacci
+from fibonacci import fibonacci_mod, fibonacci_mod_batch
+
+MODULI = [1, 2, 3, 2 ** 31 - 1, 2 ** 31, 2 ** 31 + 1, 2 ** 32 - 1, 2 ** 32, 2 ** 32 + 1,
+          10 ** 18 + 9, 2 ** 62 - 57, 2 ** 62 - 1, 2 ** 62]
+MAX_N = 2 ** 63 - 1
+
+
+def fib_linear(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+
+def batch_values(seed):
+    generator = random.Random(seed)
+    values = [0, 1, 2, 3, 92, 93, 94, 2 ** 31, 2 ** 32 - 1, 2 ** 62, MAX_N - 1, MAX_N]
+    values += [generator.randrange(MAX_N + 1) for _ in range(200)]
+    values += [generator.randrange(1 << generator.randrange(1, 64)) for _ in range(200)]
+    return values
+
+
+@pytest.fixture
+def numpy_loaded():
+    np = pytest.importorskip("numpy")
+    previous = fibonacci._numpy
+    fibonacci._numpy = np
+    yield np
+    fibonacci._numpy = previous
+
+
+@pytest.fixture
+def numpy_missing(monkeypatch):
+    # import numpy falha como num ambiente sem o pacote
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    monkeypatch.setattr(fibonacci, "_numpy", None)
+
+
+def test_fibonacci_mod_matches_linear_loop():
+    for n in range(300):
+        expected = fib_linear(n)
+        for modulus in (1, 2, 7, 2 ** 31 - 1, 2 ** 62):
+            assert fibonacci_mod(n, modulus) == expected % modulus
+
+
+@pytest.mark.parametrize("modulus", MODULI)
+def test_batch_matches_scalar(numpy_loaded, modulus):
+    values = batch_values(modulus)
+    assert fibonacci_mod_batch(values, modulus) == [fibonacci_mod(n, modulus) for n in values]
+
+
+@pytest.mark.parametrize("modulus", [2 ** 32 + 1, 2 ** 40 + 15, 2 ** 62 - 57, 2 ** 62])
+def test_mulmod_wide_extremes(numpy_loaded, modulus):
+    np = numpy_loaded
+    edges = [0, 1, 2, 2 ** 31 - 1, 2 ** 31, modulus // 2, modulus - 2, modulus - 1]
+    pairs = [(a, b) for a in edges for b in edges]
+    generator = random.Random(modulus)
+    pairs += [(generator.randrange(modulus), generator.randrange(modulus)) for _ in range(2000)]
+    a = np.array([x for x, _ in pairs], dtype=np.uint64)
+    b = np.array([y for _, y in pairs], dtype=np.uint64)
+    result = fibonacci._mulmod_wide(np, a, b, np.uint64(modulus), np.int64(modulus), float(1 << 31) / modulus)
+    assert result.tolist() == [x * y % modulus for x, y in pairs]
+
+
+@pytest.mark.parametrize("modulus", [2 ** 32 + 1, 2 ** 40 + 15, 10 ** 18 + 9, 2 ** 62 - 57, 2 ** 62 - 1])
+def test_shift31_mod_near_quotient_boundaries(numpy_loaded, modulus):
+    # x·2^31 com resto perto de 0 ou de m: é onde o quociente em float64 erra por 1
+    np = numpy_loaded
+    inverse = pow(2 ** 31, -1, modulus)
+    generator = random.Random(modulus)
+    remainders = list(range(64)) + [modulus - 1 - r for r in range(64)]
+    remainders += [generator.randrange(modulus >> 18) for _ in range(2000)]
+    remainders += [modulus - 1 - generator.randrange(modulus >> 18) for _ in range(2000)]
+    values = [r * inverse % modulus for r in remainders]
+    x = np.array(values, dtype=np.uint64)
+    result = fibonacci._shift31_mod(np, x, np.uint64(modulus), np.int64(modulus), float(1 << 31) / modulus)
+    assert result.tolist() == remainders
+
+
+def test_batch_spans_several_chunks(numpy_loaded, monkeypatch):
+    monkeypatch.setattr(fibonacci, "_BATCH_CHUNK", 64)
+    values = batch_values(7)
+    assert fibonacci_mod_batch(values, 2 ** 62 - 1) == [fibonacci_mod(n, 2 ** 62 - 1) for n in values]
+
+
+def test_batch_accepts_numpy_integers(numpy_loaded):
+    np = numpy_loaded
+    values = np.array([10, 20, 30], dtype=np.int64)
+    assert fibonacci_mod_batch(values, 1000) == [55, 765, 40]
+
+
+def test_batch_without_numpy(numpy_missing, caplog):
+    values = batch_values(3)
+    assert fibonacci_mod_batch(values, 2 ** 62) == [fibonacci_mod(n, 2 ** 62) for n in values]
+    assert fibonacci._numpy is False
+    assert "numpy não está instalado" in caplog.text
+
+
+@pytest.mark.parametrize("values, modulus", [
+    ([1], 0), ([1], 2 ** 62 + 1), ([-1], 10), ([MAX_N + 1], 10), ([1], 1.5),
+])
+def test_batch_rejects_out_of_range(values, modulus):
+    with pytest.raises(ValueError):
+        fibonacci_mod_batch(values, modulus)
+
+
+def test_batch_rejects_non_integers():
+    with pytest.raises(TypeError):
+        fibonacci_mod_batch([1.0], 10)
+    assert fibonacci_mod_batch([], 10) == []
+
+
+@pytest.fixture
+def parallel(monkeypatch):
+    # Divisão a partir de 64 bits para exercitar o Karatsuba com números pequenos
+    monkeypatch.setattr(fibonacci, "_PARALLEL_MIN_BITS", 64)
+
+    def configure(workers, min_n=0):
+        fibonacci.configure_parallel(workers, min_n)
+
+    yield configure
+    fibonacci.configure_parallel(0)
+
+
+def split_boundaries():
+    # n em que F(n) cruza 64, 128, 256... bits: onde o pool e cada nível do Karatsuba entram
+    values, bits = set(), 64
+    a, b = 0, 1
+    for n in range(20000):
+        if a.bit_length() >= bits:
+            values.update((n - 1, n, n + 1))
+            bits *= 2
+        a, b = b, a + b
+    return sorted(values)
+
+
+FIB_CHECK = list(range(0, 200, 7)) + split_boundaries() + [5000, 10007]
+
+
+@pytest.mark.parametrize("depth", [0, 1, 2, 3])
+@pytest.mark.parametrize("bits", [1, 63, 64, 127, 128, 129, 255, 256, 1000, 4097])
+def test_karatsuba_plan_recombines_exact_products(monkeypatch, depth, bits):
+    monkeypatch.setattr(fibonacci, "_PARALLEL_MIN_BITS", 64)
+    generator = random.Random(bits * 10 + depth)
+    x = generator.getrandbits(bits) | (1 << (bits - 1))
+    y = generator.getrandbits(bits // 2 + 1)
+    for operand in (y, None):
+        leaves = []
+        plan = fibonacci._karatsuba_plan(x, operand, depth, leaves)
+        values = [fibonacci._multiply(a, b) for a, b in leaves]
+        assert fibonacci._karatsuba_combine(plan, values) == x * (x if operand is None else operand)
+        if bits < 128 or depth == 0:
+            assert len(leaves) == 1
+
+
+def test_fast_doubling_without_pool_matches_linear(parallel):
+    parallel(1)
+    assert fibonacci._get_parallel_pool() is None
+    for n in FIB_CHECK:
+        assert fibonacci.calculate_fibonacci(n) == fib_linear(n)
+
+
+def test_fast_doubling_with_pool_matches_linear(parallel, monkeypatch):
+    # 4 processos abrem um nível de Karatsuba por produto
+    parallel(4)
+    assert fibonacci._parallel_depth() == 1
+    pool = fibonacci._get_parallel_pool()
+    submitted = []
+    submit = pool.submit
+    monkeypatch.setattr(pool, "submit", lambda *args: submitted.append(args) or submit(*args))
+    for n in FIB_CHECK:
+        assert fibonacci.calculate_fibonacci(n) == fib_linear(n)
+    assert submitted
+
+
+def test_parallel_min_n_boundary(parallel):
+    parallel(2, 300)
+    for n in (299, 300, 301):
+        assert fibonacci.calculate_fibonacci(n) == fib_linear(n)
+    assert fibonacci.estimate_cost(299) != fibonacci.estimate_cost(300)
@@ -0,0 +1,40 @@
+import asyncio
+
+from connection import ConnectionState
+from server import WebSocketServer
+
+
+class FakeWebSocket:
+    def __init__(self, stalled=False):
+        self.stalled = stalled
+        self.sent = []
+
+    async def send(self, message):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(message)
+
+
+def test_stalled_subscriber_does_not_hold_presence_deltas():
+    async def scenario():
+        server = WebSocketServer()
+        server.topics.send_timeout = 0.05
+        fast = ConnectionState(FakeWebSocket(), 1, "ana")
+        stalled = ConnectionState(FakeWebSocket(stalled=True), 2, "bia")
+        server.presence_subscribers.update((fast, stalled))
+
+        dispatcher = asyncio.create_task(server.dispatch_presence())
+        try:
+            server._publish_presence("user_joined", fast)
+            server._publish_presence("user_renamed", fast)
+            for _ in range(100):
+                if len(fast.websocket.sent) == 2:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            dispatcher.cancel()
+
+        assert len(fast.websocket.sent) == 2
+        assert server.presence_subscribers == {fast}
+
+    asyncio.run(scenario())
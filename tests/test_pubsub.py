@@ -0,0 +1,55 @@
+import asyncio
+
+from connection import ConnectionState
+from pubsub import TopicRegistry
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def test_publish_without_subscribers_keeps_no_state():
+    registry = TopicRegistry()
+    for index in range(100):
+        assert asyncio.run(registry.publish(f"aleatorio-{index}", {"n": index})) == (0, 0)
+    assert registry.stats == {}
+    assert registry.subscribers == {}
+    assert registry.topic_stats() == []
+
+
+def test_stats_follow_subscriptions():
+    registry = TopicRegistry()
+    state = ConnectionState(FakeWebSocket(), 1, "ana")
+    registry.subscribe("noticias", state)
+
+    assert asyncio.run(registry.publish("noticias", "oi")) == (1, 0)
+    assert len(state.websocket.sent) == 1
+    [stats] = registry.topic_stats()
+    assert stats["topic"] == "noticias"
+    assert stats["subscribers"] == 1
+    assert stats["messages"] == 1
+
+    registry.unsubscribe("noticias", state)
+    assert registry.stats == {}
+    assert registry.topic_stats() == []
+
+
+def test_stats_survive_while_any_subscriber_remains():
+    registry = TopicRegistry()
+    first = ConnectionState(FakeWebSocket(), 1, "ana")
+    second = ConnectionState(FakeWebSocket(), 2, "bia")
+    registry.subscribe("noticias", first)
+    registry.subscribe("noticias", second)
+    asyncio.run(registry.publish("noticias", "oi"))
+
+    registry.unsubscribe_all(first)
+    [stats] = registry.topic_stats()
+    assert stats["subscribers"] == 1
+    assert stats["deliveries"] == 2
+
+    registry.unsubscribe_all(second)
+    assert registry.topic_stats() == []
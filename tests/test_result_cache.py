@@ -0,0 +1,68 @@
+import sys
+
+from result_cache import ENTRY_OVERHEAD, ResultCache
+
+
+def message(n, digits=10):
+    return {"type": "fibonacci_result", "n": n, "format": "decimal", "result": "1" * digits}
+
+
+def entry_size(data):
+    return sys.getsizeof(data["result"]) + ENTRY_OVERHEAD
+
+
+def test_hits_and_misses():
+    cache = ResultCache(1024 * 1024)
+    assert cache.get((1, "decimal")) is None
+    cache.put((1, "decimal"), message(1))
+    assert cache.get((1, "decimal")) == message(1)
+    assert cache.get((1, "hex")) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_evicts_least_recently_used_by_size():
+    size = entry_size(message(0))
+    cache = ResultCache(size * 3)
+    for n in range(3):
+        cache.put((n, "decimal"), message(n))
+
+    cache.get((0, "decimal"))
+    cache.put((3, "decimal"), message(3))
+
+    assert cache.get((1, "decimal")) is None
+    assert [n for n in range(4) if cache.get((n, "decimal")) is not None] == [0, 2, 3]
+    assert cache.size == size * 3
+
+
+def test_one_large_result_pushes_out_several_small_ones():
+    small = entry_size(message(0))
+    cache = ResultCache(small * 4)
+    for n in range(4):
+        cache.put((n, "decimal"), message(n))
+
+    large = message(100, digits=small * 2)
+    cache.put((100, "decimal"), large)
+
+    assert cache.get((100, "decimal")) == large
+    assert len(cache) == 2
+    assert cache.size == entry_size(large) + small
+    assert cache.size <= cache.max_bytes
+
+
+def test_replacing_a_key_updates_the_size():
+    cache = ResultCache(1024 * 1024)
+    cache.put((1, "decimal"), message(1, digits=1000))
+    cache.put((1, "decimal"), message(1, digits=10))
+    assert len(cache) == 1
+    assert cache.size == entry_size(message(1, digits=10))
+
+
+def test_results_larger_than_the_cache_are_not_stored():
+    cache = ResultCache(1024)
+    cache.put((1, "decimal"), message(1))
+    cache.put((2, "decimal"), message(2, digits=4096))
+    assert cache.get((2, "decimal")) is None
+    assert cache.get((1, "decimal")) is not None
+
+    cache.clear()
+    assert len(cache) == 0 and cache.size == 0
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+
+import pytest
+
+import fibonacci
+import scheduler
+from result_store import _HEADER, ResultStore
+
+
+def fib_pair(k):
+    a, b = 0, 1
+    for _ in range(k):
+        a, b = b, a + b
+    return a, b
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "fib" / "results.store")
+
+
+@pytest.fixture
+def configured_store(store_path):
+    store = ResultStore(store_path)
+    fibonacci.configure_result_store(store, 100)
+    yield store
+    fibonacci.configure_result_store(None)
+    store.close()
+
+
+def test_nearest_pair_returns_closest_checkpoint_below(store_path):
+    store = ResultStore(store_path)
+    for k in (100, 300, 200):
+        store.put_pair(k, *fib_pair(k))
+
+    assert store.nearest_key(99) is None
+    assert store.nearest_pair(99) is None
+    assert store.nearest_key(250) == 200
+    assert store.nearest_pair(250) == (200, *fib_pair(200))
+    assert store.nearest_pair(300) == (300, *fib_pair(300))
+    assert store.nearest_pair(10 ** 6) == (300, *fib_pair(300))
+    store.close()
+
+
+def test_checkpoints_survive_reopen(store_path):
+    store = ResultStore(store_path)
+    store.put_pair(500, *fib_pair(500))
+    store.put_pair(0, 0, 1)
+    store.close()
+
+    reopened = ResultStore(store_path)
+    assert reopened.nearest_pair(600) == (500, *fib_pair(500))
+    assert reopened.nearest_pair(0) == (0, 0, 1)
+    reopened.close()
+
+
+def test_torn_write_at_the_end_is_discarded(store_path):
+    store = ResultStore(store_path)
+    store.put_pair(100, *fib_pair(100))
+    store.put_pair(200, *fib_pair(200))
+    store.close()
+
+    # Registro interrompido no meio: cabeçalho válido e dados faltando
+    with open(store_path, "rb") as source:
+        content = source.read()
+    with open(store_path, "ab") as target:
+        target.write(content[:40])
+    size = len(content)
+
+    reopened = ResultStore(store_path)
+    assert reopened.nearest_pair(10 ** 6) == (200, *fib_pair(200))
+    reopened.close()
+    with open(store_path, "rb") as source:
+        assert len(source.read()) == size
+
+
+def test_corrupted_record_stops_the_index(store_path):
+    store = ResultStore(store_path)
+    store.put_pair(100, *fib_pair(100))
+    store.put_pair(200, *fib_pair(200))
+    store.close()
+
+    with open(store_path, "r+b") as target:
+        target.seek(-1, 2)
+        last = target.read(1)
+        target.seek(-1, 2)
+        target.write(bytes([last[0] ^ 0xFF]))
+
+    reopened = ResultStore(store_path)
+    assert reopened.nearest_key(10 ** 6) == 100
+    reopened.close()
+
+
+def test_eviction_keeps_recently_used_checkpoints(store_path):
+    pairs = {k: fib_pair(k) for k in (1000, 2000, 3000, 4000)}
+    size = {k: _HEADER.size + sum((value.bit_length() + 7) // 8 for value in pair) for k, pair in pairs.items()}
+    # Cabem os três primeiros, mas o quarto só entra se um deles sair
+    max_bytes = size[1000] + size[3000] + size[4000]
+    store = ResultStore(store_path, max_bytes=max_bytes)
+    for k in (1000, 2000, 3000):
+        store.put_pair(k, *pairs[k])
+
+    # 1000 volta a ser o mais recente; 2000 é o menos usado e sai primeiro
+    store.nearest_pair(1500)
+    assert store.put_pair(4000, *pairs[4000])
+
+    assert store.nearest_key(2500) == 1000
+    assert store.nearest_pair(3500) == (3000, *pairs[3000])
+    assert store.nearest_pair(10 ** 6) == (4000, *pairs[4000])
+    store.close()
+
+    reopened = ResultStore(store_path, max_bytes=max_bytes)
+    assert reopened.nearest_key(2500) == 1000
+    reopened.close()
+
+
+def test_oversized_pair_is_rejected(store_path):
+    store = ResultStore(store_path, max_bytes=64)
+    assert not store.put_pair(1000, *fib_pair(1000))
+    assert store.nearest_key(1000) is None
+    store.close()
+
+
+def test_calculate_fibonacci_resumes_from_checkpoint(configured_store, caplog):
+    assert fibonacci.calculate_fibonacci(2000) == fib_pair(2000)[0]
+    assert configured_store.nearest_key(10 ** 6) == 1999
+
+    with caplog.at_level(logging.INFO, logger="websocket_server.fibonacci"):
+        assert fibonacci.calculate_fibonacci(2500) == fib_pair(2500)[0]
+    assert "a partir do checkpoint F(1999)" in caplog.text
+
+    # Exatamente o n do checkpoint, e um n abaixo de todos os checkpoints
+    assert fibonacci.calculate_fibonacci(1999) == fib_pair(1999)[0]
+    assert fibonacci.calculate_fibonacci(1500) == fib_pair(1500)[0]
+    assert fibonacci.calculate_fibonacci(50) == fib_pair(50)[0]
+
+
+def test_estimate_cost_ignores_checkpoints_when_asked(configured_store):
+    fibonacci.calculate_fibonacci(20000)
+    assert configured_store.nearest_key(20500) == 19999
+
+    # Workers em processo não abrem o armazenamento: o custo é o do cálculo do zero
+    with_checkpoint = fibonacci.estimate_cost(20500)
+    from_scratch = fibonacci.estimate_cost(20500, use_checkpoints=False)
+    assert with_checkpoint < from_scratch / 10
+
+    fibonacci.configure_result_store(None)
+    assert fibonacci.estimate_cost(20500) == from_scratch
+
+
+def test_process_scheduler_skips_checkpoint_discount(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scheduler, "estimate_cost", lambda n, use_checkpoints=True: calls.append(use_checkpoints) or 0.0)
+    monkeypatch.setattr(scheduler, "run_job", lambda n, result_format, extra: ("{}", 0, 0.0))
+    for executor in ("thread", "process"):
+        asyncio.run(scheduler.FibonacciScheduler(executor=executor).submit("c", 5000, "decimal"))
+    assert calls == [True, False]
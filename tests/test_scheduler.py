@@ -0,0 +1,139 @@
+import asyncio
+import json
+
+import pytest
+
+import scheduler
+from scheduler import FibonacciScheduler, SchedulerFull
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    # Custo estimado = n segundos, e o "cálculo" só registra a ordem de execução
+    order = []
+
+    def run_job(n, result_format, extra):
+        order.append(n)
+        return json.dumps({"n": n, **extra}), n, 0.0
+
+    monkeypatch.setattr(scheduler, "estimate_cost", lambda n, use_checkpoints=True: float(n))
+    monkeypatch.setattr(scheduler, "run_job", run_job)
+    return order
+
+
+async def enqueue(fib_scheduler, requests):
+    tasks = []
+    for client_id, n in requests:
+        tasks.append(asyncio.create_task(fib_scheduler.submit(client_id, n, "decimal")))
+        await asyncio.sleep(0)
+    return tasks
+
+
+async def run_all(fib_scheduler, requests):
+    # Tudo entra na fila antes de o agendador começar a despachar
+    fib_scheduler.start()
+    tasks = await enqueue(fib_scheduler, requests)
+    runner = asyncio.create_task(fib_scheduler.run())
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        runner.cancel()
+        fib_scheduler.close()
+
+
+def test_cheapest_job_of_a_client_runs_first(executed):
+    asyncio.run(run_all(FibonacciScheduler(workers=1, inline_max_cost=0), [("a", 5), ("a", 1), ("a", 3)]))
+    assert executed == [1, 3, 5]
+
+
+def test_clients_share_the_workers_fairly(executed):
+    fib_scheduler = FibonacciScheduler(workers=1, aging_rate=0, inline_max_cost=0)
+    requests = [("a", 10), ("a", 11), ("a", 12), ("a", 13), ("b", 20), ("b", 21)]
+    asyncio.run(run_all(fib_scheduler, requests))
+    # O cliente com menos custo acumulado vai primeiro, sem esperar a fila inteira do outro
+    assert executed == [10, 20, 11, 12, 21, 13]
+
+
+def test_waiting_discounts_cost(executed):
+    async def scenario(aging_rate):
+        fib_scheduler = FibonacciScheduler(workers=1, aging_rate=aging_rate, inline_max_cost=0)
+        fib_scheduler.start()
+        tasks = await enqueue(fib_scheduler, [("a", 10), ("b", 1)])
+        # O pedido caro está na fila há 20 s
+        fib_scheduler.clients["a"].heap[0][2].enqueued_at -= 20
+        _, job = fib_scheduler._pop_next()
+        for task in tasks:
+            task.cancel()
+        fib_scheduler.close()
+        return job.n
+
+    assert asyncio.run(scenario(aging_rate=0)) == 1
+    assert asyncio.run(scenario(aging_rate=1)) == 10
+
+
+def test_idle_client_does_not_bank_credit(executed):
+    async def scenario():
+        fib_scheduler = FibonacciScheduler(workers=1, aging_rate=0, inline_max_cost=0)
+        fib_scheduler.start()
+        runner = asyncio.create_task(fib_scheduler.run())
+        await asyncio.gather(*await enqueue(fib_scheduler, [("a", 30), ("a", 40), ("b", 5)]))
+        await asyncio.sleep(0)
+
+        # b gastou 5 enquanto a gastava 70; ao voltar, b parte do tempo virtual global
+        tasks = await enqueue(fib_scheduler, [("b", 6)])
+        credit = fib_scheduler.clients["b"].virtual_time
+        await asyncio.gather(*tasks)
+        runner.cancel()
+        fib_scheduler.close()
+        return credit
+
+    assert asyncio.run(scenario()) == 30
+
+
+def test_cheap_jobs_run_inline(executed):
+    async def scenario():
+        fib_scheduler = FibonacciScheduler(workers=1, inline_max_cost=1.0)
+        # Sem start() nem run(): só o caminho direto pode responder
+        message, bits = await fib_scheduler.submit("a", 1, "decimal")
+        return json.loads(message), fib_scheduler.stats()
+
+    message, stats = asyncio.run(scenario())
+    assert message["queue_ms"] == 0.0
+    assert stats["completed"] == 1 and stats["clients"] == 0
+
+
+def test_pending_limit_per_client(executed):
+    async def scenario():
+        fib_scheduler = FibonacciScheduler(workers=1, max_pending_per_client=2, inline_max_cost=0)
+        fib_scheduler.start()
+        tasks = await enqueue(fib_scheduler, [("a", 10), ("a", 11)])
+        with pytest.raises(SchedulerFull):
+            await fib_scheduler.submit("a", 12, "decimal")
+        # O limite é por cliente
+        other = await enqueue(fib_scheduler, [("b", 13)])
+        assert fib_scheduler.stats()["queued"] == 3
+        for task in tasks + other:
+            task.cancel()
+        fib_scheduler.close()
+
+    asyncio.run(scenario())
+
+
+def test_cancel_client_drops_queued_jobs(executed):
+    async def scenario():
+        fib_scheduler = FibonacciScheduler(workers=1, inline_max_cost=0)
+        fib_scheduler.start()
+        cancelled = await enqueue(fib_scheduler, [("a", 10), ("a", 11)])
+        kept = await enqueue(fib_scheduler, [("b", 12)])
+        fib_scheduler.cancel_client("a")
+        assert fib_scheduler.queued == 1
+
+        runner = asyncio.create_task(fib_scheduler.run())
+        await asyncio.gather(*kept)
+        runner.cancel()
+        fib_scheduler.close()
+        await asyncio.gather(*cancelled, return_exceptions=True)
+        return [task.cancelled() for task in cancelled]
+
+    assert asyncio.run(scenario()) == [True, True]
+    assert executed == [12]
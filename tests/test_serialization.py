@@ -0,0 +1,109 @@
+import base64
+import json
+import sys
+
+import pytest
+
+import serialization
+from fibonacci import calculate_fibonacci
+from serialization import encode_fibonacci_result, int_to_decimal_string
+
+
+@pytest.fixture(autouse=True)
+def unlimited_int_digits():
+    # str(int) serve de referência mesmo acima de 4300 dígitos
+    previous = sys.get_int_max_str_digits()
+    sys.set_int_max_str_digits(0)
+    yield
+    sys.set_int_max_str_digits(previous)
+
+
+@pytest.mark.parametrize("value", [
+    0, 1, 9, 10, 10 ** 18, 2 ** 4096 - 1, 2 ** 4096, 2 ** 4097 + 12345, 10 ** 5000, 3 ** 20000, -(7 ** 9000)
+], ids=lambda value: f"{'-' if value < 0 else ''}{value.bit_length()}bits")
+def test_decimal_string_matches_str(value):
+    assert int_to_decimal_string(value) == str(value)
+
+
+def test_divide_and_conquer_without_gmpy2(monkeypatch):
+    monkeypatch.setattr(serialization, "gmpy2", None)
+    value = calculate_fibonacci(50000)
+    assert int_to_decimal_string(value) == str(value)
+
+
+@pytest.mark.parametrize("n", [0, 1, 10, 1000, 30000])
+def test_round_trip_all_formats(n):
+    value = calculate_fibonacci(n)
+
+    decoded = json.loads(encode_fibonacci_result(n, value, "decimal"))
+    assert int(decoded["result"]) == value
+
+    decoded = json.loads(encode_fibonacci_result(n, value, "hex"))
+    assert int(decoded["result"], 16) == value
+
+    decoded = json.loads(encode_fibonacci_result(n, value, "base64"))
+    assert int.from_bytes(base64.b64decode(decoded["result"]), "big") == value
+
+
+def test_decimal_is_a_json_number_up_to_the_default_limit():
+    decoded = json.loads(encode_fibonacci_result(10, 55, "decimal"))
+    assert decoded["result"] == 55
+
+    limit = 10 ** 4300 - 1
+    sys.set_int_max_str_digits(4300)
+    decoded = json.loads(encode_fibonacci_result(1, limit, "decimal"))
+    assert decoded["result"] == limit
+    decoded = json.loads(encode_fibonacci_result(1, limit + 1, "decimal"))
+    assert decoded["result"] == "1" + "0" * 4300
+
+
+def test_large_decimal_parses_with_default_json_limits():
+    # Qualquer consumidor com o json padrão deve conseguir ler o resultado
+    sys.set_int_max_str_digits(4300)
+    decoded = json.loads(encode_fibonacci_result(30000, calculate_fibonacci(30000), "decimal"))
+    assert isinstance(decoded["result"], str)
+    assert len(decoded["result"]) > 4300
+
+
+def test_powers_of_two_are_shared_between_conversions(monkeypatch):
+    monkeypatch.setattr(serialization, "gmpy2", None)
+    monkeypatch.setattr(serialization, "_power_cache", serialization.OrderedDict())
+    monkeypatch.setattr(serialization, "_power_cache_bits", 0)
+    value = calculate_fibonacci(40000)
+    assert int_to_decimal_string(value) == str(value)
+    cached = dict(serialization._power_cache)
+    assert cached
+
+    # A segunda conversão do mesmo tamanho reaproveita os mesmos objetos
+    multiplied = []
+    original = serialization._store_power
+    monkeypatch.setattr(serialization, "_store_power", lambda bits, power: multiplied.append(bits) or original(bits, power))
+    assert int_to_decimal_string(value + 1) == str(value + 1)
+    assert multiplied == []
+    assert all(serialization._power_cache[bits] is power for bits, power in cached.items())
+
+
+def test_power_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(serialization, "gmpy2", None)
+    monkeypatch.setattr(serialization, "_power_cache", serialization.OrderedDict())
+    monkeypatch.setattr(serialization, "_power_cache_bits", 0)
+    monkeypatch.setattr(serialization, "_POWER_CACHE_MAX_BITS", 20000)
+    monkeypatch.setattr(serialization, "_POWER_CACHE_ENTRY_MAX_BITS", 10000)
+    for n in (20000, 30000, 50000):
+        value = calculate_fibonacci(n)
+        assert int_to_decimal_string(value) == str(value)
+        assert serialization._power_cache_bits == sum(serialization._power_cache) <= 20000
+        assert max(serialization._power_cache) <= 10000
+
+
+def test_extra_fields_come_before_result():
+    message = encode_fibonacci_result(10, 55, "decimal", {"id": "a\"b", "queue_ms": 1.5})
+    assert message.index('"id"') < message.index('"result"')
+    assert json.loads(message) == {
+        "type": "fibonacci_result", "n": 10, "format": "decimal", "id": "a\"b", "queue_ms": 1.5, "result": 55
+    }
+
+
+def test_invalid_format():
+    with pytest.raises(ValueError):
+        encode_fibonacci_result(10, 55, "octal")
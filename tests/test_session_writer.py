@@ -0,0 +1,92 @@
+import asyncio
+
+from session_writer import SessionWriter
+
+
+class Recorder:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def __call__(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("banco fora do ar")
+        self.batches.append(batch)
+
+
+def test_changes_of_one_user_become_one_operation():
+    async def scenario():
+        write = Recorder()
+        writer = SessionWriter(write)
+        writer.connected("u1", "ana", "instancia", 0)
+        writer.renamed("u1", "ana_2")
+        writer.disconnected("u1")
+        writer.renamed("u2", "bia")
+        assert await writer.flush()
+        return write, writer
+
+    write, writer = asyncio.run(scenario())
+    (batch,) = write.batches
+    fields, upsert = batch["u1"]
+    assert upsert
+    assert fields["username"] == "ana_2" and fields["online"] is False
+    assert fields["instance_id"] == "instancia" and fields["disconnected_at"] is not None
+    # Renomear sem ter conectado não cria documento
+    assert batch["u2"] == ({"username": "bia"}, False)
+    assert writer.stats()["coalesced"] == 2 and writer.stats()["operations"] == 2
+
+
+def test_failed_batch_is_requeued_under_newer_changes():
+    async def scenario():
+        write = Recorder(failures=1)
+        writer = SessionWriter(write)
+        writer.connected("u1", "ana", "instancia", 0)
+        writer.renamed("u2", "bia")
+        assert not await writer.flush()
+
+        # Mudanças que chegaram depois da falha valem sobre as do lote que voltou
+        writer.disconnected("u1")
+        writer.renamed("u2", "bia_2")
+        assert await writer.flush()
+        return write, writer
+
+    write, writer = asyncio.run(scenario())
+    (batch,) = write.batches
+    fields, upsert = batch["u1"]
+    assert upsert and fields["online"] is False and fields["username"] == "ana"
+    assert batch["u2"] == ({"username": "bia_2"}, False)
+    assert writer.stats()["failures"] == 1 and writer.stats()["pending"] == 0
+
+
+def test_full_buffer_flushes_before_the_interval():
+    async def scenario():
+        write = Recorder()
+        writer = SessionWriter(write, flush_interval=60, max_batch=3)
+        runner = asyncio.create_task(writer.run())
+        for index in range(3):
+            writer.renamed(f"u{index}", "nome")
+        for _ in range(100):
+            if write.batches:
+                break
+            await asyncio.sleep(0.01)
+        await writer.close()
+        await runner
+        return write
+
+    assert [len(batch) for batch in asyncio.run(scenario()).batches] == [3]
+
+
+def test_close_writes_what_is_left():
+    async def scenario():
+        write = Recorder()
+        writer = SessionWriter(write, flush_interval=60)
+        runner = asyncio.create_task(writer.run())
+        await asyncio.sleep(0)
+        writer.disconnected("u1")
+        await writer.close()
+        await asyncio.wait_for(runner, 1)
+        return write
+
+    (batch,) = asyncio.run(scenario()).batches
+    assert batch["u1"][0]["online"] is False
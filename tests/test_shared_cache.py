@@ -0,0 +1,131 @@
+import multiprocessing
+import pickle
+import time
+import uuid
+
+import pytest
+
+import shared_cache
+from shared_cache import SharedFibonacciCache
+
+
+def payload(n):
+    # Conteúdo e tamanho derivados de n: qualquer mistura de duas escritas é detectável
+    return bytes([n % 251]) * (64 + n % 97)
+
+
+@pytest.fixture
+def name():
+    name = f"test_fib_cache_{uuid.uuid4().hex[:12]}"
+    yield name
+    try:
+        SharedFibonacciCache.open(name, 1).close(unlink=True)
+    except (OSError, ValueError):
+        pass
+
+
+def test_put_get_and_contains(name):
+    cache = SharedFibonacciCache.open(name, 64 * 1024, slots=64)
+    value = 2 ** 20000 + 12345
+    assert cache.get(500) is None
+    assert not cache.contains(500)
+
+    assert cache.put(500, value)
+    assert cache.contains(500)
+    assert cache.get(500) == value
+    assert cache.put(500, value)
+    assert cache.stats()["entries"] == 1
+    cache.close()
+
+
+def test_other_processes_attach_by_name_and_pickle(name):
+    owner = SharedFibonacciCache.open(name, 64 * 1024, slots=64)
+    owner.put(10, 55)
+
+    attached = SharedFibonacciCache.open(name, 64 * 1024, slots=64)
+    assert attached.get(10) == 55
+    unpickled = pickle.loads(pickle.dumps(owner))
+    unpickled.put(12, 144)
+    assert attached.get(12) == 144
+
+    # Só o criador remove o segmento; os demais apenas se desanexam
+    attached.close()
+    unpickled.close()
+    assert SharedFibonacciCache.open(name, 64 * 1024, slots=64).get(12) == 144
+    owner.close()
+    assert SharedFibonacciCache.open(name, 64 * 1024, slots=64).get(12) is None
+
+
+def test_close_can_keep_or_take_over_the_segment(name):
+    owner = SharedFibonacciCache.open(name, 4096, slots=16)
+    owner.put(3, 2)
+    successor = SharedFibonacciCache.open(name, 4096, slots=16)
+
+    owner.close(unlink=False)
+    assert SharedFibonacciCache.open(name, 4096, slots=16).get(3) == 2
+    successor.close(unlink=True)
+    assert SharedFibonacciCache.open(name, 4096, slots=16).get(3) is None
+
+
+def test_circular_arena_evicts_overwritten_entries(name):
+    cache = SharedFibonacciCache.open(name, 1000, slots=64)
+    for n in range(20):
+        assert cache.put_bytes(n, payload(n))
+
+    for n in range(20):
+        data = cache.get_bytes(n)
+        assert data is None or data == payload(n)
+    assert cache.get_bytes(19) == payload(19)
+    assert cache.get_bytes(0) is None
+    assert cache.stats()["bytes"] <= 1000
+    assert not cache.put_bytes(99, b"x" * 1001)
+    cache.close()
+
+
+def test_slot_being_written_is_skipped(name):
+    cache = SharedFibonacciCache.open(name, 4096, slots=16)
+    cache.put_bytes(5, payload(5))
+
+    # Sequência ímpar: o escritor está no meio da atualização do slot
+    slot = 5 % cache.slots
+    sequence, n, offset, length = cache._read_slot(slot)
+    shared_cache._SLOT.pack_into(cache._shm.buf, cache._slot_position(slot), sequence + 1, n, offset, length)
+    assert cache.get_bytes(5) is None
+    assert not cache.contains(5)
+
+    shared_cache._SLOT.pack_into(cache._shm.buf, cache._slot_position(slot), sequence + 2, n, offset, length)
+    assert cache.get_bytes(5) == payload(5)
+    cache.close()
+
+
+def _writer(cache, stop):
+    n = 0
+    while not stop.is_set():
+        cache.put_bytes(n % 200, payload(n % 200))
+        n += 1
+        if n % 200 == 0:
+            # Novos n forçam a área circular a dar a volta e reaproveitar slots
+            for extra in range(200, 260):
+                cache.put_bytes(extra + n, payload(extra + n))
+
+
+def test_readers_never_see_torn_entries(name):
+    cache = SharedFibonacciCache.open(name, 4096, slots=128)
+    context = multiprocessing.get_context("fork")
+    stop = context.Event()
+    writer = context.Process(target=_writer, args=(cache, stop))
+    writer.start()
+    try:
+        hits = 0
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline:
+            for n in range(200):
+                data = cache.get_bytes(n)
+                if data is not None:
+                    assert data == payload(n)
+                    hits += 1
+        assert hits > 0
+    finally:
+        stop.set()
+        writer.join(10)
+        cache.close()